@@ -1,6 +1,16 @@
 import time
 from hashlib import sha256
 import json
+from merkle import merkle_root
+
+# Block hashing versions.
+# Version 1 hashes the full JSON encoding of the block (transactions included).
+# Version 2 hashes a canonical header that commits to the transactions through
+# a Merkle root, so the cost per nonce no longer depends on the block size.
+# Version 3 adds the proof of work target to the header (see difficulty.py).
+LEGACY_VERSION = 1
+MERKLE_VERSION = 2
+BLOCK_VERSION = 3
 
 # Multiple blocks linked together will make a blockchain
 class Block:
@@ -9,7 +19,7 @@ class Block:
     Each block contains index, timestamp, transactions, previous hash, and nonce.
     """
     
-    def __init__(self, index, transactions, prev_hash):
+    def __init__(self, index, transactions, prev_hash, version=BLOCK_VERSION):
         """
         Initialize a new block.
         
@@ -17,6 +27,7 @@ class Block:
             index (int): Index/position of the block in the chain
             transactions (list): List of transactions/file data
             prev_hash (str): Hash of the previous block
+            version (int): Hashing version (LEGACY_VERSION or BLOCK_VERSION)
         """
         self.index = index
         self.transactions = transactions
@@ -24,24 +35,160 @@ class Block:
         self.timestamp = time.time()  # Unix timestamp when block was created
         self.nonce = 0  # Nonce for proof of work
         self.hash = None  # Will be set after mining
+        self.version = version
+        self.header_root = None  # Merkle root declared by the header/record, or set once verified
+        self.target = None  # Proof of work target the block was mined at (version 3)
     
-    def generate_hash(self):
+    # Instance attributes; __dict__ is the serialization method, so copy and
+    # pickle go through __getstate__/__setstate__ instead of the instance dict
+    _STATE = ("index", "transactions", "prev_hash", "timestamp", "nonce", "hash",
+              "version", "header_root", "target")
+    
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self._STATE}
+    
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+    
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild a block from its dictionary form (DB record or peer JSON).
+        Records without a version field were hashed the legacy way. Header
+        dicts (no "transactions") give a header-only block whose transactions
+        is None and whose Merkle root comes from the header. The declared root
+        is kept in header_root either way, so it can be checked against the
+        transactions.
+        
+        Args:
+            data (dict): Block data as produced by __dict__() or header()
+        
+        Returns:
+            Block: Reconstructed block
+        """
+        block = cls(
+            data["index"],
+            data.get("transactions"),
+            data["prev_hash"],
+            data.get("version", LEGACY_VERSION)
+        )
+        block.timestamp = data.get("timestamp", block.timestamp)
+        block.nonce = data.get("nonce", 0)
+        block.hash = data.get("hash")
+        if data.get("target") is not None:
+            block.target = int(data["target"], 16)
+        block.header_root = data.get("merkle_root")
+        return block
+    
+    @property
+    def merkle_root(self):
+        """
+        Merkle root served in headers and records: header_root when the block
+        has one (declared by its record or header, and checked against the
+        transactions by Blockchain.is_valid before the block is accepted),
+        otherwise computed from the transactions. Hashing never trusts it;
+        hash_template() and is_valid() compute the root from the transactions.
+        
+        Returns:
+            str: Hexadecimal root hash
+        """
+        if self.header_root is not None or self.transactions is None:
+            return self.header_root
+        return merkle_root(self.transactions)
+    
+    def header_prefix(self, root=None):
+        """
+        Canonical encoding of everything the hash commits to except the nonce.
+        
+        Args:
+            root (str): Precomputed Merkle root (computed here when omitted)
+        
+        Returns:
+            tuple: (prefix, suffix) as bytes; the hash input is prefix + nonce + suffix
+        """
+        if self.version == LEGACY_VERSION:
+            if self.transactions is None:
+                raise ValueError("Legacy blocks cannot be hashed without their transactions")
+            block_string = json.dumps({
+                "index": self.index,
+                "timestamp": self.timestamp,
+                "transactions": self.transactions,
+                "prev_hash": self.prev_hash,
+                "nonce": 0
+            }, sort_keys=True)
+            
+            # "index" is the only key sorted before "nonce" and it holds an int,
+            # so the first match is always the top level nonce
+            marker = '"nonce": '
+            cut = block_string.index(marker) + len(marker)
+            return block_string[:cut].encode(), block_string[cut + 1:].encode()
+        
+        fields = [
+            str(self.version),
+            str(self.index),
+            json.dumps(self.timestamp),
+            self.prev_hash,
+            root or merkle_root(self.transactions)
+        ]
+        if self.version >= BLOCK_VERSION:
+            fields.append(self.target_hex() or "")
+        header = "|".join(fields + [""])
+        return header.encode(), b""
+    
+    def hash_template(self, root=None):
+        """
+        Encode the block once for a mining loop. The template goes stale if
+        the block changes, so it is only meant to live as long as the loop;
+        validation encodes the block again.
+        
+        Args:
+            root (str): Merkle root just computed from the transactions
+                (computed here when omitted)
+        
+        Returns:
+            tuple: (sha256 state of the prefix, suffix bytes)
+        """
+        if root is None and self.version != LEGACY_VERSION:
+            root = merkle_root(self.transactions) if self.transactions is not None else self.header_root
+        prefix, suffix = self.header_prefix(root)
+        return sha256(prefix), suffix
+    
+    def target_hex(self):
         """
-        Generate SHA256 hash from all block data.
+        Target as a fixed-width hexadecimal string.
+        
+        Returns:
+            str|None: 64 hex digits, None if the block has no target
+        """
+        return f"{self.target:064x}" if self.target is not None else None
+    
+    def hash_with_nonce(self, nonce, template=None):
+        """
+        Hash the block for a given nonce.
+        
+        Args:
+            nonce (int): Nonce to hash with
+            template (tuple): Result of hash_template() to reuse inside a
+                mining loop (the block is encoded from scratch without it)
         
         Returns:
             str: Hexadecimal hash string
         """
-        # Combine all block data
-        block_string = json.dumps({
-            "index": self.index,
-            "timestamp": self.timestamp,
-            "transactions": self.transactions,
-            "prev_hash": self.prev_hash,
-            "nonce": self.nonce
-        }, sort_keys=True)
+        state, suffix = template or self.hash_template()
+        attempt = state.copy()
+        attempt.update(str(nonce).encode() + suffix)
+        return attempt.hexdigest()
+    
+    def generate_hash(self):
+        """
+        Generate SHA256 hash from all block data, re-encoding the block and
+        recomputing its Merkle root.
         
-        return sha256(block_string.encode()).hexdigest()
+        Returns:
+            str: Hexadecimal hash string
+        """
+        return self.hash_with_nonce(self.nonce)
     
     def compute_hash(self):
         """
@@ -61,6 +208,29 @@ class Block:
         """
         self.transactions.append(transaction)
     
+    def header(self):
+        """
+        Block header: everything needed to check proof of work and linkage
+        without the transactions (legacy blocks also need the transactions).
+        
+        Returns:
+            dict: Header data
+        """
+        data = {
+            "index": self.index,
+            "timestamp": self.timestamp,
+            "prev_hash": self.prev_hash,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "version": self.version,
+            "tx_count": len(self.transactions) if self.transactions is not None else None
+        }
+        if self.version != LEGACY_VERSION:
+            data["merkle_root"] = self.merkle_root
+        if self.version >= BLOCK_VERSION:
+            data["target"] = self.target_hex()
+        return data
+    
     def __dict__(self):
         """
         Convert block to dictionary for JSON serialization.
@@ -68,11 +238,17 @@ class Block:
         Returns:
             dict: Block data as dictionary
         """
-        return {
+        data = {
             "index": self.index,
             "timestamp": self.timestamp,
             "transactions": self.transactions,
             "prev_hash": self.prev_hash,
             "nonce": self.nonce,
-            "hash": self.hash
-        }
\ No newline at end of file
+            "hash": self.hash,
+            "version": self.version
+        }
+        if self.version != LEGACY_VERSION:
+            data["merkle_root"] = self.merkle_root
+        if self.version >= BLOCK_VERSION:
+            data["target"] = self.target_hex()
+        return data
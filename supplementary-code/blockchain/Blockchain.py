@@ -1,7 +1,19 @@
 # Import libraries
+import os
 import random
-import requests
-from Block import Block
+import threading
+import time
+from Block import Block, BLOCK_VERSION, LEGACY_VERSION, MERKLE_VERSION
+from chain_store import ChainStore, LazyChain
+from persistence import BlockRepository
+from miner import parallel_p_o_w
+from peer_client import PeerClient
+from tx_index import TransactionIndex, StoredTransactionIndex
+from merkle import merkle_proof, merkle_root
+from mempool import Mempool, SharedMempool, tx_id
+from difficulty import RETARGET_WINDOW, block_work, difficulty_to_target, meets_target, next_target
+from block_tree import BlockTree
+from gossip import Gossip
 
 class Blockchain:
     """
@@ -9,76 +21,165 @@ class Blockchain:
     Implements proof of work with two different nonce generation strategies.
     """
     
-    # Difficulty for proof of work (number of leading zeros required)
+    # Minimum difficulty for proof of work (leading hex zeros, may be fractional).
+    # Blocks retarget above it to keep target_block_time between blocks
     difficulty = 3
+    target_block_time = 10.0
+
+    # Worker processes used by mine(); 1 keeps the single-threaded p_o_w
+    mining_workers = 1
+    
+    # Page sizes for headers-first sync (per request to a peer)
+    headers_per_request = 500
+    blocks_per_request = 100
+    
+    # Peer networking: per-request timeout and overall fan-out deadline (seconds)
+    peer_timeout = 2.0
+    peer_deadline = 5.0
+    
+    # Largest block mine() builds (transactions, encoded bytes)
+    block_tx_limit = 500
+    block_byte_limit = 4 * 1024 * 1024
     
-    def __init__(self, db=None):
+    # Shared-state mode: minimum seconds between pulls of blocks written by other workers
+    shared_refresh_interval = 1.0
+    
+    def __init__(self, db=None, data_dir=None, shared=False):
         """
         Initialize blockchain with genesis block and sync with DB.
         
         Args:
             db: MongoDB database instance for persistence
+            data_dir (str): Directory of the on-disk block store. When set the
+                chain is read lazily from disk and MongoDB is only a mirror
+            shared (bool): Share the chain and the pending pool through MongoDB
+                with other processes (e.g. gunicorn workers)
         """
-        self.pending = []  # Pending transactions waiting to be mined
+        if shared and (db is None or data_dir is not None):
+            raise ValueError("Shared state needs MongoDB and cannot use a data directory")
+        self.shared = shared
+        # Single writer: every change to chain, indexes and peers holds this lock
+        self.lock = threading.RLock()
+        self._refreshed_at = 0.0
+        # Pending transactions waiting to be mined
+        self.pending = SharedMempool(db) if shared else Mempool()
         self.chain = []  # The blockchain
         self.peers = set()  # Set of peer nodes for consensus
         self.db = db
+        self.repository = BlockRepository(db) if db is not None else None
+        # Concurrent peer client; peers that keep failing are dropped from self.peers
+        self.peer_client = PeerClient(
+            timeout=Blockchain.peer_timeout,
+            deadline=Blockchain.peer_deadline,
+            on_evict=self.peers.discard
+        )
+        self.hash_index = {}  # Block hash -> height in self.chain
+        self.tx_index = TransactionIndex()  # Transactions by file_key, user and block
+        self.tree = BlockTree()  # Competing branches and orphans, off the main chain
+        self.gossip = Gossip(self)  # Compact block relay to and from the peers
+        self.verified_height = -1  # Every block up to this height has been verified
+        
+        store_chain = LazyChain(ChainStore(data_dir)) if data_dir is not None else None
+        if store_chain is not None:
+            # Persisted next to the block store, so startup does not re-read every block
+            self.tx_index = StoredTransactionIndex(os.path.join(data_dir, "txindex.sqlite"))
+        
+        if store_chain:
+            # Blocks are only written to the store once validated
+            self.chain = store_chain
+            self.rebuild_index()
+            self.verified_height = len(self.chain) - 1
+            print(f"Loaded blockchain from {data_dir}: {len(self.chain)} blocks")
+            return
         
         # Try to load chain from DB
         loaded_chain = self.load_from_db() if self.db is not None else []
         
         if loaded_chain:
             self.chain = loaded_chain
-            print(f"Loaded blockchain from DB: {len(self.chain)} blocks")
-        else:
+            self.rebuild_index()
+            self.verify_local_chain()
+            print(f"Loaded blockchain from DB: {len(self.chain)} blocks, verified up to #{self.verified_height}")
+            if store_chain is not None:
+                # First start with a data directory: import the verified blocks
+                store_chain.extend(self.chain[:self.verified_height + 1])
+                self.chain = store_chain
+                self.rebuild_index()
+                print(f"Imported {len(self.chain)} blocks into {data_dir}")
+        elif store_chain is not None:
+            self.chain = store_chain
+        
+        if not self.chain:
             # Create genesis block
             genesis_block = Block(0, [], "0")
             genesis_block.hash = genesis_block.generate_hash()
             self.chain.append(genesis_block)
+            self.rebuild_index()
+            self.verified_height = 0
             
             # Save genesis to DB if sync available
             if self.db is not None:
-                self.save_block_to_db(genesis_block)
-                print("Created and saved genesis block to DB")
+                if self.save_block_to_db(genesis_block):
+                    print("Created and saved genesis block to DB")
+                else:
+                    # Another worker created the genesis block first
+                    self.chain = self.load_from_db()
+                    self.rebuild_index()
+                    self.verify_local_chain()
 
     def load_from_db(self):
         """Load the blockchain from MongoDB."""
-        if self.db is None: return []
-        
-        blocks_col = self.db["blocks"]
-        cursor = blocks_col.find().sort("index", 1)
-        
-        chain = []
-        for b_data in cursor:
-            block = Block(
-                b_data["index"],
-                b_data["transactions"],
-                b_data["prev_hash"]
-            )
-            block.timestamp = b_data.get("timestamp", block.timestamp)
-            block.nonce = b_data.get("nonce", 0)
-            block.hash = b_data.get("hash")
-            chain.append(block)
+        if self.repository is None: return []
         
-        return chain
+        # Records written before block versioning have no "version" field
+        # and keep validating with the legacy hashing scheme
+        return self.repository.load()
 
     def save_block_to_db(self, block):
-        """Save a validated block to the MongoDB blocks collection."""
-        if self.db is None: return
+        """
+        Save a validated block to the MongoDB blocks collection (idempotent).
+        In shared mode the height must still be free.
         
-        blocks_col = self.db["blocks"]
-        # Check if block already exists to avoid duplicates
-        if blocks_col.find_one({"index": block.index}):
-            return
+        Returns:
+            bool: False if another worker already stored a block at that height
+        """
+        if self.repository is None: return True
+        
+        if self.shared:
+            return self.repository.insert_new(block)
+        self.repository.save_blocks([block])
+        return True
+    
+    def refresh_from_db(self, force=False):
+        """
+        Shared mode: adopt blocks other workers wrote to MongoDB.
+        Throttled to once per shared_refresh_interval unless forced.
+        
+        Args:
+            force (bool): Refresh even if the last refresh was recent
+            
+        Returns:
+            bool: True if our chain changed
+        """
+        if not self.shared or (not force and time.time() - self._refreshed_at < Blockchain.shared_refresh_interval):
+            return False
+        
+        with self.lock:
+            self._refreshed_at = time.time()
+            # Walk back until the stored chain agrees with ours (another worker may have reorged)
+            fork = len(self.chain) - 1
+            while fork >= 0 and self.repository.hash_at(fork) != self.chain[fork].hash:
+                fork -= 1
             
-        blocks_col.insert_one({
-            "index": block.index,
-            "timestamp": block.timestamp,
-            "transactions": block.transactions,
-            "prev_hash": block.prev_hash,
-            "nonce": block.nonce,
-            "hash": block.hash
-        })
+            blocks = self.repository.load(fork + 1)
+            if not blocks and fork == len(self.chain) - 1:
+                return False
+            if self.validate_from(blocks, fork + 1) is not None:
+                print(f"DEBUG: Stored blocks after #{fork} failed validation, not adopting them")
+                return False
+            # Already stored, so only our in-memory state changes
+            self.replace_chain(blocks, fork, persist=False)
+            return True
     
     def add_block(self, block, hashl):
         """
@@ -91,13 +192,99 @@ class Blockchain:
         Returns:
             bool: True if block was added, False otherwise
         """
-        if prev_hash == block.prev_hash and self.is_valid(block, hashl):
+        with self.lock:
+            last_block = self.last_block()
+            
+            # Must extend the tip and never downgrade the hashing version
+            if not (last_block.hash == block.prev_hash
+                    and block.version >= last_block.version
+                    and self.is_valid(block, hashl, self.next_target())):
+                return False
+            
             block.hash = hashl
+            # Sync with DB first: in shared mode another worker may own this height
+            if not self.save_block_to_db(block):
+                return False
             self.chain.append(block)
-            # Sync with DB
-            self.save_block_to_db(block)
+            self.hash_index[hashl] = block.index
+            self.tx_index.add_block(block)
+            self.pending.remove(block.transactions)
+            # A verified block on top of a verified chain moves the watermark
+            if self.verified_height == block.index - 1:
+                self.verified_height = block.index
             return True
-        return False
+    
+    def receive_block(self, block):
+        """
+        Accept a block from a peer wherever it attaches: on our tip, on a
+        side branch (switching to that branch once it has more work than
+        ours) or, if its parent is unknown, as an orphan until the parent
+        arrives. Orphans waiting on the block are attached after it.
+        
+        Args:
+            block (Block): Block with its hash set
+            
+        Returns:
+            str: "added" (extends our tip), "reorg" (its branch is now our chain),
+                "side" (kept on a side branch), "orphan", "known" or "invalid"
+        """
+        with self.lock:
+            if block.hash in self.hash_index or block.hash in self.tree:
+                return "known"
+            # Proof of work alone, before spending memory on the block
+            if block.index <= 0 or not self.is_valid(block, block.hash):
+                return "invalid"
+            if block.prev_hash not in self.hash_index and self.tree.get(block.prev_hash) is None:
+                self.tree.add_orphan(block)
+                return "orphan"
+            
+            status = self._attach(block)
+            if status == "invalid":
+                return status
+            waiting = self.tree.take_orphans(block.hash)
+            while waiting:
+                child = waiting.pop(0)
+                child_status = self._attach(child)
+                if child_status == "invalid":
+                    continue
+                if child_status == "reorg" and status == "side":
+                    status = "reorg"  # The block is on our chain now
+                waiting.extend(self.tree.take_orphans(child.hash))
+            return status
+    
+    def _attach(self, block):
+        """Add a block whose parent is known to our tip or to the tree (see receive_block)."""
+        if block.prev_hash == self.last_block().hash:
+            return "added" if self.add_block(block, block.hash) else "invalid"
+        
+        self.tree.add(block)
+        located = self.tree.branch(block.hash, self.hash_index)
+        if located is None:
+            return "side"
+        fork, branch = located
+        if self.chain_work(branch) <= self.chain_work(self.chain[fork + 1:]):
+            return "side"
+        
+        # Heavier branch: check it in the context of our chain before switching
+        bad = self.validate_from(branch, fork + 1)
+        if bad is not None:
+            self.tree.remove(b.hash for b in branch[bad - fork - 1:])
+            return "invalid"
+        self.replace_chain(branch, fork)
+        print(f"Reorg at #{fork}: switched to a {len(branch)} block branch ending in {block.hash}")
+        return "reorg"
+    
+    def chain_work(self, blocks):
+        """
+        Total proof of work of a run of blocks.
+        
+        Args:
+            blocks (list): Blocks or header-only blocks
+            
+        Returns:
+            int: Sum of the expected hashes of each block
+        """
+        return sum(block_work(self.block_target(block)) for block in blocks)
     
     def mine(self):
         """
@@ -106,28 +293,55 @@ class Blockchain:
         Returns:
             int|bool: Index of mined block, or False if no pending transactions
         """
-        if len(self.pending) > 0:
+        self.refresh_from_db(force=True)
+        
+        # Fill the block up to the size limits, highest priority first
+        transactions = self.pending.take(Blockchain.block_tx_limit, Blockchain.block_byte_limit)
+        
+        # Another worker (or a synced block) may have recorded some of them already
+        recorded = [t for t in transactions if t.get("file_key") and self.tx_index.by_file_key(t["file_key"])]
+        if recorded:
+            self.pending.remove(recorded)
+            transactions = [t for t in transactions if t not in recorded]
+        
+        if transactions:
             last_block = self.last_block()
             
             # Create new block
             new_block = Block(
                 last_block.index + 1,
-                self.pending,
+                transactions,
                 last_block.hash
             )
+            new_block.target = self.next_target()
             
             # Run proof of work (using random nonce by default)
-            hashl = self.p_o_w(new_block)
+            hashl = self.run_p_o_w(new_block)
             
-            # Add block to chain
-            self.add_block(new_block, hashl)
-            
-            # Clear pending transactions
-            self.pending = []
+            # Add block to chain (keep pending if the tip moved meanwhile);
+            # add_block drops the included transactions from the pool
+            if not self.add_block(new_block, hashl):
+                self.pending.release(transactions)
+                return False
             
             return new_block.index
         return False
     
+    def run_p_o_w(self, block):
+        """
+        Run the configured proof of work strategy on a block.
+        Uses the parallel miner when mining_workers > 1, random nonce otherwise.
+        
+        Args:
+            block (Block): Block to mine
+            
+        Returns:
+            str: Valid hash meeting difficulty requirement
+        """
+        if Blockchain.mining_workers > 1:
+            return self.p_o_w_parallel(block)
+        return self.p_o_w(block)
+    
     def p_o_w(self, block):
         """
         Proof of Work using random nonce generation.
@@ -139,12 +353,15 @@ class Blockchain:
         Returns:
             str: Valid hash meeting difficulty requirement
         """
+        target = self.block_target(block)
+        # Encode the block once; each attempt only hashes the nonce on top
+        template = block.hash_template()
         block.nonce = 0
-        get_hash = block.generate_hash()
+        get_hash = block.hash_with_nonce(block.nonce, template)
         
-        while not get_hash.startswith("0" * Blockchain.difficulty):
+        while not meets_target(get_hash, target):
             block.nonce = random.randint(0, 99999999)
-            get_hash = block.generate_hash()
+            get_hash = block.hash_with_nonce(block.nonce, template)
         
         return get_hash
     
@@ -159,23 +376,200 @@ class Blockchain:
         Returns:
             str: Valid hash meeting difficulty requirement
         """
+        target = self.block_target(block)
+        # Encode the block once; each attempt only hashes the nonce on top
+        template = block.hash_template()
         block.nonce = 0
-        get_hash = block.generate_hash()
+        get_hash = block.hash_with_nonce(block.nonce, template)
         
-        while not get_hash.startswith("0" * Blockchain.difficulty):
+        while not meets_target(get_hash, target):
             block.nonce += 1
-            get_hash = block.generate_hash()
+            get_hash = block.hash_with_nonce(block.nonce, template)
+        
+        return get_hash
+    
+    def p_o_w_parallel(self, block, workers=None):
+        """
+        Proof of Work spread over multiple processes.
+        Each worker searches its own partition of the nonce space and all
+        workers stop as soon as one of them finds a valid hash.
         
+        Args:
+            block (Block): Block to mine
+            workers (int): Number of worker processes (defaults to mining_workers,
+                or the CPU count when that is 1)
+            
+        Returns:
+            str: Valid hash meeting difficulty requirement
+        """
+        if workers is None and Blockchain.mining_workers > 1:
+            workers = Blockchain.mining_workers
+        
+        block.nonce, get_hash = parallel_p_o_w(block, self.block_target(block), workers)
         return get_hash
     
+    def block_target(self, block):
+        """
+        Target a block's hash has to meet: its own target from version 3 on,
+        the minimum difficulty for older blocks.
+        
+        Args:
+            block (Block): Block
+            
+        Returns:
+            int: Target
+        """
+        if block.version >= BLOCK_VERSION and block.target is not None:
+            return block.target
+        return difficulty_to_target(Blockchain.difficulty)
+    
+    @staticmethod
+    def target_after(window):
+        """
+        Target required of the block following a window of blocks.
+        
+        Args:
+            window (list): Blocks just below the new block, oldest first
+            
+        Returns:
+            int: Target
+        """
+        return next_target(window, Blockchain.target_block_time, difficulty_to_target(Blockchain.difficulty))
+    
+    def next_target(self):
+        """
+        Target for the next block on our chain.
+        
+        Returns:
+            int: Target
+        """
+        with self.lock:
+            return Blockchain.target_after(self.chain[-RETARGET_WINDOW:])
+    
     def add_pending(self, transaction):
         """
-        Add a new transaction to pending list.
+        Add a new transaction to the pending pool.
+        Retried submissions and files already on the chain are ignored.
         
         Args:
             transaction: Transaction data to add
+            
+        Returns:
+            bool: True if the transaction was added
+        """
+        file_key = transaction.get("file_key")
+        if file_key and self.tx_index.by_file_key(file_key) is not None:
+            return False
+        return self.pending.add(transaction)
+    
+    def rebuild_index(self):
+        """
+        Rebuild the hash -> height index and bring the transaction index in
+        line with the local chain. With the block store neither decodes a
+        block unless the stored transaction index is missing blocks.
+        """
+        if isinstance(self.chain, LazyChain):
+            # Hashes come from the store index, no block needs decoding
+            hashes = self.chain.hashes()
+        else:
+            hashes = (block.hash for block in self.chain)
+        self.hash_index = {block_hash: height for height, block_hash in enumerate(hashes)}
+        self.tx_index.sync(self.chain)
+    
+    def verify_local_chain(self):
+        """
+        Verify local blocks above the verified-height watermark and move it up.
+        Stops at the first invalid block.
+        
+        Returns:
+            bool: True if the whole local chain is verified
         """
-        self.pending.append(transaction)
+        start = self.verified_height + 1
+        if start < len(self.chain):
+            bad = self.validate_from(self.chain[start:], start)
+            self.verified_height = (bad if bad is not None else len(self.chain)) - 1
+        return self.verified_height == len(self.chain) - 1
+    
+    def find_fork_point(self, chain):
+        """
+        Find the highest block shared by a chain and our verified chain.
+        Walks back from the top, so the cost grows with the number of new
+        blocks rather than with the chain length.
+        
+        Args:
+            chain (list): List of blocks (e.g. a peer's chain)
+            
+        Returns:
+            int: Height of the last common block, -1 if none is shared
+        """
+        for height in range(min(len(chain) - 1, self.verified_height), -1, -1):
+            if self.hash_index.get(chain[height].hash) == height:
+                return height
+        return -1
+    
+    def validate_from(self, blocks, start):
+        """
+        Validate consecutive blocks starting at a given height, on top of our
+        own block below it. Header-only blocks (transactions is None) are
+        checked on their header; legacy ones only for linkage until the body
+        arrives. Every block must carry the target retargeting gives it.
+        
+        Args:
+            blocks (list): Blocks for heights start, start + 1, ...
+            start (int): Height of blocks[0]
+            
+        Returns:
+            int|None: Height of the first invalid block, None if all are valid
+        """
+        # Blocks below start that the first retargets depend on
+        window = self.chain[max(0, start - RETARGET_WINDOW):start]
+        if start > 0:
+            prev_hash = window[-1].hash
+            prev_version = window[-1].version
+        else:
+            prev_hash = "0"
+            prev_version = LEGACY_VERSION
+        
+        for height, block in enumerate(blocks, start):
+            # Genesis is never mined, it only has to hash to itself
+            if block.transactions is None and block.version == LEGACY_VERSION:
+                valid = block.hash is not None
+            elif height == 0:
+                valid = block.hash is not None and block.generate_hash() == block.hash
+            else:
+                valid = self.is_valid(block, block.hash, Blockchain.target_after(window))
+            
+            # Verify hash validity, position, linkage and that versions never go backwards
+            if (valid
+                    and block.index == height
+                    and prev_hash == block.prev_hash
+                    and block.version >= prev_version):
+                prev_hash = block.hash
+                prev_version = block.version
+                window = window[1 - RETARGET_WINDOW:] + [block]
+            else:
+                return height
+        
+        return None
+    
+    def validate_peer_chain(self, chain):
+        """
+        Validate a peer's chain incrementally.
+        Blocks up to the fork point match our verified blocks by hash and are
+        skipped; only the blocks after it are re-verified.
+        
+        Args:
+            chain (list): List of blocks to validate
+            
+        Returns:
+            int|None: Fork point (see find_fork_point) if valid, None otherwise
+        """
+        fork = self.find_fork_point(chain)
+        
+        # Check linkage against our own copy of the fork block, not the peer's
+        if self.validate_from(chain[fork + 1:], fork + 1) is not None:
+            return None
+        return fork
     
     def check_chain_validity(self, chain):
         """
@@ -187,37 +581,85 @@ class Blockchain:
         Returns:
             bool: True if chain is valid, False otherwise
         """
-        result = True
-        prev_hash = "0"
+        return self.validate_peer_chain(chain) is not None
+    
+    def replace_chain(self, blocks, fork, persist=True):
+        """
+        Keep our blocks up to the fork point and append validated blocks after it.
+        The blocks we drop stay in the tree as a side branch and their
+        transactions that the new blocks do not include go back to pending.
         
-        for block in chain:
-            block_hash = block.hash
+        Args:
+            blocks (list): Validated blocks for heights fork + 1 and up
+            fork (int): Height of the last block kept from our chain
+            persist (bool): Also write the change to MongoDB
+        """
+        with self.lock:
+            orphaned = self.chain[fork + 1:]
+            for block in orphaned:
+                self.hash_index.pop(block.hash, None)
             
-            # Verify hash validity and linkage
-            if self.is_valid(block, block.hash) and prev_hash == block.prev_hash:
-                block.hash = block_hash
-                prev_hash = block_hash
-            else:
-                result = False
-                break
-        
-        return result
+            del self.chain[fork + 1:]
+            self.tx_index.truncate(fork + 1)
+            self.chain.extend(blocks)
+            for block in blocks:
+                self.hash_index[block.hash] = block.index
+                self.tx_index.add_block(block)
+            self.verified_height = len(self.chain) - 1
+            for block in blocks:
+                self.pending.remove(block.transactions)
+            
+            self.tree.remove(block.hash for block in blocks)
+            included = {tx_id(t) for block in blocks for t in block.transactions}
+            for block in orphaned:
+                self.tree.add(block)
+                for transaction in block.transactions:
+                    if tx_id(transaction) not in included:
+                        self.add_pending(transaction)
+            
+            # Persist the reorg in one go (one transaction when available)
+            if persist and self.repository is not None:
+                self.repository.replace_from(fork, blocks)
     
-    def is_valid(self, block, block_hash):
+    def is_valid(self, block, block_hash, expected_target=None):
         """
         Check if a block's hash is valid.
         
         Args:
             block (Block): Block to validate
             block_hash (str): Hash to verify
+            expected_target (int): Target retargeting requires at the block's
+                height (version 3 blocks must declare exactly this target)
             
         Returns:
             bool: True if hash is valid, False otherwise
         """
-        # Check if hash meets difficulty requirement
-        if block_hash.startswith("0" * Blockchain.difficulty):
+        # Unknown hashing versions cannot be verified
+        if block.version not in (LEGACY_VERSION, MERKLE_VERSION, BLOCK_VERSION):
+            return False
+        
+        if block.version >= BLOCK_VERSION:
+            # Never easier than the minimum difficulty, whatever the context
+            if block.target is None or block.target > difficulty_to_target(Blockchain.difficulty):
+                return False
+            if expected_target is not None and block.target != expected_target:
+                return False
+        
+        # The Merkle root is recomputed from the transactions as they are now,
+        # and must match the one the block was announced with
+        root = None
+        if block.version != LEGACY_VERSION and block.transactions is not None:
+            root = merkle_root(block.transactions)
+            if block.header_root is not None and block.header_root != root:
+                return False
+        
+        # Check if hash meets the target
+        if block_hash and meets_target(block_hash, self.block_target(block)):
             # Verify hash matches block data
-            if block.generate_hash() == block_hash:
+            if block.hash_with_nonce(block.nonce, block.hash_template(root)) == block_hash:
+                # Verified: headers and records serve this root from now on
+                if root is not None:
+                    block.header_root = root
                 return True
         return False
     
@@ -230,6 +672,121 @@ class Blockchain:
         """
         return self.chain[-1]
     
+    def upgrade_chain(self):
+        """
+        Migrate legacy (version 1) blocks to the current header format.
+        Every block from the first legacy block onward is re-mined, since a
+        new hash changes the prev_hash of every block after it. All peers
+        must run the same migration, otherwise they reject the new chain.
+        
+        Returns:
+            int: Number of blocks re-mined
+        """
+        with self.lock:
+            start = next((i for i, b in enumerate(self.chain) if b.version < BLOCK_VERSION), None)
+            if start is None:
+                return 0
+            
+            prev_hash = self.chain[start - 1].hash if start > 0 else "0"
+            window = self.chain[max(0, start - RETARGET_WINDOW):start]
+            blocks = self.chain[start:]
+            for block in blocks:
+                block.version = BLOCK_VERSION
+                block.prev_hash = prev_hash
+                block.target = Blockchain.target_after(window)
+                block.hash = self.run_p_o_w(block)
+                prev_hash = block.hash
+                window = window[1 - RETARGET_WINDOW:] + [block]
+            
+            # Rewrite the re-mined blocks (the on-disk store is append-only)
+            del self.chain[start:]
+            self.chain.extend(blocks)
+            self.rebuild_index()
+            self.verified_height = len(self.chain) - 1
+            
+            if self.repository is not None:
+                self.repository.replace_from(start - 1, blocks)
+            
+            return len(self.chain) - start
+    
+    def snapshot(self, start=0, stop=None):
+        """
+        Consistent copy of a range of the chain: no block is added or
+        replaced while it is taken. Blocks must not be modified.
+        
+        Args:
+            start (int): First height
+            stop (int): Height after the last block (defaults to the tip)
+            
+        Returns:
+            list: Blocks
+        """
+        with self.lock:
+            return self.chain[max(0, start):stop]
+    
+    def get_headers(self, start, limit):
+        """
+        Block headers from a given height.
+        
+        Args:
+            start (int): First height to return
+            limit (int): Maximum number of headers
+            
+        Returns:
+            list: Header dicts
+        """
+        return [block.header() for block in self.snapshot(start, max(0, start) + limit)]
+    
+    def get_blocks(self, from_hash, to_hash, limit):
+        """
+        Full blocks for a hash range (both ends included).
+        
+        Args:
+            from_hash (str): Hash of the first block
+            to_hash (str): Hash of the last block
+            limit (int): Maximum number of blocks
+            
+        Returns:
+            list|None: Block dicts, or None if a hash is not on our chain
+        """
+        with self.lock:
+            start = self.hash_index.get(from_hash)
+            end = self.hash_index.get(to_hash)
+            if start is None or end is None or end < start:
+                return None
+            blocks = self.chain[start:min(end + 1, start + limit)]
+        return [block.__dict__() for block in blocks]
+    
+    def get_tx_proof(self, file_key):
+        """
+        Merkle inclusion proof for the transaction that recorded a file.
+        
+        Args:
+            file_key (str): File key
+            
+        Returns:
+            dict|None: Transaction, its position, the proof and the block header,
+                or None if the file is not on the chain
+            
+        Raises:
+            ValueError: If the block predates Merkle commitments (version 1)
+        """
+        with self.lock:
+            location = self.tx_index.locate(file_key)
+            if location is None:
+                return None
+            height, position = location
+            block = self.chain[height]
+        if block.version == LEGACY_VERSION:
+            raise ValueError(f"Block #{height} predates Merkle commitments")
+        
+        return {
+            "transaction": block.transactions[position],
+            "position": position,
+            "proof": merkle_proof(block.transactions, position),
+            "header": block.header()
+        }
+    
     # ========== CONSENSUS MECHANISM ==========
     
     def register_peer(self, peer_address):
@@ -239,76 +796,131 @@ class Blockchain:
         Args:
             peer_address (str): URL of peer node (e.g., "http://127.0.0.1:8801")
         """
-        self.peers.add(peer_address)
+        with self.lock:
+            self.peers.add(peer_address)
+        self.peer_client.reset(peer_address)
     
     def consensus(self):
         """
-        Consensus algorithm - longest chain wins.
-        Replaces our chain with the longest valid chain from peers.
+        Consensus algorithm - the valid chain with the most work wins.
+        Syncs headers-first: asks every peer for headers from our tip, then
+        downloads only the missing blocks from the best valid one, so the
+        cost grows with the gap between the chains, not with their length.
         
         Returns:
             bool: True if chain was replaced, False otherwise
         """
-        longest_chain = None
-        current_len = len(self.chain)
+        tip = len(self.chain) - 1
         
-        # Check all peer nodes
-        for peer in self.peers:
+        # Ask all peers at once; unreachable or slow peers are skipped
+        replies = self.peer_client.fan_out(
+            self.peers,
+            lambda peer: self._fetch_headers(peer, tip, Blockchain.headers_per_request)
+        )
+        candidates = [
+            (length, peer, headers)
+            for peer, (length, headers) in replies.items()
+            if length >= len(self.chain)  # Equal length may still carry more work
+        ]
+        
+        # Try the longest chains first, fall back if a peer sends bad data
+        for length, peer, headers in sorted(candidates, key=lambda c: c[0], reverse=True):
             try:
-                response = requests.get(f"{peer}/chain", timeout=2)
-                if response.status_code == 200:
-                    data = response.json()
-                    length = data['length']
-                    chain_data = data['chain']
-                    
-                    # Reconstruct chain from JSON
-                    chain = []
-                    for block_data in chain_data:
-                        block = Block(
-                            block_data['index'],
-                            block_data['transactions'],
-                            block_data['prev_hash']
-                        )
-                        block.timestamp = block_data.get('timestamp', block.timestamp)
-                        block.nonce = block_data['nonce']
-                        block.hash = block_data['hash']
-                        chain.append(block)
-                    
-                    # Keep track of longest valid chain
-                    if length > current_len and self.check_chain_validity(chain):
-                        current_len = length
-                        longest_chain = chain
+                if self.sync_from_peer(peer, length, tip, headers):
+                    return True
             except Exception as e:
-                # Skip peer if unreachable
-                print(f"Error connecting to peer {peer}: {e}")
+                print(f"Error syncing from peer {peer}: {e}")
                 continue
         
-        # Replace chain if longer valid chain found
-        if longest_chain:
-            self.chain = longest_chain
-            return True
-        
         return False
     
+    def sync_from_peer(self, peer, length, start, headers):
+        """
+        Download and adopt a peer's chain after the fork point.
+        
+        Args:
+            peer (str): Peer URL
+            length (int): Peer chain length
+            start (int): Height of headers[0]
+            headers (list): Header-only blocks already fetched from start
+            
+        Returns:
+            bool: True if our chain was replaced
+        """
+        limit = Blockchain.headers_per_request
+        fetched = list(headers)
+        top = start + len(headers)
+        
+        # 1. Walk back a page at a time until a header matches a verified block
+        fork = self._match_fork(headers)
+        while fork is None and start > 0:
+            page_start = max(0, start - limit)
+            _, page = self._fetch_headers(peer, page_start, start - page_start)
+            fetched = page + fetched
+            start = page_start
+            fork = self._match_fork(page)
+        if fork is None:
+            fork = -1
+        
+        # 2. Fetch the remaining headers up to the peer tip
+        while top < length:
+            _, page = self._fetch_headers(peer, top, limit)
+            if not page:
+                break
+            fetched.extend(page)
+            top += len(page)
+        
+        new_headers = [h for h in fetched if h.index > fork]
+        if self.chain_work(new_headers) <= self.chain_work(self.chain[fork + 1:]):
+            return False
+        
+        # 3. Reject bad chains before downloading any transactions
+        if self.validate_from(new_headers, fork + 1) is not None:
+            return False
+        
+        # 4. Download the bodies by hash range and check them against the headers
+        blocks = []
+        for i in range(0, len(new_headers), Blockchain.blocks_per_request):
+            batch = new_headers[i:i + Blockchain.blocks_per_request]
+            data = self.peer_client.get_json(peer, "/blocks", {
+                "from_hash": batch[0].hash,
+                "to_hash": batch[-1].hash
+            })
+            bodies = [Block.from_dict(b) for b in data["blocks"]]
+            if [b.hash for b in bodies] != [h.hash for h in batch]:
+                return False
+            blocks.extend(bodies)
+        
+        with self.lock:
+            # Our chain may have moved while we were downloading
+            if fork >= len(self.chain) or self.chain_work(blocks) <= self.chain_work(self.chain[fork + 1:]):
+                return False
+            if self.validate_from(blocks, fork + 1) is not None:
+                return False
+            
+            self.replace_chain(blocks, fork)
+        print(f"Synced {len(blocks)} blocks from {peer} (fork point #{fork})")
+        return True
+    
+    def _fetch_headers(self, peer, start, limit):
+        """Get (chain length, header-only blocks) from a peer."""
+        data = self.peer_client.get_json(peer, "/headers", {"from": start, "limit": limit})
+        return data["length"], [Block.from_dict(h) for h in data["headers"]]
+    
+    def _match_fork(self, headers):
+        """Highest header in the list that matches one of our verified blocks."""
+        for header in reversed(headers):
+            if header.index <= self.verified_height and self.hash_index.get(header.hash) == header.index:
+                return header.index
+        return None
+    
     def announce_block(self, block):
         """
-        Announce a newly mined block to all peers.
+        Announce a newly mined block through compact block gossip (header and
+        short transaction ids to a random subset of the peers, who relay it on).
+        Returns once those peers answered or the peer deadline passed.
         
         Args:
             block (Block): Block to announce
         """
-        for peer in self.peers:
-            try:
-                url = f"{peer}/add_block"
-                block_data = {
-                    "index": block.index,
-                    "timestamp": block.timestamp,
-                    "transactions": block.transactions,
-                    "prev_hash": block.prev_hash,
-                    "nonce": block.nonce,
-                    "hash": block.hash
-                }
-                requests.post(url, json=block_data, timeout=2)
-            except Exception as e:
-                print(f"Error announcing block to {peer}: {e}")
-                continue
+        self.gossip.announce(block)
@@ -1,18 +1,26 @@
-import base64
 import json
+import mimetypes
 import os
 import requests
 import uuid
-from flask import render_template, redirect, request, send_file, session, flash, url_for, jsonify
+from urllib.parse import quote
+from flask import render_template, redirect, request, send_file, session, flash, url_for, jsonify, Response
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
 from app import app
 from timeit import default_timer as timer
-from pymongo import MongoClient
 from dotenv import load_dotenv
 # Import blockchain classes for peer functionality
 from Blockchain import Blockchain as BlockchainClass
+from chain_config import apply_chain_config
 from Block import Block
+from mining_scheduler import MiningScheduler, MAX_BLOCK_TXS, MAX_TX_AGE
+from mempool import POOL_FULL_MESSAGE, tx_id
+from blob_store import open_blob_store, migrate_file_record
+from disk_cache import DiskCache, iter_file
+from chain_api import chain_response
+from shares import ShareRepository
+from db_schema import connect, bootstrap, SLOW_QUERY_MS
 
 # Load environment variables from the root .env file (2 levels up)
 dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env')
@@ -20,6 +28,10 @@ load_dotenv(dotenv_path)
 
 app.secret_key = "super_secret_key_for_hackathon" # Set a secret key for sessions
 
+# Uploads are streamed to the blob store, so the limit is not bounded by worker memory
+if os.environ.get("MAX_UPLOAD_MB"):
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ["MAX_UPLOAD_MB"]) * 1024 * 1024
+
 # Production-ready CORS configuration
 # Allow all origins for easier deployment - you can restrict this later
 CORS(app, resources={
@@ -33,17 +45,61 @@ CORS(app, resources={
 })
 
 # MongoDB Connection
+# Queries slower than SLOW_QUERY_MS are logged with their explain plan (0 disables)
 MONGODB_URI = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/file_storage")
-client = MongoClient(MONGODB_URI)
+client = connect(MONGODB_URI, "file_storage", float(os.environ.get("SLOW_QUERY_MS", SLOW_QUERY_MS)))
 db = client["file_storage"] # Explicitly use file_storage database
+bootstrap(db)
 users_col = db["users"]
 files_col = db["files"]
 
-# Initialize Blockchain (for peer functionality)
-blockchain = BlockchainClass(db=db)
+# Share grants, one document per (file, recipient), with cached listings.
+# Records still carrying a legacy "shared_with" array are moved into grants
+# here, so recipients never miss them (idempotent; a no-op once migrated)
+shares = ShareRepository(db)
+migrated_shares = shares.migrate_legacy(files_col)
+if migrated_shares:
+    print(f"DEBUG: Moved shared_with of {migrated_shares} file records into share grants")
+
+# Content-addressed chunk store for file content (GridFS unless BLOB_STORE=local)
+blob_store = open_blob_store(db)
 
-# Stores all the post transaction in the node
-request_tx = []
+# Local disk cache of whole files for downloads (BLOB_CACHE_MB=0 disables)
+BLOB_CACHE_MB = int(os.environ.get("BLOB_CACHE_MB", 512))
+blob_cache = DiskCache(os.environ.get("BLOB_CACHE_DIR", "app/cache"), BLOB_CACHE_MB * 1024 * 1024) if BLOB_CACHE_MB else None
+
+# Initialize Blockchain (for peer functionality)
+# With BLOCKCHAIN_DATA_DIR set the chain is kept in an on-disk block store and
+# MongoDB only mirrors it. SHARED_STATE=1 shares the chain and pending pool
+# through MongoDB instead, for several gunicorn workers
+apply_chain_config()
+SHARED_STATE = os.environ.get("SHARED_STATE", "0") == "1"
+blockchain = BlockchainClass(
+    db=db,
+    data_dir=None if SHARED_STATE else os.environ.get("BLOCKCHAIN_DATA_DIR"),
+    shared=SHARED_STATE
+)
+# Raises ValueError for an unknown policy, like --mempool-priority on peer.py
+blockchain.pending.priority = os.environ.get("MEMPOOL_PRIORITY", blockchain.pending.priority)
+
+# Background miner: owns blockchain.pending and seals blocks by size or age
+scheduler = MiningScheduler(
+    blockchain,
+    max_block_txs=int(os.environ.get("MINE_MAX_BLOCK_TXS", MAX_BLOCK_TXS)),
+    max_age=float(os.environ.get("MINE_MAX_TX_AGE", MAX_TX_AGE))
+)
+
+@app.before_request
+def refresh_shared_chain():
+    # Pick up blocks mined by other workers (throttled inside)
+    if SHARED_STATE:
+        blockchain.refresh_from_db()
+
+
+# Number of recent transactions shown on the home page
+HOME_TX_LIMIT = 50
+# Largest page served by /transactions
+MAX_TX_PAGE = 200
 #store filename
 files = {}
 #destiantion for upload files
@@ -52,29 +108,19 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 # store  address
 ADDR = os.environ.get("BLOCKCHAIN_NODE_ADDR", "http://127.0.0.1:8800")
 
-#create a list of requests that peers has send to upload files
+#list the most recent transactions on the chain (served from the transaction index)
 def get_tx_req():
-    global request_tx
     try:
-        # Get chain data directly from blockchain object (no HTTP call needed)
-        content = []
-        for block in blockchain.chain:
-            # block.transactions is a list of transaction dicts
-            for trans in block.transactions:
-                trans_copy = trans.copy()
-                trans_copy["index"] = block.index
-                trans_copy["hash"] = block.prev_hash
-                content.append(trans_copy)
-        request_tx = sorted(content, key=lambda k: k["hash"], reverse=True)
+        return blockchain.tx_index.latest(HOME_TX_LIMIT)
     except Exception as e:
         print(f"DEBUG: Error in get_tx_req: {e}")
-        request_tx = []
+        return []
 
 
 # Loads and runs the home page
 @app.route("/")
 def index():
-    get_tx_req()
+    request_tx = get_tx_req()
     user_key = session.get("user_key")
     username = session.get("username")
     
@@ -99,6 +145,35 @@ def index():
                            my_files=my_files)
 
 
+@app.route("/transactions", methods=["GET"])
+def list_transactions():
+    """
+    Paginated transactions from the chain, most recent first.
+    Query: ?limit=&offset= and optionally &user= to filter by uploader
+    """
+    limit = max(1, min(request.args.get("limit", HOME_TX_LIMIT, type=int), MAX_TX_PAGE))
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    user = request.args.get("user")
+
+    if user:
+        transactions = blockchain.tx_index.by_user(user, limit, offset)
+        total = blockchain.tx_index.count_by_user(user)
+    else:
+        transactions = blockchain.tx_index.latest(limit, offset)
+        total = len(blockchain.tx_index)
+
+    return jsonify({"total": total, "offset": offset, "limit": limit, "transactions": transactions})
+
+
+@app.route("/transactions/<string:file_key>", methods=["GET"])
+def get_transaction(file_key):
+    """The on-chain transaction that recorded a file"""
+    trans = blockchain.tx_index.by_file_key(file_key)
+    if trans is None:
+        return jsonify({"error": "Transaction not found on chain"}), 404
+    return jsonify(trans)
+
+
 @app.route("/api/get_key/<string:username>", methods=["GET"])
 def get_key(username):
     user = users_col.find_one({"username": username})
@@ -154,82 +229,89 @@ def submit():
     if not up_file or up_file.filename == '':
         return jsonify({"error": "No file provided"}), 400
 
-    # Read file content upfront to avoid stream exhaustion
-    file_content = up_file.read()
-    file_size = len(file_content)
-    
+    # Checked before storing anything: the transaction would be evicted on arrival
+    if blockchain.pending.rejects_new():
+        return jsonify({"error": POOL_FULL_MESSAGE}), 503, {"Retry-After": str(int(scheduler.max_age))}
+
     # Create a unique filename to avoid collisions
     timestamp = int(timer() * 1000)
     unique_id = str(uuid.uuid4())[:8]
     original_filename = up_file.filename
     secure_name = f"{timestamp}_{unique_id}_{secure_filename(original_filename)}"
-    
-    # Save the uploaded file in destination (for immediate access)
-    upload_path = os.path.join("app/static/Uploads/", secure_name)
-    os.makedirs(os.path.dirname(upload_path), exist_ok=True)
-    with open(upload_path, "wb") as f:
-        f.write(file_content)
         
     # Generate File Key
     file_key = str(uuid.uuid4())
     
-    # Store file content in MongoDB for persistence across server restarts
-    # This is critical for Render's ephemeral filesystem
-    file_base64 = base64.b64encode(file_content).decode('utf-8')
+    # Stream the upload into the chunked blob store, hashing chunk by chunk as it is written.
+    # Only one chunk is in memory at a time; the blob store survives Render's ephemeral disk
+    blob = blob_store.put_stream(up_file.stream)
+    file_size = blob["size"]
     
-    # Save Metadata + Content to MongoDB
+    # Save Metadata + chunk manifest to MongoDB
     files_col.insert_one({
         "file_key": file_key,
         "filename": original_filename, 
         "secure_name": secure_name,   
         "owner": user_key,
-        "shared_with": [],
-        "file_content": file_base64,
+        "blob": blob,
         "file_size": file_size,
         "created_at": timer()
     })
     print(f"DEBUG: File saved to MongoDB. FileKey: {file_key}, Owner: {user_key}")
 
-    # Create a transaction object
+    # Create a transaction object; the content digest puts the file's integrity on chain
     post_object = {
         "user": user,
         "v_file" : original_filename,
         "file_key": file_key,
         "file_data" : "Binary Content Stored in DB", # Placeholder for chain view
-        "file_size" : file_size
+        "file_size" : file_size,
+        "sha256": blob["sha256"]
     }
    
-    # Submit transaction directly to blockchain
-    blockchain.add_pending(post_object)
-    print(f"DEBUG: Transaction added to blockchain pending transactions")
+    # Queue transaction for the background miner and relay it to the peers
+    scheduler.submit(post_object)
+    blockchain.gossip.relay_transaction(post_object)
+    print(f"DEBUG: Transaction queued for mining")
     
     end = timer()
     print(f"DEBUG: Upload completed in {end - start}s")
     return jsonify({"success": True, "message": "File uploaded successfully", "file_key": file_key}), 200
 
+def _form_keys(name):
+    """Keys from a form field given several times and/or comma-separated"""
+    keys = []
+    for value in request.form.getlist(name):
+        keys.extend(k.strip() for k in value.split(",") if k.strip())
+    return list(dict.fromkeys(keys))
+
 @app.route("/share", methods=["POST"])
 def share_file():
     # Get data from form (for Next.js API compatibility)
-    file_key = request.form.get("file_key")
-    recipient_key = request.form.get("recipient_key")
+    # file_key and recipient_key may each list several keys for a bulk share
+    file_keys = _form_keys("file_key")
+    recipient_keys = _form_keys("recipient_key")
     owner_key = request.form.get("userKey") or session.get("user_key")
     
-    if not file_key or not recipient_key or not owner_key:
+    if not file_keys or not recipient_keys or not owner_key:
         return jsonify({"error": "Missing required fields"}), 400
     
-    print(f"DEBUG: Sharing file {file_key} from {owner_key} to {recipient_key}")
+    print(f"DEBUG: Sharing {len(file_keys)} file(s) from {owner_key} to {len(recipient_keys)} recipient(s)")
     
-    # Check ownership and share
-    result = files_col.update_one(
-        {"file_key": file_key, "owner": owner_key},
-        {"$addToSet": {"shared_with": recipient_key}}
-    )
-    
-    if result.matched_count == 0:
+    # Check ownership
+    owned = list(files_col.find(
+        {"file_key": {"$in": file_keys}, "owner": owner_key},
+        {"file_key": 1, "owner": 1, "filename": 1, "secure_name": 1}
+    ))
+    if len(owned) < len(file_keys):
         print(f"DEBUG: File not found or not owned by {owner_key}")
         return jsonify({"error": "File not found or not owned by you"}), 404
     
-    if result.modified_count > 0:
+    granted = sum(shares.share(f_data, recipient_keys) for f_data in owned)
+    
+    if len(file_keys) > 1 or len(recipient_keys) > 1:
+        return jsonify({"success": True, "message": f"{granted} new share(s) granted", "granted": granted}), 200
+    if granted > 0:
         print(f"DEBUG: File shared successfully")
         return jsonify({"success": True, "message": "File shared successfully"}), 200
     else:
@@ -237,6 +319,25 @@ def share_file():
         return jsonify({"success": True, "message": "File already shared with this user"}), 200
 
 
+@app.route("/revoke", methods=["POST"])
+def revoke_share():
+    # Without recipient_key every grant on the files is revoked
+    file_keys = _form_keys("file_key")
+    recipient_keys = _form_keys("recipient_key") or None
+    owner_key = request.form.get("userKey") or session.get("user_key")
+    
+    if not file_keys or not owner_key:
+        return jsonify({"error": "Missing required fields"}), 400
+    
+    owned = files_col.count_documents({"file_key": {"$in": file_keys}, "owner": owner_key})
+    if owned < len(file_keys):
+        return jsonify({"error": "File not found or not owned by you"}), 404
+    
+    revoked = sum(shares.revoke(file_key, recipient_keys) for file_key in file_keys)
+    print(f"DEBUG: Revoked {revoked} share(s) on {len(file_keys)} file(s)")
+    return jsonify({"success": True, "message": f"{revoked} share(s) revoked", "revoked": revoked}), 200
+
+
 @app.route("/view_shared", methods=["POST"])
 def view_shared():
     # Get keys from form data (for Next.js API compatibility)
@@ -246,16 +347,11 @@ def view_shared():
     if not sender_key or not my_key:
         return jsonify({"error": "Missing sender_key or userKey"}), 400
     
-    shared_files = []
-    
-    # Find files shared by sender_key with my_key
-    cursor = files_col.find({"owner": sender_key, "shared_with": my_key})
-    for f_val in cursor:
-        shared_files.append({
-            "filename": f_val["filename"],
-            "file_key": f_val["file_key"],
-            "secure_name": f_val["secure_name"]
-        })
+    # Files shared by sender_key with my_key (served from the grant index, cached briefly)
+    shared_files = [
+        {"filename": f["filename"], "file_key": f["file_key"], "secure_name": f["secure_name"]}
+        for f in shares.shared_with(my_key, owner=sender_key)
+    ]
     
     # If called from API, return JSON
     if request.form.get("userKey"):
@@ -264,32 +360,98 @@ def view_shared():
     # If called from Flask template, render HTML
     return render_template("shared_files.html", files=shared_files)
 
+def _content_disposition(filename):
+    """Attachment header with an ASCII fallback and the UTF-8 name (RFC 6266)"""
+    fallback = filename.encode("ascii", "ignore").decode("ascii").replace('"', "") or "download"
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
 #creates a download link for the file
 @app.route("/download/<string:file_key>", methods = ["GET"])
 def download_file_key(file_key):
     f_data = files_col.find_one({"file_key": file_key})
     
-    if f_data:
-        p = os.path.join(app.root_path, "static" , "Uploads", f_data["secure_name"])
-        
-        # Check if file exists on disk. If not, restore from MongoDB.
-        if not os.path.exists(p):
-            print(f"DEBUG: File {p} missing from disk. Restoring from MongoDB.")
-            if "file_content" in f_data:
-                try:
-                    os.makedirs(os.path.dirname(p), exist_ok=True)
-                    content = base64.b64decode(f_data["file_content"])
-                    with open(p, "wb") as f:
-                        f.write(content)
-                except Exception as e:
-                    print(f"DEBUG: Error restoring file: {e}")
-                    return "Error restoring file from cloud storage", 500
-            else:
-                return "File content not found in database", 404
-                
-        return send_file(p, as_attachment=True, download_name=f_data["filename"])
-            
-    return "File not found or access denied"
+    if not f_data:
+        return "File not found or access denied"
+    
+    if "blob" in f_data:
+        blob = f_data["blob"]
+    elif "file_content" in f_data:
+        # Legacy Base64 record: move it into the blob store on first access
+        print(f"DEBUG: Migrating legacy record {file_key} into blob store.")
+        blob = migrate_file_record(files_col, blob_store, f_data)
+    else:
+        return "File content not found in database", 404
+    
+    # The content hash is a strong validator: unchanged content is never resent
+    etag = blob["sha256"]
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+    
+    size = blob["size"]
+    start, stop, status = 0, size, 200
+    
+    # Single byte ranges (e.g. resumed downloads, PDF viewers). An If-Range validator must
+    # match our ETag; a date never does (we send no Last-Modified), so it gets the whole file.
+    # Multi-range requests are ignored and get the whole file (RFC 9110 14.2)
+    if (request.range and len(request.range.ranges) == 1
+            and ("If-Range" not in request.headers or request.if_range.etag == etag)):
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            return Response(status=416, headers={"Content-Range": f"bytes */{size}"})
+        start, stop = byte_range
+        status = 206
+    
+    headers = {
+        "Content-Length": str(stop - start),
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{etag}"',
+        "Content-Disposition": _content_disposition(f_data["filename"])
+    }
+    if status == 206:
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    
+    mimetype = mimetypes.guess_type(f_data["filename"])[0] or "application/octet-stream"
+    
+    # Hot files come from the local disk cache; files too large for it stream from the blob store
+    cached = blob_cache.open(etag, size, lambda f: blob_store.copy_to(blob, f)) if blob_cache else None
+    body = iter_file(cached, start, stop) if cached else blob_store.iter_range(blob, start, stop)
+    return Response(body, status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
+
+@app.route("/verify/<string:file_key>", methods=["GET"])
+def verify_file(file_key):
+    """Re-hash a stored file and check it against the digest recorded on chain"""
+    f_data = files_col.find_one({"file_key": file_key})
+    if not f_data:
+        return jsonify({"error": "File not found"}), 404
+    
+    trans = blockchain.tx_index.by_file_key(file_key)
+    if trans is None:
+        return jsonify({"error": "Transaction not found on chain"}), 404
+    if not trans.get("sha256"):
+        return jsonify({"error": "Transaction predates content digests"}), 409
+    
+    if "blob" in f_data:
+        blob = f_data["blob"]
+    elif "file_content" in f_data:
+        blob = migrate_file_record(files_col, blob_store, f_data)
+    else:
+        return jsonify({"error": "File content not found in database"}), 404
+    
+    # Read the stored chunks themselves (not the download cache)
+    start = timer()
+    digest, size = blob_store.content_digest(blob)
+    verified = digest == trans["sha256"] and size == trans.get("file_size", size)
+    print(f"DEBUG: Verified {file_key} in {timer() - start:.3f}s: {'ok' if verified else 'MISMATCH'}")
+    
+    return jsonify({
+        "file_key": file_key,
+        "verified": verified,
+        "chain_sha256": trans["sha256"],
+        "stored_sha256": digest,
+        "size": size,
+        "block_index": trans["index"]
+    }), 200
 
 @app.route("/submit/<string:variable>",methods = ["GET"])
 def download_file(variable):
@@ -309,36 +471,78 @@ def new_transaction():
         if not file_data.get(field):
             return "Transaction does not have valid fields!", 404
     
-    blockchain.add_pending(file_data)
+    file_key = file_data.get("file_key")
+    if tx_id(file_data) in blockchain.pending or (file_key and blockchain.tx_index.by_file_key(file_key)):
+        return "Transaction is already pending or on the chain", 200
+    if blockchain.pending.rejects_new():
+        return POOL_FULL_MESSAGE, 503, {"Retry-After": str(int(scheduler.max_age))}
+    
+    scheduler.submit(file_data)
+    blockchain.gossip.relay_transaction(file_data)
     return "Success", 201
 
 
 @app.route("/chain", methods=["GET"])
 def get_chain():
-    """Get the entire blockchain"""
-    chain = []
-    for block in blockchain.chain:
-        # Call __dict__() as a method, not attribute
-        chain.append(block.__dict__())
-    
-    print("Chain Len: {0}".format(len(chain)))
-    return json.dumps({"length": len(chain), "chain": chain})
+    """Get the blockchain (?from=&limit=&view=headers), streamed, 304 if unchanged"""
+    return chain_response(blockchain, request.args, request.if_none_match)
+
+
+@app.route("/headers", methods=["GET"])
+def get_headers():
+    """Get block headers from a height (?from=&limit=) for headers-first sync"""
+    start = request.args.get("from", 0, type=int)
+    limit = min(request.args.get("limit", BlockchainClass.headers_per_request, type=int),
+                BlockchainClass.headers_per_request)
+    return jsonify({"length": len(blockchain.chain), "headers": blockchain.get_headers(start, limit)})
+
+
+@app.route("/blocks", methods=["GET"])
+def get_blocks():
+    """Get full blocks for a hash range (?from_hash=&to_hash=)"""
+    from_hash = request.args.get("from_hash")
+    to_hash = request.args.get("to_hash")
+    if not from_hash or not to_hash:
+        return "Missing from_hash or to_hash", 400
+
+    blocks = blockchain.get_blocks(from_hash, to_hash, BlockchainClass.blocks_per_request)
+    if blocks is None:
+        return "Hash range not found on this chain", 404
+    return jsonify({"blocks": blocks})
+
+
+@app.route("/proof/<string:file_key>", methods=["GET"])
+def get_proof(file_key):
+    """Merkle inclusion proof for the transaction that recorded a file (see verify_proof.py)"""
+    try:
+        proof = blockchain.get_tx_proof(file_key)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    if proof is None:
+        return jsonify({"error": "Transaction not found on chain"}), 404
+    return jsonify(proof)
 
 
 @app.route("/mine", methods=["GET"])
 def mine_unconfirmed_transactions():
-    """Mine pending transactions"""
-    result = blockchain.mine()
-    if result:
-        return "Block #{0} mined successfully.".format(result)
-    else:
-        return "No pending transactions to mine."
+    """Queue a mining job; poll /mine/<job_id> for the result"""
+    job_id = scheduler.request_mine()
+    return jsonify({"message": "Mining job queued", "job_id": job_id}), 202
+
+
+@app.route("/mine/<string:job_id>", methods=["GET"])
+def get_mine_status(job_id):
+    """Get the status of a mining job"""
+    job = scheduler.job_status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    return jsonify(job), 200
 
 
 @app.route("/pending_tx")
 def get_pending_tx():
     """Get pending transactions"""
-    return json.dumps(blockchain.pending)
+    return json.dumps(blockchain.pending.transactions())
 
 
 @app.route("/add_block", methods=["POST"])
@@ -347,17 +551,36 @@ def validate_and_add_block():
     block_data = request.get_json()
     
     # Create a new block with the received data
-    block = Block(
-        block_data["index"],
-        block_data["transactions"],
-        block_data["prev_hash"]
-    )
-    hashl = block_data["hash"]
+    block = Block.from_dict(block_data)
     
-    # Try to add the block
-    added = blockchain.add_block(block, hashl)
+    # Tip, side branch (reorg if it gets heavier) or orphan until its parent arrives
+    status = blockchain.receive_block(block)
     
-    if not added:
+    if status == "invalid":
         return "The Block was discarded by the node.", 400
-    
-    return "The block was added to the chain.", 201
+    if status == "known":
+        return "The block is already known.", 200
+    if status in ("added", "reorg"):
+        return "The block was added to the chain.", 201
+    return f"The block was kept off the main chain ({status}).", 202
+
+
+@app.route("/gossip/block", methods=["POST"])
+def gossip_block():
+    """Receive a compact block announcement (header and short transaction ids)"""
+    reply = blockchain.gossip.on_compact_block(request.get_json())
+    return jsonify(reply), 400 if reply["status"] == "invalid" else 200
+
+
+@app.route("/gossip/tx", methods=["POST"])
+def gossip_transaction():
+    """Receive a transaction relayed by a peer"""
+    reply = blockchain.gossip.on_transaction(request.get_json(), scheduler.submit)
+    return jsonify(reply), 400 if reply["status"] == "invalid" else 200
+
+
+@app.route("/gossip/txs", methods=["POST"])
+def gossip_transactions():
+    """Receive the missing transactions of an announced block"""
+    reply = blockchain.gossip.on_transactions(request.get_json())
+    return jsonify(reply), 400 if reply["status"] == "invalid" else 200
@@ -0,0 +1,157 @@
+# Audit every stored file against the content digest recorded on chain.
+# Files are re-hashed from the blob store in a process pool (one MongoDB
+# connection per worker). The chain is opened read-only (the block store when
+# BLOCKCHAIN_DATA_DIR is set, else the MongoDB blocks, which are validated) and
+# never written to. Reports throughput, mismatches and files that cannot be
+# checked; exits with status 1 if any file does not match, 2 if there is no
+# valid chain to audit against.
+#
+# Usage: python audit_files.py [--workers N] [--json report.json]
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from timeit import default_timer as timer
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from blob_store import open_blob_store
+from Blockchain import Blockchain
+from chain_config import apply_chain_config
+from chain_store import ChainStore, LazyChain
+from persistence import BlockRepository
+from tx_index import TransactionIndex
+
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env'))
+
+MONGODB_URI = os.environ.get("MONGODB_URI", "mongodb://localhost:27017/file_storage")
+
+# Blob store of the current worker process
+_store = None
+
+
+def _init_worker():
+    global _store
+    _store = open_blob_store(MongoClient(MONGODB_URI)["file_storage"])
+
+
+def _hash_file(job):
+    file_key, manifest, expected = job
+    start = timer()
+    try:
+        digest, size = _store.content_digest(manifest)
+    except Exception as e:
+        return file_key, expected, None, 0, timer() - start, str(e)
+    return file_key, expected, digest, size, timer() - start, None
+
+
+def load_chain(db, data_dir=None):
+    """
+    Open the stored chain without creating or changing anything.
+
+    Args:
+        db: MongoDB database instance
+        data_dir (str): Block store directory (None to read MongoDB)
+
+    Returns:
+        list|LazyChain: Stored blocks (empty if there is no chain)
+    """
+    if data_dir is not None:
+        try:
+            return LazyChain(ChainStore(data_dir, readonly=True))
+        except FileNotFoundError:
+            return []
+    return BlockRepository(db).load()
+
+
+def audit(tx_index, files_col, workers):
+    """
+    Re-hash stored files and compare them with the chain.
+
+    Args:
+        tx_index (TransactionIndex): Index over the chain
+        files_col: MongoDB "files" collection
+        workers (int): Hashing processes
+
+    Returns:
+        dict: Report with counts, throughput and the files that failed
+    """
+    report = {
+        "files": 0, "verified": 0, "bytes": 0,
+        "mismatches": [], "errors": [],
+        "not_on_chain": [], "no_digest": [], "legacy_records": []
+    }
+
+    def jobs():
+        for f_data in files_col.find({}, {"file_key": 1, "blob": 1, "file_content": 1}):
+            file_key = f_data["file_key"]
+            trans = tx_index.by_file_key(file_key)
+            if trans is None:
+                report["not_on_chain"].append(file_key)
+            elif not trans.get("sha256"):
+                report["no_digest"].append(file_key)
+            elif "blob" not in f_data:
+                # Base64 record: run migrate_blobs.py first
+                report["legacy_records"].append(file_key)
+            else:
+                yield file_key, f_data["blob"], trans["sha256"]
+
+    start = timer()
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        for file_key, expected, digest, size, elapsed, error in pool.imap_unordered(_hash_file, jobs(), chunksize=4):
+            report["files"] += 1
+            report["bytes"] += size
+            if error is not None:
+                report["errors"].append({"file_key": file_key, "error": error})
+                print(f"ERROR {file_key}: {error}")
+            elif digest != expected:
+                report["mismatches"].append({"file_key": file_key, "chain_sha256": expected, "stored_sha256": digest})
+                print(f"MISMATCH {file_key}: chain {expected}, stored {digest}")
+            else:
+                report["verified"] += 1
+    elapsed = timer() - start
+
+    report["seconds"] = round(elapsed, 3)
+    report["files_per_second"] = round(report["files"] / elapsed, 1) if elapsed else None
+    report["mb_per_second"] = round(report["bytes"] / elapsed / 1e6, 1) if elapsed else None
+    report["workers"] = workers
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audit stored files against on-chain content digests")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Hashing processes")
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    # Validate with the node's POW_DIFFICULTY and BLOCK_TIME
+    apply_chain_config()
+    client = MongoClient(MONGODB_URI)
+    db = client["file_storage"]
+    data_dir = os.environ.get("BLOCKCHAIN_DATA_DIR")
+    chain = load_chain(db, data_dir)
+    if not chain:
+        print(f"No chain in {data_dir or 'MongoDB'}, nothing to audit against")
+        sys.exit(2)
+    # The block store only ever holds validated blocks; the MongoDB copy is checked
+    # as the node does at startup (a Blockchain without storage serves as the validator)
+    if data_dir is None and Blockchain().validate_from(chain, 0) is not None:
+        print("Stored chain is not valid, refusing to audit against it")
+        sys.exit(2)
+
+    tx_index = TransactionIndex()
+    tx_index.rebuild(chain)
+    report = audit(tx_index, db["files"], args.workers)
+    print(f"Checked {report['files']} files ({report['bytes'] / 1e6:.1f} MB) in {report['seconds']}s "
+          f"with {report['workers']} workers: {report['files_per_second']} files/s, {report['mb_per_second']} MB/s")
+    print(f"Verified {report['verified']}, mismatches {len(report['mismatches'])}, errors {len(report['errors'])}")
+    print(f"Not checked: {len(report['not_on_chain'])} not on chain, {len(report['no_digest'])} without an "
+          f"on-chain digest, {len(report['legacy_records'])} legacy records (run migrate_blobs.py)")
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(report, out, indent=2)
+
+    sys.exit(1 if report["mismatches"] or report["errors"] else 0)
@@ -0,0 +1,326 @@
+"""
+Reproducible benchmarks for the blockchain package.
+
+Suites:
+- hashrate: hashes per second of each proof of work strategy, measured over a
+  fixed number of nonces against a target nothing can meet
+- solve: time-to-solution distribution of each strategy over many seeded blocks
+- validate: check_chain_validity throughput on synthetic chains of 1k to 100k blocks
+- serialize: cost of Block.generate_hash, which re-encodes the block (cold),
+  and per nonce on a mining template (warm), by block version and size
+
+Blocks, transactions and nonce sequences are derived from --seed, so two runs
+on the same machine do the same work. Results are flat records written as JSON
+(with the run metadata) or CSV, one row per measurement.
+
+Usage: python benchmark.py [--suite hashrate solve] [--difficulties 2 3.5] [--format csv] [--output results.csv]
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from timeit import default_timer as timer
+
+from Block import Block, BLOCK_VERSION, LEGACY_VERSION
+from Blockchain import Blockchain
+from difficulty import difficulty_to_target, meets_target
+from miner import _search
+
+SUITES = ("hashrate", "solve", "validate", "serialize")
+STRATEGIES = ("random", "incremental", "parallel")
+
+
+def random_transactions(rng, count):
+    """
+    Transactions shaped like file uploads.
+
+    Args:
+        rng (random.Random): Seeded generator
+        count (int): Number of transactions
+
+    Returns:
+        list: Transactions
+    """
+    return [{
+        "user": f"user{rng.randrange(1000)}",
+        "v_file": f"file{rng.randrange(10 ** 6)}.bin",
+        "file_key": "%032x" % rng.getrandbits(128),
+        "file_size": rng.randint(1, 10 ** 7)
+    } for _ in range(count)]
+
+
+def seeded_block(seed, tx_count, version=BLOCK_VERSION):
+    """Block whose contents (timestamp included) depend only on the seed."""
+    rng = random.Random(seed)
+    block = Block(rng.randrange(1, 10 ** 6), random_transactions(rng, tx_count), "%064x" % rng.getrandbits(256), version)
+    block.timestamp = 1.7e9 + seed
+    return block
+
+
+def summarize(samples):
+    """Distribution of a list of durations (seconds)."""
+    ordered = sorted(samples)
+    return {
+        "samples": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "min": ordered[0],
+        "p50": ordered[len(ordered) // 2],
+        "p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        "max": ordered[-1]
+    }
+
+
+def bench_hashrate(args):
+    """
+    Hashes per second of each strategy's inner loop.
+    The random and incremental loops run in this process exactly like
+    Blockchain.p_o_w / p_o_w_2; the parallel one runs miner workers over
+    disjoint nonce ranges, process start-up included.
+    """
+    block = seeded_block(args.seed, args.txs)
+    results = []
+
+    for strategy in args.strategies:
+        if strategy == "parallel":
+            prefix, suffix = block.header_prefix()
+            ctx = multiprocessing.get_context()
+            found = ctx.Event()
+            queue = ctx.Queue()
+            span = args.hashes // args.workers
+            start = timer()
+            processes = [
+                ctx.Process(target=_search, args=(prefix, suffix, 0, i * span, (i + 1) * span, found, queue))
+                for i in range(args.workers)
+            ]
+            for p in processes:
+                p.start()
+            for p in processes:
+                p.join()
+            elapsed = timer() - start
+            hashes = span * args.workers
+        else:
+            rng = random.Random(args.seed)
+            template = block.hash_template()
+            start = timer()
+            for i in range(args.hashes):
+                block.nonce = rng.randint(0, 99999999) if strategy == "random" else i
+                meets_target(block.hash_with_nonce(block.nonce, template), 0)
+            elapsed = timer() - start
+            hashes = args.hashes
+
+        results.append({
+            "suite": "hashrate",
+            "strategy": strategy,
+            "workers": args.workers if strategy == "parallel" else 1,
+            "txs": args.txs,
+            "hashes": hashes,
+            "seconds": elapsed,
+            "hashes_per_sec": hashes / elapsed
+        })
+    return results
+
+
+def bench_solve(args):
+    """Time-to-solution of each strategy over args.seeds blocks per difficulty."""
+    chain = Blockchain()
+    results = []
+
+    for difficulty in args.difficulties:
+        target = difficulty_to_target(difficulty)
+        for strategy in args.strategies:
+            samples = []
+            for seed in range(args.seed, args.seed + args.seeds):
+                block = seeded_block(seed, args.txs)
+                block.target = target
+                random.seed(seed)  # p_o_w draws its nonces from the global generator
+                start = timer()
+                if strategy == "random":
+                    chain.p_o_w(block)
+                elif strategy == "incremental":
+                    chain.p_o_w_2(block)
+                else:
+                    chain.p_o_w_parallel(block, args.workers)
+                samples.append(timer() - start)
+
+            results.append({
+                "suite": "solve",
+                "strategy": strategy,
+                "workers": args.workers if strategy == "parallel" else 1,
+                "difficulty": difficulty,
+                "txs": args.txs,
+                **summarize(samples)
+            })
+    return results
+
+
+def build_chain(length, tx_count, seed):
+    """
+    Valid chain of the given length at the current Blockchain.difficulty.
+    Blocks are exactly target_block_time apart, so retargeting keeps every
+    target at the minimum and building stays cheap.
+    """
+    rng = random.Random(seed)
+    builder = Blockchain()
+    genesis = Block(0, [], "0")
+    genesis.timestamp = 1.7e9
+    genesis.hash = genesis.generate_hash()
+    builder.chain = [genesis]
+
+    for height in range(1, length):
+        block = Block(height, random_transactions(rng, tx_count), builder.chain[-1].hash)
+        block.timestamp = genesis.timestamp + height * Blockchain.target_block_time
+        block.target = builder.next_target()
+        block.hash = builder.p_o_w_2(block)
+        builder.chain.append(block)
+    return builder.chain
+
+
+def bench_validate(args):
+    """check_chain_validity throughput on fresh nodes (no block is trusted)."""
+    floor, block_time = Blockchain.difficulty, Blockchain.target_block_time
+    Blockchain.difficulty, Blockchain.target_block_time = args.chain_difficulty, 10.0
+    try:
+        full = build_chain(max(args.chain_sizes), args.txs, args.seed)
+        results = []
+        for size in args.chain_sizes:
+            # Decode as a peer's blocks would be
+            chain = [Block.from_dict(block.__dict__()) for block in full[:size]]
+            validator = Blockchain()
+            start = timer()
+            valid = validator.check_chain_validity(chain)
+            elapsed = timer() - start
+            if not valid:
+                raise RuntimeError(f"Synthetic chain of {size} blocks failed validation")
+
+            results.append({
+                "suite": "validate",
+                "blocks": size,
+                "txs": args.txs,
+                "difficulty": args.chain_difficulty,
+                "seconds": elapsed,
+                "blocks_per_sec": size / elapsed
+            })
+        return results
+    finally:
+        Blockchain.difficulty, Blockchain.target_block_time = floor, block_time
+
+
+def bench_serialize(args):
+    """
+    Microseconds per hash, re-encoding the block (cold) or on a mining
+    template (warm), and the one-off cost of building the template.
+    """
+    results = []
+    for version in (LEGACY_VERSION, BLOCK_VERSION):
+        for tx_count in args.tx_counts:
+            block = seeded_block(args.seed, tx_count, version)
+            block.target = difficulty_to_target(Blockchain.difficulty)
+            loops = max(10, args.hashes // max(1, tx_count * 10))
+
+            start = timer()
+            for i in range(loops):
+                block.nonce = i
+                block.generate_hash()
+            cold = (timer() - start) / loops
+
+            start = timer()
+            template = block.hash_template()
+            build = timer() - start
+
+            start = timer()
+            for i in range(loops):
+                block.nonce = i
+                block.hash_with_nonce(i, template)
+            warm = (timer() - start) / loops
+
+            results.append({
+                "suite": "serialize",
+                "version": version,
+                "txs": tx_count,
+                "loops": loops,
+                "cold_us": cold * 1e6,
+                "warm_us": warm * 1e6,
+                "template_us": build * 1e6
+            })
+    return results
+
+
+BENCHMARKS = {
+    "hashrate": bench_hashrate,
+    "solve": bench_solve,
+    "validate": bench_validate,
+    "serialize": bench_serialize
+}
+
+
+def write_results(results, meta, fmt, out):
+    """
+    Write results as one JSON document or as CSV rows.
+
+    Args:
+        results (list): Flat result records
+        meta (dict): Run metadata (JSON only)
+        fmt (str): "json" or "csv"
+        out: Text stream
+    """
+    if fmt == "json":
+        json.dump({"meta": meta, "results": results}, out, indent=2)
+        out.write("\n")
+        return
+
+    fields = []
+    for record in results:
+        fields.extend(k for k in record if k not in fields)
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Blockchain benchmarks")
+    parser.add_argument("--suite", nargs="+", choices=SUITES, default=list(SUITES), help="Suites to run")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES),
+                        help="Proof of work strategies (hashrate, solve)")
+    parser.add_argument("--seed", type=int, default=0, help="First seed")
+    parser.add_argument("--seeds", type=int, default=20, help="Blocks solved per strategy and difficulty")
+    parser.add_argument("--difficulties", nargs="+", type=float, default=[2, 3, 4],
+                        help="Difficulties for the solve suite")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for the parallel strategy")
+    parser.add_argument("--hashes", type=int, default=200000, help="Nonces per hashrate measurement")
+    parser.add_argument("--txs", type=int, default=10, help="Transactions per block")
+    parser.add_argument("--tx-counts", nargs="+", type=int, default=[1, 10, 100, 1000],
+                        help="Block sizes for the serialize suite")
+    parser.add_argument("--chain-sizes", nargs="+", type=int, default=[1000, 10000, 100000],
+                        help="Chain lengths for the validate suite")
+    parser.add_argument("--chain-difficulty", type=float, default=1,
+                        help="Difficulty of the synthetic chains (validation cost does not depend on it)")
+    parser.add_argument("--format", choices=("json", "csv"), default="json", help="Output format")
+    parser.add_argument("--output", help="Output file (stdout by default)")
+    args = parser.parse_args()
+
+    meta = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args)
+    }
+
+    results = []
+    for suite in args.suite:
+        print(f"Running {suite}...", file=sys.stderr)
+        results.extend(BENCHMARKS[suite](args))
+
+    if args.output:
+        with open(args.output, "w", newline="") as out:
+            write_results(results, meta, args.format, out)
+    else:
+        write_results(results, meta, args.format, sys.stdout)
@@ -0,0 +1,131 @@
+"""
+Blocks off the main chain.
+
+The main chain stays in Blockchain.chain. The tree keeps everything else a
+node has seen:
+- side blocks: blocks on competing branches, indexed by hash, so a branch
+  that overtakes the main chain is applied without downloading it again
+- orphans: blocks whose parent has not arrived yet (announcements out of
+  order), attached as soon as the parent shows up
+
+Both are bounded and evict their oldest entries first. The tree is not
+thread-safe; Blockchain only uses it while holding its lock.
+"""
+
+from collections import OrderedDict
+
+# Default bounds on the number of blocks kept
+MAX_SIDE_BLOCKS = 1000
+MAX_ORPHANS = 200
+
+
+class BlockTree:
+    """
+    Side branches and orphan blocks, indexed by hash.
+    """
+
+    def __init__(self, max_blocks=MAX_SIDE_BLOCKS, max_orphans=MAX_ORPHANS):
+        """
+        Initialize an empty tree.
+
+        Args:
+            max_blocks (int): Maximum number of side blocks
+            max_orphans (int): Maximum number of orphans
+        """
+        self.max_blocks = max_blocks
+        self.max_orphans = max_orphans
+        self.blocks = OrderedDict()  # hash -> side block, oldest first
+        self.orphans = OrderedDict()  # hash -> orphan, oldest first
+        self._waiting = {}  # parent hash -> hashes of the orphans waiting on it
+
+    def __contains__(self, block_hash):
+        return block_hash in self.blocks or block_hash in self.orphans
+
+    def __len__(self):
+        return len(self.blocks) + len(self.orphans)
+
+    def get(self, block_hash):
+        """Side block with this hash, None if there is none."""
+        return self.blocks.get(block_hash)
+
+    def add(self, block):
+        """
+        Keep a block whose parent is known (on the main chain or a side branch).
+
+        Args:
+            block (Block): Block with its hash set
+        """
+        self.blocks[block.hash] = block
+        self.blocks.move_to_end(block.hash)
+        while len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+
+    def add_orphan(self, block):
+        """
+        Keep a block until its parent arrives.
+
+        Args:
+            block (Block): Block with its hash set
+        """
+        self.orphans[block.hash] = block
+        self._waiting.setdefault(block.prev_hash, set()).add(block.hash)
+        while len(self.orphans) > self.max_orphans:
+            _, evicted = self.orphans.popitem(last=False)
+            self._forget_orphan(evicted)
+
+    def take_orphans(self, parent_hash):
+        """
+        Remove and return the orphans whose parent is a given block.
+
+        Args:
+            parent_hash (str): Hash of the block that just arrived
+
+        Returns:
+            list: Orphans, oldest first
+        """
+        hashes = self._waiting.pop(parent_hash, set())
+        children = [self.orphans.pop(h) for h in list(self.orphans) if h in hashes]
+        return children
+
+    def _forget_orphan(self, block):
+        waiting = self._waiting.get(block.prev_hash)
+        if waiting is not None:
+            waiting.discard(block.hash)
+            if not waiting:
+                del self._waiting[block.prev_hash]
+
+    def remove(self, hashes):
+        """
+        Drop blocks (e.g. once they are on the main chain or found invalid).
+
+        Args:
+            hashes (iterable): Block hashes; unknown ones are ignored
+        """
+        for block_hash in hashes:
+            self.blocks.pop(block_hash, None)
+            orphan = self.orphans.pop(block_hash, None)
+            if orphan is not None:
+                self._forget_orphan(orphan)
+
+    def branch(self, tip_hash, main_index):
+        """
+        Side branch from the main chain up to a side block.
+
+        Args:
+            tip_hash (str): Hash of the last block of the branch
+            main_index (dict): Main chain hash -> height
+
+        Returns:
+            tuple|None: (fork height, blocks oldest first), or None if the
+                branch does not reach the main chain through known blocks
+        """
+        blocks = []
+        block = self.blocks.get(tip_hash)
+        while block is not None:
+            blocks.append(block)
+            fork = main_index.get(block.prev_hash)
+            if fork is not None:
+                blocks.reverse()
+                return fork, blocks
+            block = self.blocks.get(block.prev_hash)
+        return None
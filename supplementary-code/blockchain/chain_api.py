@@ -0,0 +1,75 @@
+"""
+/chain endpoint shared by peer.py and the client app.
+
+Query parameters:
+- from: first height (default 0)
+- limit: number of blocks (default: up to the tip)
+- view: "full" (default) or "headers" for headers without transactions
+
+The tip hash identifies the whole chain, so it is the ETag (together with
+the requested range and view): a client repeating a request on an unchanged
+chain gets 304 without any block being read. The body is streamed a page at
+a time, so memory stays flat whatever the size of the chain. If a reorg
+replaces blocks in the range while the response is streamed, it stops at
+that point and ends with "complete": false.
+"""
+
+import json
+
+from flask import Response
+
+# Blocks read from the chain per step of the stream
+STREAM_PAGE = 100
+
+VIEWS = ("full", "headers")
+
+
+def chain_etag(tip_hash, start, stop, view):
+    """Strong ETag (unquoted) for a range of the chain below a given tip."""
+    return f"{tip_hash}.{start}.{stop}.{view}"
+
+
+def chain_response(blockchain, args, if_none_match):
+    """
+    Build the /chain response.
+
+    Args:
+        blockchain (Blockchain): Node state
+        args: Query parameters (request.args)
+        if_none_match: ETags sent by the client (request.if_none_match)
+
+    Returns:
+        flask.Response: Streamed JSON, 304, or 400 for a bad view
+    """
+    view = args.get("view", "full")
+    if view not in VIEWS:
+        return Response(json.dumps({"error": f"Unknown view: {view}"}), status=400, mimetype="application/json")
+
+    with blockchain.lock:
+        length = len(blockchain.chain)
+        tip_hash = blockchain.last_block().hash
+    start = max(0, args.get("from", 0, type=int))
+    limit = args.get("limit", type=int)
+    stop = length if limit is None else min(length, start + max(0, limit))
+    start = min(start, stop)
+
+    etag = chain_etag(tip_hash, start, stop, view)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if etag in if_none_match:
+        return Response(status=304, headers=headers)
+
+    def generate():
+        yield json.dumps({"length": length, "tip": tip_hash, "from": start})[:-1] + ', "chain": ['
+        complete = True
+        for page_start in range(start, stop, STREAM_PAGE):
+            with blockchain.lock:
+                # The blocks below the tip we started from only change in a reorg
+                if blockchain.hash_index.get(tip_hash) != length - 1:
+                    complete = False
+                    break
+                blocks = blockchain.snapshot(page_start, min(stop, page_start + STREAM_PAGE))
+            encoded = [json.dumps(block.header() if view == "headers" else block.__dict__()) for block in blocks]
+            yield ("," if page_start > start else "") + ",".join(encoded)
+        yield '], "complete": ' + json.dumps(complete) + "}"
+
+    return Response(generate(), mimetype="application/json", headers=headers)
@@ -0,0 +1,56 @@
+"""
+Chain settings from the environment.
+
+Every node of a network must use the same proof of work floor and target
+block time, and a tool that validates a chain must use the values of the
+node that wrote it, otherwise valid chains are rejected (or weak ones
+accepted). Every entry point that builds or checks a chain (client app,
+peer, migration and audit scripts, light clients) calls
+apply_chain_config() first, so the environment is read in one place. The
+repository's .env is loaded too, for the tools that do not load it
+themselves (variables already set win).
+
+| Env | Blockchain attribute |
+|-----|----------------------|
+| POW_DIFFICULTY | difficulty (minimum difficulty) |
+| BLOCK_TIME | target_block_time |
+| POW_WORKERS | mining_workers |
+| BLOCK_TX_LIMIT | block_tx_limit |
+"""
+
+import os
+
+from dotenv import load_dotenv
+from Blockchain import Blockchain
+
+ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
+
+# Env variable -> (Blockchain attribute, type)
+CHAIN_SETTINGS = {
+    "POW_DIFFICULTY": ("difficulty", float),
+    "BLOCK_TIME": ("target_block_time", float),
+    "POW_WORKERS": ("mining_workers", int),
+    "BLOCK_TX_LIMIT": ("block_tx_limit", int),
+}
+
+
+def apply_chain_config(environ=None):
+    """
+    Set the Blockchain class settings from the environment; unset variables
+    keep the class defaults. Command line flags applied afterwards win.
+
+    Args:
+        environ (dict): Variables to read (defaults to os.environ plus .env)
+
+    Returns:
+        dict: attribute -> value in effect
+    """
+    if environ is None:
+        load_dotenv(ENV_FILE)
+        environ = os.environ
+    applied = {}
+    for name, (attribute, cast) in CHAIN_SETTINGS.items():
+        if environ.get(name):
+            setattr(Blockchain, attribute, cast(environ[name]))
+        applied[attribute] = getattr(Blockchain, attribute)
+    return applied
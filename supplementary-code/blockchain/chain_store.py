@@ -0,0 +1,317 @@
+"""
+Append-only on-disk block store.
+
+Blocks live in two files inside a data directory:
+- blocks.dat: one record per block, a fixed header (payload length, CRC-32)
+  followed by the block encoded as canonical JSON (sorted keys, no spaces)
+- blocks.idx: one fixed-width entry per block, the record offset in
+  blocks.dat followed by the raw 32-byte block hash
+
+Both files are read through mmap, so opening a chain costs the same whatever
+its length and a block is only decoded when it is accessed. LazyChain wraps
+a store as the list-like Blockchain.chain.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+from Block import Block
+
+RECORD_HEADER = struct.Struct(">II")  # payload length, CRC-32 of the payload
+INDEX_ENTRY = struct.Struct(">Q32s")  # record offset, block hash
+
+# Number of decoded blocks kept in memory by LazyChain
+DECODE_CACHE_SIZE = 256
+
+
+def encode_block(block):
+    """
+    Canonical encoding of a block (same bytes for the same block on every node).
+
+    Args:
+        block (Block): Block to encode
+
+    Returns:
+        bytes: Compact JSON with sorted keys
+    """
+    return json.dumps(block.__dict__(), sort_keys=True, separators=(",", ":")).encode()
+
+
+def decode_block(payload):
+    """Rebuild a block from encode_block() output."""
+    return Block.from_dict(json.loads(payload))
+
+
+class ChainStore:
+    """
+    Append-only block file with a fixed-width offset index.
+    """
+
+    def __init__(self, directory, readonly=False):
+        """
+        Open (or create) the store and drop any record left half-written by a crash.
+
+        Args:
+            directory (str): Data directory holding blocks.dat and blocks.idx
+            readonly (bool): Open an existing store without ever writing to it
+                (safe next to a running node; a half-written record is skipped)
+
+        Raises:
+            FileNotFoundError: If readonly and there is no store in the directory
+        """
+        self.data_path = os.path.join(directory, "blocks.dat")
+        self.index_path = os.path.join(directory, "blocks.idx")
+        self.readonly = readonly
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+            for path in (self.data_path, self.index_path):
+                if not os.path.exists(path):
+                    open(path, "wb").close()
+
+        mode = "rb" if readonly else "r+b"
+        self._data = open(self.data_path, mode)
+        self._index = open(self.index_path, mode)
+        self._data_map = None
+        self._index_map = None
+        self._lock = threading.RLock()
+        self._count = 0
+        self._recover()
+
+    def _recover(self):
+        """Make both files end on the last complete record."""
+        index_size = os.fstat(self._index.fileno()).st_size
+        data_size = os.fstat(self._data.fileno()).st_size
+        count = index_size // INDEX_ENTRY.size
+
+        # Drop index entries whose record did not make it to disk; records
+        # are contiguous, so every entry must start where the previous one ends
+        end = 0
+        while count > 0:
+            offset, _ = self._read_entry(count - 1)
+            expected = self._record_end(count - 2, data_size) if count > 1 else 0
+            end = self._record_end(count - 1, data_size)
+            if offset == expected and end is not None:
+                break
+            count -= 1
+            end = 0
+
+        # A read-only view just ignores the partial record (the writer may still be appending it)
+        if not self.readonly and (index_size != count * INDEX_ENTRY.size or data_size != end):
+            print(f"DEBUG: Chain store recovered to {count} blocks")
+            self._index.truncate(count * INDEX_ENTRY.size)
+            self._data.truncate(end)
+        self._count = count
+
+    def _record_end(self, height, data_size):
+        """Offset just past a record, None if it runs past the end of blocks.dat."""
+        offset, _ = self._read_entry(height)
+        self._data.seek(offset)
+        header = self._data.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        end = offset + RECORD_HEADER.size + RECORD_HEADER.unpack(header)[0]
+        return end if end <= data_size else None
+
+    def _read_entry(self, height):
+        """Index entry read with plain file I/O (used before the maps exist)."""
+        self._index.seek(height * INDEX_ENTRY.size)
+        return INDEX_ENTRY.unpack(self._index.read(INDEX_ENTRY.size))
+
+    def _unmap(self):
+        for m in (self._data_map, self._index_map):
+            if m is not None:
+                m.close()
+        self._data_map = None
+        self._index_map = None
+
+    def _maps(self):
+        """Current (data, index) maps, remapped when the files have grown."""
+        index_size = self._count * INDEX_ENTRY.size
+        if self._index_map is None or len(self._index_map) < index_size:
+            self._unmap()
+            if index_size:
+                self._index.flush()
+                self._data.flush()
+                self._index_map = mmap.mmap(self._index.fileno(), 0, access=mmap.ACCESS_READ)
+                self._data_map = mmap.mmap(self._data.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._data_map, self._index_map
+
+    def __len__(self):
+        return self._count
+
+    def read(self, height):
+        """
+        Decode the block at a height.
+
+        Args:
+            height (int): Block height (0 <= height < len(store))
+
+        Returns:
+            Block: Decoded block
+
+        Raises:
+            ValueError: If the record is corrupt
+        """
+        with self._lock:
+            data_map, index_map = self._maps()
+            offset, _ = INDEX_ENTRY.unpack_from(index_map, height * INDEX_ENTRY.size)
+            length, crc = RECORD_HEADER.unpack_from(data_map, offset)
+            start = offset + RECORD_HEADER.size
+            payload = data_map[start:start + length]
+
+        if zlib.crc32(payload) != crc:
+            raise ValueError(f"Corrupt record for block #{height} in {self.data_path}")
+        return decode_block(payload)
+
+    def hash_at(self, height):
+        """Hash of the block at a height, read from the index only."""
+        with self._lock:
+            _, index_map = self._maps()
+            _, digest = INDEX_ENTRY.unpack_from(index_map, height * INDEX_ENTRY.size)
+        return digest.hex()
+
+    def append(self, blocks):
+        """
+        Append blocks and flush them to disk in one go.
+
+        Args:
+            blocks (list): Blocks for heights len(store), len(store) + 1, ...
+        """
+        with self._lock:
+            self._data.seek(0, os.SEEK_END)
+            self._index.seek(0, os.SEEK_END)
+            offset = self._data.tell()
+            records = []
+            entries = []
+            for height, block in enumerate(blocks, self._count):
+                if block.index != height:
+                    raise ValueError(f"Expected block #{height}, got #{block.index}")
+                payload = encode_block(block)
+                records.append(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+                entries.append(INDEX_ENTRY.pack(offset, bytes.fromhex(block.hash)))
+                offset += len(records[-1])
+
+            # Records first, then the index: a crash in between leaves records
+            # without index entries, which _recover() trims
+            self._data.write(b"".join(records))
+            self._data.flush()
+            os.fsync(self._data.fileno())
+            self._index.write(b"".join(entries))
+            self._index.flush()
+            os.fsync(self._index.fileno())
+            self._count += len(entries)
+
+    def truncate(self, height):
+        """
+        Drop every block at or above a height.
+
+        Args:
+            height (int): New number of blocks
+        """
+        with self._lock:
+            if height >= self._count:
+                return
+            end = self._read_entry(height)[0]
+            # Truncating a mapped file is not portable and would fault readers
+            self._unmap()
+            self._index.truncate(height * INDEX_ENTRY.size)
+            self._index.flush()
+            os.fsync(self._index.fileno())
+            self._data.truncate(end)
+            self._data.flush()
+            os.fsync(self._data.fileno())
+            self._count = height
+
+    def close(self):
+        with self._lock:
+            self._unmap()
+            self._data.close()
+            self._index.close()
+
+
+class LazyChain:
+    """
+    List-like view of a ChainStore used as Blockchain.chain.
+    Supports len, indexing and slicing, iteration, append/extend and
+    truncation with del chain[height:]. Blocks are decoded on access and
+    the most recently used ones are cached.
+    """
+
+    def __init__(self, store, cache_size=DECODE_CACHE_SIZE):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # height -> Block
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.store)
+
+    def __bool__(self):
+        return len(self.store) > 0
+
+    def _get(self, height):
+        with self._lock:
+            block = self._cache.get(height)
+            if block is not None:
+                self._cache.move_to_end(height)
+                return block
+
+        block = self.store.read(height)
+        with self._lock:
+            self._cache[height] = block
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return block
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._get(h) for h in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("chain index out of range")
+        return self._get(key)
+
+    def __iter__(self):
+        # Iterating the whole chain should not evict the blocks in use near the tip
+        for height in range(len(self)):
+            with self._lock:
+                block = self._cache.get(height)
+            yield block if block is not None else self.store.read(height)
+
+    def hashes(self):
+        """Block hashes in height order, read from the index without decoding blocks."""
+        for height in range(len(self)):
+            yield self.store.hash_at(height)
+
+    def hash_at(self, height):
+        """Hash of the block at a height, read from the index without decoding it."""
+        return self.store.hash_at(height)
+
+    def append(self, block):
+        self.extend([block])
+
+    def extend(self, blocks):
+        blocks = list(blocks)
+        start = len(self)
+        self.store.append(blocks)
+        with self._lock:
+            for height, block in enumerate(blocks, start):
+                self._cache[height] = block
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def __delitem__(self, key):
+        # Only truncation is supported: the store is append-only
+        if not isinstance(key, slice) or key.step not in (None, 1) or key.stop is not None:
+            raise TypeError("LazyChain only supports del chain[height:]")
+        height = key.indices(len(self))[0]
+        self.store.truncate(height)
+        with self._lock:
+            for cached in [h for h in self._cache if h >= height]:
+                del self._cache[cached]
@@ -0,0 +1,302 @@
+"""
+MongoDB index bootstrap and slow-query logging.
+
+bootstrap(db) creates the indexes the client app's lookups rely on, once at
+startup (create_index is a no-op for an index that already exists). The
+blocks and shares collections declare their own indexes in persistence.py
+and shares.py. The draft-generation service, deployed on its own, carries an
+identical copy of this module and passes its own index list to
+bootstrap(db, indexes); change both copies together.
+
+SlowQueryListener is a pymongo CommandListener. Every query that takes longer
+than a threshold is logged with the plan MongoDB chose for it (explain,
+"queryPlanner" verbosity, so the query is not run again). A COLLSCAN in the
+plan means a new access pattern needs an index. Explains run on a background
+thread, once per query shape (collection, command and filter fields) per
+EXPLAIN_INTERVAL, and the records are kept in the slow_queries collection
+for SLOW_QUERY_RETENTION.
+"""
+
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, MongoClient, monitoring
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Queries slower than this are logged (milliseconds)
+SLOW_QUERY_MS = 100
+
+# Seconds before the same query shape is explained again
+EXPLAIN_INTERVAL = 600.0
+
+# Seconds slow query records are kept
+SLOW_QUERY_RETENTION = 7 * 24 * 3600
+
+SLOW_QUERY_COLLECTION = "slow_queries"
+
+# collection -> [(keys, options)]
+INDEXES = {
+    "users": [
+        ([("username", ASCENDING)], {"unique": True, "name": "username_unique"}),
+    ],
+    "files": [
+        ([("file_key", ASCENDING)], {"unique": True, "name": "file_key_unique"}),
+        ([("owner", ASCENDING), ("created_at", ASCENDING)], {"name": "owner"}),
+    ],
+    SLOW_QUERY_COLLECTION: [
+        ([("at", ASCENDING)], {"expireAfterSeconds": SLOW_QUERY_RETENTION, "name": "at_ttl"}),
+    ],
+}
+
+# Commands that can be explained, and the field holding their filter
+EXPLAINABLE = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "update": "updates",
+    "delete": "deletes",
+    "findAndModify": "query",
+}
+
+# Fields added by the driver that explain does not accept
+DRIVER_FIELDS = ("lsid", "$db", "$clusterTime", "$readPreference", "txnNumber",
+                 "autocommit", "startTransaction", "readConcern", "writeConcern")
+
+# Started commands remembered while waiting for their reply
+MAX_IN_FLIGHT = 10000
+
+
+def ensure_indexes(db, indexes=None):
+    """
+    Create indexes, reporting the ones that cannot be built (e.g. duplicates
+    written before a unique index existed) instead of failing startup.
+
+    Args:
+        db: MongoDB database instance
+        indexes (dict): collection -> [(keys, options)] (defaults to INDEXES)
+
+    Returns:
+        list: Names of the indexes that could not be created
+    """
+    failed = []
+    for collection, specs in (indexes or INDEXES).items():
+        for keys, options in specs:
+            try:
+                db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                print(f"DEBUG: Could not create index {collection}.{options.get('name')}: {e}")
+                failed.append(options.get("name"))
+    return failed
+
+
+def query_shape(value):
+    """Filter with every value replaced by 1, so queries differing only in values match."""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return 1
+
+
+def plan_summary(plan):
+    """
+    Stages and indexes of a winning plan.
+
+    Args:
+        plan (dict): queryPlanner.winningPlan from explain
+
+    Returns:
+        tuple: (stage names top-down, index names)
+    """
+    stages, indexes = [], []
+    pending = [plan]
+    while pending:
+        node = pending.pop(0)
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "indexName" in node:
+            indexes.append(node["indexName"])
+        for key in ("queryPlan", "inputStage", "outerStage", "innerStage"):
+            if key in node:
+                pending.append(node[key])
+        pending.extend(node.get("inputStages", []))
+    return stages, indexes
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """
+    Logs queries slower than a threshold together with their explain plans.
+    """
+
+    def __init__(self, threshold_ms=SLOW_QUERY_MS, explain_interval=EXPLAIN_INTERVAL, record=True):
+        """
+        Initialize the listener; attach() it to the client it was registered on.
+
+        Args:
+            threshold_ms (float): Latency above which a query is logged
+            explain_interval (float): Seconds before a query shape is explained again
+            record (bool): Also store the records in the slow_queries collection
+        """
+        self.threshold_ms = threshold_ms
+        self.explain_interval = explain_interval
+        self.record = record
+        self.client = None
+        self.record_db = None
+        self._started = {}  # request_id -> (database, command name, command)
+        self._explained = {}  # query shape -> time explained
+        self._queue = queue.Queue(maxsize=100)
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def attach(self, client, record_db):
+        """
+        Use a client to run the explains.
+
+        Args:
+            client (MongoClient): Client the listener is registered on
+            record_db (str): Database holding the slow_queries collection
+        """
+        self.client = client
+        self.record_db = record_db
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE:
+            return
+        collection = event.command.get(event.command_name)
+        if collection == SLOW_QUERY_COLLECTION:
+            return
+        with self._lock:
+            if len(self._started) >= MAX_IN_FLIGHT:
+                self._started.clear()
+            self._started[event.request_id] = (event.database_name, event.command_name, event.command)
+
+    def succeeded(self, event):
+        with self._lock:
+            started = self._started.pop(event.request_id, None)
+        if started is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        database, command_name, command = started
+        collection = command.get(command_name)
+        shape = query_shape(command.get(EXPLAINABLE[command_name]))
+        key = (database, collection, command_name, repr(shape))
+        now = time.time()
+        with self._lock:
+            if now - self._explained.get(key, 0) < self.explain_interval:
+                return
+            self._explained[key] = now
+
+        entry = {
+            "at": datetime.now(timezone.utc),
+            "database": database,
+            "collection": collection,
+            "command": command_name,
+            "shape": json.dumps(shape, sort_keys=True),
+            "duration_ms": round(duration_ms, 2),
+        }
+        try:
+            self._queue.put_nowait((entry, command))
+        except queue.Full:
+            return
+        self._start_worker()
+
+    def failed(self, event):
+        with self._lock:
+            self._started.pop(event.request_id, None)
+
+    def _start_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._explain_loop, daemon=True)
+                self._worker.start()
+
+    def _explain_loop(self):
+        while True:
+            entry, command = self._queue.get()
+            try:
+                self.explain(entry, command)
+            except PyMongoError as e:
+                print(f"DEBUG: Could not explain slow {entry['command']} on {entry['collection']}: {e}")
+
+    def explain(self, entry, command):
+        """
+        Add the winning plan to a slow query entry, log it and store it.
+
+        Args:
+            entry (dict): Slow query entry built from the command events
+            command (dict): Command as sent by the driver
+        """
+        if self.client is None:
+            return
+        db = self.client[entry["database"]]
+        body = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+        plan = db.command("explain", body, verbosity="queryPlanner")
+        winning = plan.get("queryPlanner", {}).get("winningPlan", {})
+        stages, indexes = plan_summary(winning)
+        entry.update({
+            "stages": stages,
+            "indexes": indexes,
+            "collscan": "COLLSCAN" in stages,
+            # As JSON: plans and filters contain "$" field names
+            "winning_plan": json.dumps(winning, default=str),
+        })
+
+        print(f"DEBUG: Slow query ({entry['duration_ms']} ms) {entry['command']} on "
+              f"{entry['database']}.{entry['collection']} {entry['shape']}: "
+              f"{' <- '.join(stages) or 'no plan'}"
+              f"{' using ' + ', '.join(indexes) if indexes else ''}"
+              f"{' -- COLLSCAN, consider an index' if entry['collscan'] else ''}")
+        if self.record:
+            self.client[self.record_db][SLOW_QUERY_COLLECTION].insert_one(entry)
+
+
+def connect(uri, db_name, slow_query_ms=SLOW_QUERY_MS):
+    """
+    MongoClient with slow-query logging.
+
+    Args:
+        uri (str): MongoDB connection string
+        db_name (str): Database the slow query records are stored in
+        slow_query_ms (float): Latency threshold; 0 or None disables logging
+
+    Returns:
+        MongoClient: Connected client
+    """
+    if not slow_query_ms:
+        return MongoClient(uri)
+    listener = SlowQueryListener(threshold_ms=slow_query_ms)
+    client = MongoClient(uri, event_listeners=[listener])
+    listener.attach(client, db_name)
+    return client
+
+
+def bootstrap(db, indexes=None):
+    """
+    Create indexes once at startup.
+
+    Args:
+        db: MongoDB database instance
+        indexes (dict): collection -> [(keys, options)] (defaults to the client app's INDEXES)
+
+    Returns:
+        list: Names of the indexes that could not be created
+    """
+    indexes = indexes or INDEXES
+    failed = ensure_indexes(db, indexes)
+    if not failed:
+        print(f"DEBUG: Indexes ready on {', '.join(indexes)}")
+    return failed
@@ -0,0 +1,111 @@
+"""
+Numeric proof of work targets and difficulty retargeting.
+
+A hash meets a target when its value, read as a 256-bit integer, is below
+the target. Difficulty d corresponds to target 2**256 / 16**d, so an integer
+difficulty is the old "d leading zeros" rule and fractional difficulties fall
+in between.
+
+Every block from BLOCK_VERSION 3 on stores the target it was mined at. The
+target of the next block is derived from a moving window of the blocks below
+it: the average target of the window, scaled by how long the window actually
+took compared with target_block_time per block. All arithmetic on stored
+values is integer (timestamps in milliseconds), so every node computes the
+same target.
+"""
+
+import math
+
+MAX_TARGET = 2 ** 256
+
+# Blocks in the moving window used for retargeting
+RETARGET_WINDOW = 10
+
+# Largest factor one retarget may change the target by
+MAX_ADJUSTMENT = 2
+
+
+def difficulty_to_target(difficulty):
+    """
+    Target for a (possibly fractional) difficulty.
+
+    Args:
+        difficulty (float): Difficulty in hex digits (3 means "000...")
+
+    Returns:
+        int: Target
+    """
+    whole = int(difficulty)
+    fraction = difficulty - whole
+    target = MAX_TARGET >> (4 * whole)
+    if fraction:
+        target = int(target / 16 ** fraction)
+    return max(1, target)
+
+
+def target_to_difficulty(target):
+    """Difficulty (in hex digits) of a target, for display."""
+    return math.log(MAX_TARGET / target, 16)
+
+
+def meets_target(block_hash, target):
+    """
+    Check a hexadecimal hash against a target.
+
+    Args:
+        block_hash (str): Hexadecimal hash
+        target (int): Target
+
+    Returns:
+        bool: True if the hash is below the target
+    """
+    return int(block_hash, 16) < target
+
+
+def block_work(target):
+    """
+    Expected number of hashes needed to meet a target. Branches are compared
+    by the sum of the work of their blocks, not by their length.
+
+    Args:
+        target (int): Target
+
+    Returns:
+        int: Work
+    """
+    return MAX_TARGET // (target + 1)
+
+
+def _ms(timestamp):
+    return int(round(timestamp * 1000))
+
+
+def next_target(window, target_block_time, default_target, min_target=None):
+    """
+    Target for the block after the window.
+
+    Args:
+        window (list): Blocks just below the new block, oldest first (the
+            last RETARGET_WINDOW are used). Blocks mined before targets were
+            stored count as mined at default_target
+        target_block_time (float): Desired seconds between blocks
+        default_target (int): Target when there is no history
+        min_target (int): Easiest allowed target, i.e. the difficulty floor
+            (defaults to default_target)
+
+    Returns:
+        int: Target
+    """
+    easiest = default_target if min_target is None else min_target
+    window = list(window)[-RETARGET_WINDOW:]
+    if len(window) < 2:
+        return default_target
+
+    targets = [b.target if getattr(b, "target", None) is not None else default_target for b in window]
+    average = sum(targets) // len(targets)
+
+    expected = (len(window) - 1) * _ms(target_block_time)
+    actual = _ms(window[-1].timestamp) - _ms(window[0].timestamp)
+    actual = max(expected // MAX_ADJUSTMENT, min(actual, expected * MAX_ADJUSTMENT))
+
+    return max(1, min(easiest, average * actual // expected))
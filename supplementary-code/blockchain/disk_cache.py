@@ -0,0 +1,205 @@
+"""
+Local disk cache for downloaded files.
+
+Downloads read files chunk by chunk from the blob store, which for GridFS is
+a MongoDB round-trip per chunk. The cache keeps whole files on local disk,
+keyed by their SHA-256, so repeat downloads of hot documents are served from
+disk:
+- byte budget: least recently used files are evicted to make room
+- atomic fills: a file is written to a temporary name and renamed into
+  place, so a reader never sees a partial file
+- single-flight: concurrent misses on the same key wait for one fill
+  instead of each fetching the file
+
+The index lives in memory and is rebuilt from the directory at startup
+(oldest access first). Several processes may share the directory: each
+keeps its own budget, and a file another process evicted is just a miss.
+"""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Default byte budget
+CACHE_BYTES = 512 * 1024 * 1024
+
+# Block size used when streaming a cached file
+READ_SIZE = 64 * 1024
+
+PART_PREFIX = ".part-"
+
+
+class DiskCache:
+    """
+    Size-bounded LRU of files on local disk with single-flight fills.
+    """
+
+    def __init__(self, root, max_bytes=CACHE_BYTES, max_entry_bytes=None):
+        """
+        Initialize the cache over a directory, indexing the files already in it.
+
+        Args:
+            root (str): Cache directory
+            max_bytes (int): Byte budget
+            max_entry_bytes (int): Larger files are not cached (default: a quarter of the budget)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 4
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._used = 0  # bytes of the entries plus fills in progress
+        self._inflight = {}  # key -> threading.Event set when its fill ends
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def _load(self):
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(PART_PREFIX):
+                # Left behind by a fill that was interrupted
+                os.unlink(path)
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_atime, name, stat.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._used += size
+        with self._lock:
+            self._evict(0)
+
+    def _evict(self, needed):
+        """Drop least recently used entries until `needed` more bytes fit (lock held)."""
+        while self._entries and self._used + needed > self.max_bytes:
+            key, size = self._entries.popitem(last=False)
+            self._used -= size
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _open_entry(self, key):
+        """Open a cached file and mark it recently used (lock held)."""
+        if key not in self._entries:
+            return None
+        try:
+            f = open(self._path(key), "rb")
+        except FileNotFoundError:
+            # Evicted by another process sharing the directory
+            self._used -= self._entries.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return f
+
+    def open(self, key, size, fill):
+        """
+        Open a cached file, filling it on a miss.
+
+        Args:
+            key (str): File key (the content SHA-256; must be a valid file name)
+            size (int): Expected size in bytes
+            fill (callable): fill(f) writes the content to a binary file object
+
+        Returns:
+            file|None: Binary file open for reading, or None when the file is
+                too large to cache or the fill failed (read it from the source)
+        """
+        if size > self.max_entry_bytes:
+            return None
+
+        while True:
+            with self._lock:
+                f = self._open_entry(key)
+                if f is not None:
+                    self.hits += 1
+                    return f
+                event = self._inflight.get(key)
+                if event is None:
+                    # We fill; reserve the space now so concurrent fills stay in budget
+                    self.misses += 1
+                    event = self._inflight[key] = threading.Event()
+                    self._evict(size)
+                    self._used += size
+                    break
+            event.wait()
+            with self._lock:
+                if key not in self._entries and key not in self._inflight:
+                    # The fill we waited for failed
+                    return None
+
+        stored = False
+        try:
+            stored = self._fill(key, size, fill)
+        finally:
+            with self._lock:
+                if stored:
+                    self._entries[key] = size
+                else:
+                    self._used -= size
+                del self._inflight[key]
+                f = self._open_entry(key) if stored else None
+            event.set()
+        return f
+
+    def _fill(self, key, size, fill):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=PART_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                fill(f)
+                written = f.tell()
+            if written != size:
+                print(f"DEBUG: Cache fill for {key} wrote {written} bytes, expected {size}")
+                os.unlink(tmp_path)
+                return False
+            os.replace(tmp_path, self._path(key))
+            return True
+        except Exception as e:
+            print(f"DEBUG: Cache fill for {key} failed: {e}")
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            return False
+
+    def stats(self):
+        """Entry count, bytes used, budget, hits and misses."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._used,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def iter_file(f, start, stop, block_size=READ_SIZE):
+    """
+    Stream a byte range of an open file, closing it at the end.
+
+    Args:
+        f: Binary file open for reading
+        start (int): First byte (inclusive)
+        stop (int): Last byte (exclusive)
+
+    Yields:
+        bytes: File content in [start, stop)
+    """
+    try:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            data = f.read(min(block_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        f.close()
@@ -0,0 +1,333 @@
+"""
+Block gossip with compact block relay.
+
+A new block is pushed to a random subset of the peers as its header plus a
+short id (6 bytes) per transaction, instead of the whole block. The receiver
+looks the short ids up in its own mempool, where most of the transactions
+already are, and answers with the positions it could not fill; the sender
+then pushes only those transactions. The rebuilt block is checked against
+the header's Merkle root, added through Blockchain.receive_block and relayed
+on the same way. Every node remembers the hashes of the blocks it attached,
+so a block is processed and relayed once however many peers announce it. A
+block that is still being filled, or that could not be attached (invalid,
+orphan, or dropped while waiting for its transactions), is not remembered:
+the next announcement of it is processed again.
+
+Short ids only match when the receiver already holds the transactions, so
+transactions are gossiped too: a node relays every transaction it accepts
+(from /new_transaction or from a peer) to a random subset of the peers,
+once per transaction id. By the time a block is announced its transactions
+are in the peers' mempools and only the header and short ids travel.
+
+Short ids are keyed by the block hash, so two transactions that collide in
+one block do not collide in the next. A collision shows up as a Merkle root
+mismatch, after which the receiver asks for every transaction.
+"""
+
+import random
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+
+from Block import Block, LEGACY_VERSION
+from mempool import tx_id
+from merkle import merkle_root, tx_hash
+
+SHORT_ID_BYTES = 6
+
+# Peers each block is pushed to (all of them when there are fewer)
+GOSSIP_FANOUT = 8
+
+# Block hashes remembered for deduplication
+SEEN_CACHE_SIZE = 4096
+
+# Transaction ids remembered so a transaction is relayed once
+SEEN_TX_CACHE_SIZE = 65536
+
+# Blocks waiting for missing transactions
+MAX_PARTIAL_BLOCKS = 64
+
+# Fields a relayed transaction must carry (as on /new_transaction)
+TX_FIELDS = ("user", "v_file", "file_data", "file_size")
+
+
+def short_id(block_hash, transaction):
+    """
+    Short transaction id within one block.
+
+    Args:
+        block_hash (str): Hash of the block the id is used in
+        transaction (dict): Transaction data
+
+    Returns:
+        str: Hexadecimal short id
+    """
+    return sha256(bytes.fromhex(block_hash) + tx_hash(transaction)).hexdigest()[:2 * SHORT_ID_BYTES]
+
+
+def compact_block(block):
+    """
+    Compact announcement of a block.
+
+    Args:
+        block (Block): Mined block
+
+    Returns:
+        dict: {"header": header dict, "short_ids": [...]} in transaction order
+    """
+    return {
+        "header": block.header(),
+        "short_ids": [short_id(block.hash, t) for t in block.transactions]
+    }
+
+
+class Gossip:
+    """
+    Compact block relay for one node.
+    """
+
+    def __init__(self, blockchain, fanout=GOSSIP_FANOUT, seen_size=SEEN_CACHE_SIZE):
+        """
+        Initialize gossip for a node.
+
+        Args:
+            blockchain (Blockchain): Node state; its peers and peer_client are used
+            fanout (int): Peers each block is pushed to
+            seen_size (int): Block hashes remembered for deduplication
+        """
+        self.blockchain = blockchain
+        self.fanout = fanout
+        self.seen_size = seen_size
+        self._seen = OrderedDict()  # block hash -> None, oldest first
+        self._partial = OrderedDict()  # block hash -> (header dict, transactions with None holes, full)
+        self._receiving = set()  # block hashes an announcement is being handled for
+        self._seen_txs = OrderedDict()  # transaction id -> None, oldest first
+        self._lock = threading.Lock()
+
+    def mark_seen(self, block_hash):
+        """
+        Remember a block hash.
+
+        Returns:
+            bool: True if the hash was new
+        """
+        with self._lock:
+            if block_hash in self._seen:
+                self._seen.move_to_end(block_hash)
+                return False
+            self._seen[block_hash] = None
+            while len(self._seen) > self.seen_size:
+                self._seen.popitem(last=False)
+            return True
+
+    def mark_tx_seen(self, transaction):
+        """
+        Remember a transaction id.
+
+        Returns:
+            bool: True if the id was new
+        """
+        transaction_id = tx_id(transaction)
+        with self._lock:
+            if transaction_id in self._seen_txs:
+                self._seen_txs.move_to_end(transaction_id)
+                return False
+            self._seen_txs[transaction_id] = None
+            while len(self._seen_txs) > SEEN_TX_CACHE_SIZE:
+                self._seen_txs.popitem(last=False)
+            return True
+
+    # ========== SENDING ==========
+
+    def announce_transaction(self, transaction):
+        """
+        Push a transaction to a random subset of the peers, so it is in
+        their mempools before the block holding it is announced.
+
+        Args:
+            transaction (dict): Transaction accepted by this node
+
+        Returns:
+            dict: peer -> status reported by the peer, for peers that answered in time
+        """
+        peers = list(self.blockchain.peers)
+        targets = random.sample(peers, min(self.fanout, len(peers)))
+        client = self.blockchain.peer_client
+
+        def push(peer):
+            return client.request("POST", peer, "/gossip/tx", json={"transaction": transaction}).json().get("status")
+
+        return client.fan_out(targets, push)
+
+    def relay_transaction(self, transaction):
+        """
+        Announce a transaction in the background unless it was already relayed.
+
+        Returns:
+            bool: True if the transaction was new to this node
+        """
+        if not self.mark_tx_seen(transaction):
+            return False
+        threading.Thread(target=self.announce_transaction, args=(transaction,), daemon=True).start()
+        return True
+
+    def announce(self, block):
+        """
+        Push a block to a random subset of the peers, sending the
+        transactions each of them is missing.
+
+        Args:
+            block (Block): Block on our chain (or a side branch)
+
+        Returns:
+            dict: peer -> status reported by the peer, for peers that answered in time
+        """
+        self.mark_seen(block.hash)
+        peers = list(self.blockchain.peers)
+        targets = random.sample(peers, min(self.fanout, len(peers)))
+        payload = compact_block(block)
+        client = self.blockchain.peer_client
+
+        def push(peer):
+            reply = client.request("POST", peer, "/gossip/block", json=payload).json()
+            if reply.get("status") == "missing":
+                transactions = [
+                    [i, block.transactions[i]]
+                    for i in reply.get("missing", [])
+                    if 0 <= i < len(block.transactions)
+                ]
+                reply = client.request("POST", peer, "/gossip/txs", json={
+                    "hash": block.hash,
+                    "transactions": transactions
+                }).json()
+            return reply.get("status")
+
+        return client.fan_out(targets, push)
+
+    def relay(self, block):
+        """Announce a block in the background (used while answering a peer)."""
+        threading.Thread(target=self.announce, args=(block,), daemon=True).start()
+
+    # ========== RECEIVING ==========
+
+    def on_transaction(self, data, submit):
+        """
+        Handle a transaction pushed by a peer (POST /gossip/tx).
+
+        Args:
+            data (dict): {"transaction": ...}
+            submit (callable): Queues a new transaction for the local miner
+
+        Returns:
+            dict: {"status": "added", "known", "full" or "invalid"}
+        """
+        transaction = data.get("transaction") if isinstance(data, dict) else None
+        if not isinstance(transaction, dict) or not all(transaction.get(f) for f in TX_FIELDS):
+            return {"status": "invalid"}
+        file_key = transaction.get("file_key")
+        if file_key and self.blockchain.tx_index.by_file_key(file_key) is not None:
+            return {"status": "known"}
+        if self.blockchain.pending.rejects_new():
+            return {"status": "full"}
+        if not self.relay_transaction(transaction):
+            return {"status": "known"}
+        submit(transaction)
+        return {"status": "added"}
+
+    def on_compact_block(self, data):
+        """
+        Handle a compact announcement (POST /gossip/block).
+
+        Args:
+            data (dict): {"header": ..., "short_ids": [...]}
+
+        Returns:
+            dict: {"status": ...}; "missing" comes with the positions to send
+        """
+        header = data.get("header") if isinstance(data, dict) else None
+        if not isinstance(header, dict):
+            return {"status": "invalid"}
+        # Versioned headers commit to their transactions; without a root there is nothing to check against
+        if header.get("version", LEGACY_VERSION) != LEGACY_VERSION and not header.get("merkle_root"):
+            return {"status": "invalid"}
+        block_hash = header.get("hash")
+        if block_hash in self.blockchain.hash_index:
+            # Attached without an announcement of its own (e.g. an orphan whose parent arrived)
+            self.mark_seen(block_hash)
+            return {"status": "known"}
+        with self._lock:
+            if not block_hash or block_hash in self._seen or block_hash in self._partial \
+                    or block_hash in self._receiving:
+                return {"status": "known"}
+            self._receiving.add(block_hash)
+
+        try:
+            # Check proof of work on the header before asking for anything
+            if header.get("version", LEGACY_VERSION) != LEGACY_VERSION:
+                if not self.blockchain.is_valid(Block.from_dict(header), block_hash):
+                    return {"status": "invalid"}
+
+            pool = {short_id(block_hash, t): t for t in self.blockchain.pending.transactions()}
+            transactions = [pool.get(s) for s in data.get("short_ids", [])]
+            return self._resume(header, transactions, full=False)
+        finally:
+            with self._lock:
+                self._receiving.discard(block_hash)
+
+    def on_transactions(self, data):
+        """
+        Handle the missing transactions of an announced block (POST /gossip/txs).
+
+        Args:
+            data (dict): {"hash": ..., "transactions": [[position, transaction], ...]}
+
+        Returns:
+            dict: {"status": ...}
+        """
+        block_hash = data.get("hash")
+        with self._lock:
+            partial = self._partial.pop(block_hash, None)
+            if partial is None:
+                return {"status": "unknown"}
+            self._receiving.add(block_hash)
+
+        try:
+            header, transactions, full = partial
+            for position, transaction in data.get("transactions", []):
+                if 0 <= position < len(transactions):
+                    transactions[position] = transaction
+            return self._resume(header, transactions, full)
+        finally:
+            with self._lock:
+                self._receiving.discard(block_hash)
+
+    def _resume(self, header, transactions, full):
+        """Ask for what is still missing, or rebuild and add the block."""
+        missing = [i for i, t in enumerate(transactions) if t is None]
+        if missing:
+            self._park(header, transactions, full)
+            return {"status": "missing", "missing": missing}
+
+        block = Block.from_dict({**header, "transactions": transactions})
+        if block.version != LEGACY_VERSION and merkle_root(transactions) != header.get("merkle_root"):
+            if full:
+                return {"status": "invalid"}
+            # A short id matched the wrong pooled transaction: fetch them all
+            self._park(header, [None] * len(transactions), True)
+            return {"status": "missing", "missing": list(range(len(transactions)))}
+
+        status = self.blockchain.receive_block(block)
+        if status in ("added", "reorg", "side", "known"):
+            # Only attached blocks are remembered: an orphan is processed
+            # again once its parent arrives
+            self.mark_seen(block.hash)
+        if status in ("added", "reorg", "side"):
+            self.relay(block)
+        return {"status": status}
+
+    def _park(self, header, transactions, full):
+        # A parked block that is dropped was never seen, so a later announcement is handled
+        with self._lock:
+            self._partial[header["hash"]] = (header, transactions, full)
+            while len(self._partial) > MAX_PARTIAL_BLOCKS:
+                self._partial.popitem(last=False)
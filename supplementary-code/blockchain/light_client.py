@@ -0,0 +1,225 @@
+"""
+Header-only light client.
+
+Keeps just the block headers of a node's chain (index, timestamp, prev_hash,
+nonce, merkle root, target, hash), checks proof of work, retargeting and
+linkage on the headers
+alone and fetches transactions only when asked for, checking them against
+the header they belong to. Memory stays at a few hundred bytes per block
+whatever the size of the blocks.
+
+Usage: python light_client.py [--node http://127.0.0.1:8800] [--verify FILE_KEY]
+"""
+
+import argparse
+from collections import OrderedDict
+
+from Block import Block, BLOCK_VERSION, LEGACY_VERSION
+from Blockchain import Blockchain
+from chain_config import apply_chain_config
+from difficulty import RETARGET_WINDOW, difficulty_to_target, meets_target
+from merkle import merkle_root, verify_merkle_proof
+from peer_client import PeerClient
+
+# Number of blocks whose transactions are kept after a lazy fetch
+BODY_CACHE_SIZE = 32
+
+
+class LightClient:
+    """
+    Verified header chain of one node, with lazily fetched transactions.
+    """
+
+    def __init__(self, node, peer_client=None, body_cache_size=BODY_CACHE_SIZE):
+        """
+        Initialize the client (call sync() to download headers).
+
+        Args:
+            node (str): Node URL (e.g. "http://127.0.0.1:8800")
+            peer_client (PeerClient): HTTP client (a new one by default)
+            body_cache_size (int): Number of block bodies kept in memory
+        """
+        self.node = node
+        self.peer_client = peer_client or PeerClient(
+            timeout=Blockchain.peer_timeout,
+            deadline=Blockchain.peer_deadline
+        )
+        self.headers = []  # Header-only blocks (transactions is None), genesis first
+        self.body_cache_size = body_cache_size
+        self._bodies = OrderedDict()  # block hash -> transactions
+
+    def height(self):
+        """Height of the verified tip, -1 before the first sync."""
+        return len(self.headers) - 1
+
+    def sync(self):
+        """
+        Download and verify new headers up to the node's tip.
+        If the node switched to another branch, headers are dropped back to
+        the point where its chain links to ours again.
+
+        Returns:
+            int: Number of headers added
+
+        Raises:
+            ValueError: If the node serves a header that fails verification
+        """
+        limit = Blockchain.headers_per_request
+        added = 0
+
+        while True:
+            start = len(self.headers)
+            # Overlap one header with our tip to notice a reorg on the node
+            data = self.peer_client.get_json(self.node, "/headers", {"from": max(0, start - 1), "limit": limit})
+            page = [Block.from_dict(h) for h in data["headers"]]
+
+            if start > 0:
+                if not page or page[0].hash != self.headers[-1].hash:
+                    # Our tip is no longer on the node's chain: step back a page
+                    self._rewind(max(0, min(start, data["length"]) - limit) - 1)
+                    continue
+                page = page[1:]
+
+            if not page:
+                return added
+
+            bad = self.verify_headers(page, self.headers[-RETARGET_WINDOW:])
+            if bad is not None:
+                raise ValueError(f"Node {self.node} served an invalid header at #{bad}")
+
+            self.headers.extend(page)
+            added += len(page)
+            if len(self.headers) >= data["length"]:
+                return added
+
+    def _rewind(self, height):
+        """Drop every header above height (and the bodies of those blocks)."""
+        for header in self.headers[height + 1:]:
+            self._bodies.pop(header.hash, None)
+        del self.headers[max(0, height + 1):]
+
+    @staticmethod
+    def verify_headers(headers, window=()):
+        """
+        Check proof of work, retargeting and linkage of consecutive headers.
+        Legacy (version 1) headers cannot be re-hashed without their
+        transactions and are checked for linkage only.
+
+        Args:
+            headers (list): Header-only blocks, in height order
+            window (list): Verified headers just below headers[0], oldest
+                first (at least RETARGET_WINDOW of them unless they start at
+                genesis; empty when headers[0] is genesis)
+
+        Returns:
+            int|None: Height of the first invalid header, None if all are valid
+        """
+        window = list(window)[-RETARGET_WINDOW:]
+        prev = window[-1] if window else None
+        prev_hash = prev.hash if prev is not None else "0"
+        prev_version = prev.version if prev is not None else LEGACY_VERSION
+        height = prev.index + 1 if prev is not None else 0
+
+        for header in headers:
+            if header.hash is None or header.index != height:
+                return height
+
+            if header.version == LEGACY_VERSION:
+                valid = True
+            elif height == 0:
+                valid = header.generate_hash() == header.hash
+            elif header.version >= BLOCK_VERSION:
+                valid = (header.target == Blockchain.target_after(window)
+                         and meets_target(header.hash, header.target)
+                         and header.generate_hash() == header.hash)
+            else:
+                valid = (meets_target(header.hash, difficulty_to_target(Blockchain.difficulty))
+                         and header.generate_hash() == header.hash)
+
+            if not (valid and header.prev_hash == prev_hash and header.version >= prev_version):
+                return height
+
+            prev_hash = header.hash
+            prev_version = header.version
+            window = window[1 - RETARGET_WINDOW:] + [header]
+            height += 1
+
+        return None
+
+    def transactions(self, height):
+        """
+        Transactions of a block, fetched on first use and checked against its header.
+
+        Args:
+            height (int): Block height
+
+        Returns:
+            list: Transactions in block order
+
+        Raises:
+            ValueError: If the node's block does not match the verified header
+        """
+        header = self.headers[height]
+        if header.hash in self._bodies:
+            self._bodies.move_to_end(header.hash)
+            return self._bodies[header.hash]
+
+        data = self.peer_client.get_json(self.node, "/blocks", {
+            "from_hash": header.hash,
+            "to_hash": header.hash
+        })
+        block = Block.from_dict(data["blocks"][0])
+
+        if header.version == LEGACY_VERSION:
+            ok = block.hash == header.hash and block.generate_hash() == header.hash
+        else:
+            ok = merkle_root(block.transactions) == header.merkle_root
+        if not ok:
+            raise ValueError(f"Block #{height} from {self.node} does not match its header")
+
+        self._bodies[header.hash] = block.transactions
+        while len(self._bodies) > self.body_cache_size:
+            self._bodies.popitem(last=False)
+        return block.transactions
+
+    def verify_file(self, file_key):
+        """
+        Check that a file upload is on our verified header chain, using the
+        node's Merkle inclusion proof instead of the whole block.
+
+        Args:
+            file_key (str): File key
+
+        Returns:
+            tuple: (ok, reason)
+        """
+        data = self.peer_client.get_json(self.node, f"/proof/{file_key}")
+        header = data["header"]
+        height = header["index"]
+
+        if height > self.height() or self.headers[height].hash != header["hash"]:
+            return False, f"block #{height} is not on the verified header chain"
+        if data["transaction"].get("file_key") != file_key:
+            return False, "proof is for another file"
+        if not verify_merkle_proof(data["transaction"], data["proof"], self.headers[height].merkle_root):
+            return False, "transaction is not committed to by the block's Merkle root"
+
+        return True, f"included in block #{height} ({header['hash']})"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Header-only chain verification")
+    parser.add_argument("--node", default="http://127.0.0.1:8800", help="Node to follow")
+    parser.add_argument("--verify", metavar="FILE_KEY", help="Also verify that a file is on-chain")
+    args = parser.parse_args()
+
+    # Must match the node's POW_DIFFICULTY and BLOCK_TIME
+    apply_chain_config()
+    client = LightClient(args.node)
+    added = client.sync()
+    tip = client.headers[-1]
+    print(f"Verified {added} headers, tip #{tip.index} {tip.hash}")
+
+    if args.verify:
+        ok, reason = client.verify_file(args.verify)
+        print(("VALID: " if ok else "INVALID: ") + reason)
@@ -0,0 +1,349 @@
+"""
+Pending-transaction pool.
+
+Transactions are keyed by an id (their file_key, or the hash of the
+transaction when it has none), so a retried submission is recognised in O(1)
+and stored once. The pool is bounded by a transaction count and a byte
+budget; when full, the lowest-priority transaction is evicted (which may be
+the one being added). Blocks are filled in priority order:
+- "age": oldest first, the newest are evicted, so a full pool refuses every
+  new transaction until a block is mined (rejects_new() tells callers)
+- "size": smallest first, the largest are evicted
+
+There are no fees in this chain, so age and size are the only priorities.
+
+SharedMempool keeps the same pool in MongoDB for several worker processes
+(gunicorn): transactions taken for a block are leased to one worker, so no
+two workers mine the same transaction.
+"""
+
+import itertools
+import json
+import threading
+import time
+import uuid
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from merkle import tx_hash
+
+# Default pool limits
+MAX_POOL_TXS = 10000
+MAX_POOL_BYTES = 64 * 1024 * 1024
+
+PRIORITIES = ("age", "size")
+
+# Answer to submissions while rejects_new() holds (served with a 503)
+POOL_FULL_MESSAGE = ("Mempool full: new transactions are refused until a block is mined "
+                     "(under \"age\" priority the newest transaction is the one evicted)")
+
+# Seconds a worker may hold transactions taken for a block before others can take them
+LEASE_SECONDS = 120.0
+
+
+def tx_id(transaction):
+    """
+    Identity of a transaction for deduplication.
+
+    Args:
+        transaction (dict): Transaction data
+
+    Returns:
+        str: file_key when present, otherwise the hex Merkle leaf hash
+    """
+    file_key = transaction.get("file_key")
+    return file_key if file_key else tx_hash(transaction).hex()
+
+
+def tx_size(transaction):
+    """Encoded size of a transaction in bytes."""
+    return len(json.dumps(transaction, separators=(",", ":")).encode())
+
+
+def check_priority(priority):
+    """
+    Validate a block fill priority.
+
+    Returns:
+        str: The priority
+
+    Raises:
+        ValueError: If the priority is not one of PRIORITIES
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown mempool priority: {priority} (expected one of {', '.join(PRIORITIES)})")
+    return priority
+
+
+class Mempool:
+    """
+    Bounded, deduplicating pool of pending transactions.
+    """
+
+    def __init__(self, max_txs=MAX_POOL_TXS, max_bytes=MAX_POOL_BYTES, priority="age"):
+        """
+        Initialize an empty pool.
+
+        Args:
+            max_txs (int): Maximum number of transactions held
+            max_bytes (int): Maximum total encoded size of the transactions held
+            priority (str): "age" (oldest first) or "size" (smallest first)
+        """
+        self.max_txs = max_txs
+        self.max_bytes = max_bytes
+        self.priority = priority
+        self.bytes = 0
+        self._entries = {}  # id -> (seq, size, transaction), in arrival order
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def priority(self):
+        """Block fill priority; setting an unknown one raises ValueError."""
+        return self._priority
+
+    @priority.setter
+    def priority(self, priority):
+        self._priority = check_priority(priority)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def rejects_new(self):
+        """True when a new transaction would be evicted on arrival (full pool under "age" priority)."""
+        with self._lock:
+            full = len(self._entries) >= self.max_txs or self.bytes >= self.max_bytes
+        return full and self.priority == "age"
+
+    def __contains__(self, transaction_id):
+        return transaction_id in self._entries
+
+    def _key(self, entry):
+        seq, size, _ = entry
+        return (size, seq) if self.priority == "size" else (seq,)
+
+    def add(self, transaction):
+        """
+        Add a transaction unless it is already pooled or does not fit.
+
+        Args:
+            transaction (dict): Transaction data
+
+        Returns:
+            bool: True if the transaction is now in the pool
+        """
+        transaction_id = tx_id(transaction)
+        size = tx_size(transaction)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if transaction_id in self._entries:
+                return False
+            entry = (next(self._seq), size, transaction)
+            self._entries[transaction_id] = entry
+            self.bytes += size
+
+            # Evict the lowest-priority transactions until we are within budget
+            while len(self._entries) > self.max_txs or self.bytes > self.max_bytes:
+                if self.priority == "age":
+                    victim = next(reversed(self._entries))
+                else:
+                    victim = max(self._entries, key=lambda i: self._key(self._entries[i]))
+                self.bytes -= self._entries.pop(victim)[1]
+                if victim == transaction_id:
+                    return False
+            return True
+
+    def take(self, max_txs, max_bytes):
+        """
+        Transactions for the next block in priority order (they stay pooled
+        until remove() is called once the block is on the chain).
+        A transaction larger than max_bytes still fills a block on its own.
+
+        Args:
+            max_txs (int): Maximum number of transactions
+            max_bytes (int): Maximum total encoded size
+
+        Returns:
+            list: Transactions
+        """
+        with self._lock:
+            entries = self._entries.values()
+            if self.priority == "size":
+                entries = sorted(entries, key=self._key)
+
+            selected = []
+            total = 0
+            for _, size, transaction in entries:
+                if len(selected) >= max_txs:
+                    break
+                if selected and total + size > max_bytes:
+                    if self.priority == "size":
+                        break  # Everything after is at least as large
+                    continue
+                selected.append(transaction)
+                total += size
+            return selected
+
+    def release(self, transactions):
+        """Give back transactions taken for a block that did not make it (no-op locally)."""
+
+    def remove(self, transactions):
+        """
+        Drop transactions (e.g. once they are included in a block).
+
+        Args:
+            transactions (list): Transactions to drop; unknown ones are ignored
+        """
+        with self._lock:
+            for transaction in transactions:
+                entry = self._entries.pop(tx_id(transaction), None)
+                if entry is not None:
+                    self.bytes -= entry[1]
+
+    def transactions(self):
+        """
+        Snapshot of the pooled transactions in priority order.
+
+        Returns:
+            list: Transactions
+        """
+        with self._lock:
+            entries = self._entries.values()
+            if self.priority == "size":
+                entries = sorted(entries, key=self._key)
+            return [transaction for _, _, transaction in entries]
+
+
+class SharedMempool:
+    """
+    Mempool stored in a MongoDB collection, shared by every worker process.
+    Same interface as Mempool. The count budget is enforced by rejecting new
+    transactions when full (no cross-process eviction).
+    """
+
+    def __init__(self, db, collection="pending", max_txs=MAX_POOL_TXS, max_bytes=MAX_POOL_BYTES,
+                 priority="age", lease=LEASE_SECONDS):
+        """
+        Initialize the pool on a collection.
+
+        Args:
+            db: MongoDB database instance
+            collection (str): Name of the pool collection
+            max_txs (int): Maximum number of transactions held
+            max_bytes (int): Maximum encoded size of a single transaction
+            priority (str): "age" (oldest first) or "size" (smallest first)
+            lease (float): Seconds a taken transaction stays reserved for its worker
+        """
+        self.col = db[collection]
+        self.max_txs = max_txs
+        self.max_bytes = max_bytes
+        self.priority = priority
+        self.lease = lease
+        self.col.create_index([("claimed_until", ASCENDING), ("seq", ASCENDING)])
+        self.col.create_index([("claimed_until", ASCENDING), ("size", ASCENDING), ("seq", ASCENDING)])
+
+    @property
+    def priority(self):
+        """Block fill priority; setting an unknown one raises ValueError."""
+        return self._priority
+
+    @priority.setter
+    def priority(self, priority):
+        self._priority = check_priority(priority)
+
+    def __len__(self):
+        return self.col.count_documents({})
+
+    def rejects_new(self):
+        """True when the pool is full (new transactions are refused whatever the priority)."""
+        return self.col.estimated_document_count() >= self.max_txs
+
+    def __contains__(self, transaction_id):
+        return self.col.count_documents({"_id": transaction_id}, limit=1) > 0
+
+    @property
+    def bytes(self):
+        result = list(self.col.aggregate([{"$group": {"_id": None, "bytes": {"$sum": "$size"}}}]))
+        return result[0]["bytes"] if result else 0
+
+    def _sort(self):
+        if self.priority == "size":
+            return [("size", ASCENDING), ("seq", ASCENDING)]
+        return [("seq", ASCENDING)]
+
+    def add(self, transaction):
+        """
+        Add a transaction unless it is already pooled or the pool is full.
+
+        Returns:
+            bool: True if the transaction was added
+        """
+        size = tx_size(transaction)
+        if size > self.max_bytes or self.col.estimated_document_count() >= self.max_txs:
+            return False
+        try:
+            self.col.insert_one({
+                "_id": tx_id(transaction),
+                "tx": transaction,
+                "size": size,
+                "seq": time.time(),
+                "claimed_until": 0.0
+            })
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def take(self, max_txs, max_bytes):
+        """
+        Lease transactions for the next block in priority order. Transactions
+        leased by another worker are skipped until their lease runs out.
+
+        Returns:
+            list: Transactions now leased to this worker
+        """
+        now = time.time()
+        selected = []
+        total = 0
+        for doc in self.col.find({"claimed_until": {"$lt": now}}, {"tx": 0}, sort=self._sort(), limit=max_txs):
+            if selected and total + doc["size"] > max_bytes:
+                if self.priority == "size":
+                    break
+                continue
+            selected.append(doc["_id"])
+            total += doc["size"]
+
+        # Claim them one by one; whatever another worker claimed first is skipped
+        token = uuid.uuid4().hex
+        transactions = []
+        for transaction_id in selected:
+            doc = self.col.find_one_and_update(
+                {"_id": transaction_id, "claimed_until": {"$lt": now}},
+                {"$set": {"claimed_until": now + self.lease, "claimed_by": token}},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is not None:
+                transactions.append(doc["tx"])
+        return transactions
+
+    def release(self, transactions):
+        """Give back leased transactions that did not make it into a block."""
+        ids = [tx_id(t) for t in transactions]
+        self.col.update_many({"_id": {"$in": ids}}, {"$set": {"claimed_until": 0.0}})
+
+    def remove(self, transactions):
+        """Drop transactions (e.g. once they are included in a block)."""
+        ids = [tx_id(t) for t in transactions]
+        if ids:
+            self.col.delete_many({"_id": {"$in": ids}})
+
+    def transactions(self):
+        """
+        Snapshot of the pooled transactions in priority order.
+
+        Returns:
+            list: Transactions
+        """
+        return [doc["tx"] for doc in self.col.find({}, sort=self._sort())]
@@ -0,0 +1,117 @@
+"""
+Merkle tree over block transactions.
+
+Leaves and inner nodes are hashed with different prefixes (0x00 / 0x01) so a
+leaf can never be passed off as an inner node. An odd node at the end of a
+level is promoted unchanged instead of being paired with itself.
+"""
+
+import json
+from hashlib import sha256
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def tx_hash(transaction):
+    """
+    Hash a single transaction into a Merkle leaf.
+
+    Args:
+        transaction (dict): Transaction data
+
+    Returns:
+        bytes: 32 byte leaf hash
+    """
+    encoded = json.dumps(transaction, sort_keys=True, separators=(",", ":"))
+    return sha256(LEAF_PREFIX + encoded.encode()).digest()
+
+
+def _next_level(level):
+    """Hash pairs of nodes into the level above (an odd last node is promoted)."""
+    next_level = []
+    for i in range(0, len(level), 2):
+        if i + 1 < len(level):
+            next_level.append(sha256(NODE_PREFIX + level[i] + level[i + 1]).digest())
+        else:
+            next_level.append(level[i])
+    return next_level
+
+
+def merkle_root(transactions):
+    """
+    Compute the Merkle root of a list of transactions.
+
+    Args:
+        transactions (list): Transactions in block order
+
+    Returns:
+        str: Hexadecimal root hash (hash of the empty string for no transactions)
+    """
+    level = [tx_hash(t) for t in transactions]
+    if not level:
+        return sha256(b"").hexdigest()
+
+    while len(level) > 1:
+        level = _next_level(level)
+
+    return level[0].hex()
+
+
+def merkle_proof(transactions, position):
+    """
+    Build the inclusion proof of one transaction: the sibling hash at every
+    level from the leaf up to the root (levels where the node is promoted
+    have no sibling and add nothing).
+
+    Args:
+        transactions (list): Transactions in block order
+        position (int): Position of the transaction in the block
+
+    Returns:
+        list: Steps {"side": "left"|"right", "hash": hex sibling hash}
+    """
+    if not 0 <= position < len(transactions):
+        raise IndexError("transaction position out of range")
+
+    level = [tx_hash(t) for t in transactions]
+    proof = []
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append({
+                "side": "left" if sibling < position else "right",
+                "hash": level[sibling].hex()
+            })
+        level = _next_level(level)
+        position //= 2
+
+    return proof
+
+
+def verify_merkle_proof(transaction, proof, root):
+    """
+    Check that a transaction is committed to by a Merkle root.
+
+    Args:
+        transaction (dict): Transaction data
+        proof (list): Steps returned by merkle_proof
+        root (str): Hexadecimal Merkle root (e.g. from a block header)
+
+    Returns:
+        bool: True if the proof leads from the transaction to the root
+    """
+    node = tx_hash(transaction)
+    try:
+        for step in proof:
+            sibling = bytes.fromhex(step["hash"])
+            if step["side"] == "left":
+                node = sha256(NODE_PREFIX + sibling + node).digest()
+            elif step["side"] == "right":
+                node = sha256(NODE_PREFIX + node + sibling).digest()
+            else:
+                return False
+    except (KeyError, TypeError, ValueError):
+        return False
+
+    return node.hex() == root
@@ -0,0 +1,26 @@
+# Move Base64 "file_content" of existing file records into the chunked blob store.
+# Safe to re-run: records that already have a "blob" manifest are skipped, and
+# downloads migrate any record left behind on first access.
+#
+# Usage: python migrate_blobs.py
+
+import os
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from blob_store import open_blob_store, migrate_file_record
+
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env'))
+
+if __name__ == "__main__":
+    client = MongoClient(os.environ.get("MONGODB_URI", "mongodb://localhost:27017/file_storage"))
+    db = client["file_storage"]
+    files_col = db["files"]
+    store = open_blob_store(db)
+
+    migrated = 0
+    for f_data in files_col.find({"file_content": {"$exists": True}}):
+        manifest = migrate_file_record(files_col, store, f_data)
+        migrated += 1
+        print(f"Migrated {f_data['file_key']}: {manifest['size']} bytes in {len(manifest['chunks'])} chunks")
+
+    print(f"Migrated {migrated} file records")
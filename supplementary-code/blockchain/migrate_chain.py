@@ -0,0 +1,24 @@
+# Re-mine legacy (version 1) blocks stored in MongoDB with the current header format.
+# Run once per node after upgrading; every peer must migrate, otherwise the
+# longest-chain consensus keeps the old hashes alive.
+#
+# Usage: python migrate_chain.py
+
+import os
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from Blockchain import Blockchain
+from chain_config import apply_chain_config
+
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env'))
+
+if __name__ == "__main__":
+    apply_chain_config()
+    client = MongoClient(os.environ.get("MONGODB_URI", "mongodb://localhost:27017/file_storage"))
+    blockchain = Blockchain(db=client["file_storage"], data_dir=os.environ.get("BLOCKCHAIN_DATA_DIR"))
+
+    if blockchain.verified_height != len(blockchain.chain) - 1:
+        print("Stored chain is not valid, refusing to migrate")
+    else:
+        migrated = blockchain.upgrade_chain()
+        print(f"Re-mined {migrated} of {len(blockchain.chain)} blocks")
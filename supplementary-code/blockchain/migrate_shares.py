@@ -0,0 +1,19 @@
+# Move the "shared_with" arrays of existing file records into the shares collection.
+# Safe to re-run: migrated records lose the field and grants are upserted.
+#
+# Usage: python migrate_shares.py
+
+import os
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from shares import ShareRepository
+
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env'))
+
+if __name__ == "__main__":
+    client = MongoClient(os.environ.get("MONGODB_URI", "mongodb://localhost:27017/file_storage"))
+    db = client["file_storage"]
+    shares = ShareRepository(db)
+
+    migrated = shares.migrate_legacy(db["files"])
+    print(f"Migrated {migrated} file records")
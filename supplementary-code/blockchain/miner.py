@@ -0,0 +1,90 @@
+"""
+Multi-core proof of work engine.
+
+The nonce space is split into one contiguous partition per worker process.
+Every worker grinds its own partition and all of them stop as soon as one
+finds a hash below the target.
+"""
+
+import multiprocessing
+import os
+import queue
+from hashlib import sha256
+
+# Nonce space searched by the parallel miner, split evenly between workers
+NONCE_SPACE = 2 ** 32
+
+# Number of nonces a worker tries between checks of the shared stop flag
+CHECK_INTERVAL = 4096
+
+
+def _search(prefix, suffix, target, start, stop, found, results):
+    """
+    Worker loop: try every nonce in [start, stop) until a hash is found
+    here or in another worker.
+    """
+    base = sha256(prefix)
+
+    for nonce in range(start, stop):
+        attempt = base.copy()
+        attempt.update(str(nonce).encode() + suffix)
+        digest = attempt.digest()
+
+        if int.from_bytes(digest, "big") < target:
+            results.put((nonce, digest.hex()))
+            found.set()
+            return
+
+        if nonce % CHECK_INTERVAL == 0 and found.is_set():
+            return
+
+
+def parallel_p_o_w(block, target, workers=None):
+    """
+    Find a nonce for the block using a pool of worker processes.
+
+    Args:
+        block (Block): Block to mine (not modified)
+        target (int): The hash, read as an integer, must be below it
+        workers (int): Number of worker processes (defaults to CPU count)
+
+    Returns:
+        tuple: (nonce, hash) that Blockchain.is_valid accepts
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    # Encode the block once; workers only append the nonce (and the constant suffix)
+    prefix, suffix = block.header_prefix()
+
+    ctx = multiprocessing.get_context()
+    found = ctx.Event()
+    results = ctx.Queue()
+
+    # One contiguous partition per worker, the last one takes the remainder
+    span = NONCE_SPACE // workers
+    processes = []
+    for i in range(workers):
+        stop = NONCE_SPACE if i == workers - 1 else (i + 1) * span
+        p = ctx.Process(
+            target=_search,
+            args=(prefix, suffix, target, i * span, stop, found, results),
+            daemon=True
+        )
+        p.start()
+        processes.append(p)
+
+    try:
+        while True:
+            try:
+                return results.get(timeout=0.1)
+            except queue.Empty:
+                if any(p.is_alive() for p in processes):
+                    continue
+                # Every worker has exited, drain anything still in flight
+                try:
+                    return results.get(timeout=1)
+                except queue.Empty:
+                    raise RuntimeError("Nonce space exhausted without a valid hash")
+    finally:
+        found.set()
+        for p in processes:
+            p.join()
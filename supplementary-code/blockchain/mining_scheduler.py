@@ -0,0 +1,197 @@
+"""
+Background mining scheduler.
+
+Owns Blockchain.pending: transactions are submitted to a thread-safe queue and
+a single worker thread moves them into the pending pool and seals a block
+when the pool is big enough, old enough, or a mining job was requested.
+HTTP handlers never wait on proof of work.
+"""
+
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Default sealing thresholds
+MAX_BLOCK_TXS = 50  # seal as soon as this many transactions are pending
+MAX_TX_AGE = 30.0  # seal when the oldest pending transaction is this old (seconds)
+
+# Number of finished jobs kept around for status polling
+MAX_JOBS = 1000
+
+# Seconds between checks of an idle pool for transactions that were put back
+# without a submission (reorgs, failed jobs)
+IDLE_POLL = 1.0
+
+
+class MiningScheduler:
+    """
+    Single-threaded miner fed through a submission queue.
+    """
+
+    def __init__(self, blockchain, max_block_txs=MAX_BLOCK_TXS, max_age=MAX_TX_AGE, on_block=None):
+        """
+        Initialize the scheduler (the worker thread starts on first use).
+
+        Args:
+            blockchain (Blockchain): Chain whose pending pool this scheduler owns
+            max_block_txs (int): Pending size that triggers sealing a block
+            max_age (float): Age in seconds of the oldest pending transaction
+                that triggers sealing a block
+            on_block (callable): Called with every newly mined block (e.g. announce_block)
+        """
+        self.blockchain = blockchain
+        self.max_block_txs = max_block_txs
+        self.max_age = max_age
+        self.on_block = on_block
+
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._oldest = None  # When the oldest pending transaction was queued
+
+    def start(self):
+        """Start the worker thread if it is not already running."""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mining-scheduler", daemon=True)
+                self._thread.start()
+
+    def submit(self, transaction):
+        """
+        Queue a transaction for the next block.
+
+        Args:
+            transaction (dict): Transaction data
+        """
+        self.start()
+        self._queue.put(("tx", transaction))
+
+    def request_mine(self):
+        """
+        Ask the worker to seal a block with whatever is pending.
+
+        Returns:
+            str: Job id to poll with job_status()
+        """
+        job_id = str(uuid.uuid4())
+        self._set_job(job_id, status="queued", created_at=time.time())
+        self.start()
+        self._queue.put(("mine", job_id))
+        return job_id
+
+    def job_status(self, job_id):
+        """
+        Get the state of a mining job.
+
+        Args:
+            job_id (str): Id returned by request_mine()
+
+        Returns:
+            dict|None: Job data (status is queued, mining, done, empty or failed)
+        """
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            return dict(job, job_id=job_id) if job else None
+
+    def queued_count(self):
+        """
+        Number of submissions not yet moved into the pending pool.
+
+        Returns:
+            int: Approximate queue size
+        """
+        return self._queue.qsize()
+
+    def _set_job(self, job_id, **fields):
+        with self._jobs_lock:
+            job = self._jobs.setdefault(job_id, {})
+            job.update(fields)
+            while len(self._jobs) > MAX_JOBS:
+                self._jobs.popitem(last=False)
+
+    def _next_timeout(self):
+        """Seconds until the oldest pending transaction reaches max_age (IDLE_POLL when none is tracked)."""
+        if self._oldest is None:
+            return IDLE_POLL
+        return max(0.0, self._oldest + self.max_age - time.time())
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._next_timeout())
+            except queue.Empty:
+                item = None
+
+            # Drain everything already queued so bursts batch into one block
+            items = [item] if item else []
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                jobs = []
+                for kind, payload in items:
+                    if kind == "tx":
+                        self.blockchain.add_pending(payload)
+                        if self._oldest is None:
+                            self._oldest = time.time()
+                    else:
+                        jobs.append(payload)
+
+                # Transactions requeued by a reorg (replace_chain) or released by
+                # a failed job are not submissions: start their age clock here
+                if self._oldest is None and len(self.blockchain.pending) > 0:
+                    self._oldest = time.time()
+
+                if (jobs
+                        or len(self.blockchain.pending) >= self.max_block_txs
+                        or (self._oldest is not None and self._next_timeout() == 0)):
+                    # A burst bigger than one block is sealed block after block
+                    if self._seal(jobs):
+                        while len(self.blockchain.pending) >= self.max_block_txs and self._seal([]):
+                            pass
+            except Exception as e:
+                print(f"Mining scheduler error: {e}")
+
+    def _seal(self, jobs):
+        """
+        Mine the pending pool and report the result to waiting jobs.
+
+        Returns:
+            bool: True if a block was mined
+        """
+        for job_id in jobs:
+            self._set_job(job_id, status="mining")
+
+        try:
+            result = self.blockchain.mine()
+        except Exception as e:
+            for job_id in jobs:
+                self._set_job(job_id, status="failed", error=str(e), finished_at=time.time())
+            # Back off a full max_age instead of retrying in a tight loop
+            self._oldest = time.time()
+            raise
+
+        self._oldest = time.time() if len(self.blockchain.pending) > 0 else None
+
+        if not result:
+            # Pending left over means the tip moved under us; retried after max_age
+            status = "failed" if len(self.blockchain.pending) > 0 else "empty"
+            for job_id in jobs:
+                self._set_job(job_id, status=status, finished_at=time.time())
+            return False
+
+        block = self.blockchain.chain[result]
+        for job_id in jobs:
+            self._set_job(job_id, status="done", index=result, hash=block.hash, finished_at=time.time())
+
+        print(f"Mined block #{result} with {len(block.transactions)} transactions")
+        if self.on_block is not None:
+            self.on_block(block)
+        return True
@@ -1,15 +1,29 @@
 # Import libraries
 import json
+import os
 import argparse
+import threading
+import time
 from flask import Flask, request, jsonify
 from Blockchain import Blockchain
+from chain_config import apply_chain_config
 from Block import Block
+from chain_api import chain_response
+from difficulty import target_to_difficulty
+from mining_scheduler import MiningScheduler
+from mempool import POOL_FULL_MESSAGE, tx_id
 
 # Create Flask app
 app = Flask(__name__)
 
-# Create blockchain instance
-blockchain = Blockchain()
+# Chain settings from the environment (POW_DIFFICULTY, BLOCK_TIME, ...); flags override them
+apply_chain_config()
+
+# Create blockchain instance (kept on disk when BLOCKCHAIN_DATA_DIR is set)
+blockchain = Blockchain(data_dir=os.environ.get("BLOCKCHAIN_DATA_DIR"))
+
+# Background miner that owns blockchain.pending and announces new blocks
+scheduler = MiningScheduler(blockchain, on_block=blockchain.announce_block)
 
 # Store port for this peer
 peer_port = 8800
@@ -25,6 +39,9 @@ def new_transaction():
     - v_file: Filename
     - file_data: File content (Base64 encoded)
     - file_size: Size of file in bytes
+    
+    Answers 200 when the transaction is already pending or on the chain, and
+    503 while the pool is full (it would be evicted on arrival).
     """
     file_data = request.get_json()
     required_fields = ["user", "v_file", "file_data", "file_size"]
@@ -34,8 +51,15 @@ def new_transaction():
         if not file_data.get(field):
             return jsonify({"error": f"Missing field: {field}"}), 400
     
-    # Add to pending transactions
-    blockchain.add_pending(file_data)
+    file_key = file_data.get("file_key")
+    if tx_id(file_data) in blockchain.pending or (file_key and blockchain.tx_index.by_file_key(file_key)):
+        return jsonify({"message": "Transaction already pending or on the chain"}), 200
+    if blockchain.pending.rejects_new():
+        return jsonify({"error": POOL_FULL_MESSAGE}), 503, {"Retry-After": str(int(scheduler.max_age))}
+    
+    # Queue for the background miner and pass it on, so peers can rebuild our blocks
+    scheduler.submit(file_data)
+    blockchain.gossip.relay_transaction(file_data)
     
     return jsonify({"message": "Transaction added to pending"}), 201
 
@@ -43,54 +67,101 @@ def new_transaction():
 @app.route("/chain", methods=["GET"])
 def get_chain():
     """
-    Get the entire blockchain (after running consensus).
-    This ensures we return the most up-to-date chain.
-    """
-    # Run consensus to sync with peers
-    blockchain.consensus()
+    Get the blockchain, streamed. Consensus runs in the background sync
+    thread (or on /sync_chain), never on this read path.
     
-    # Convert chain to JSON-serializable format
-    chain = []
-    for block in blockchain.chain:
-        chain.append({
-            "index": block.index,
-            "timestamp": block.timestamp,
-            "transactions": block.transactions,
-            "prev_hash": block.prev_hash,
-            "nonce": block.nonce,
-            "hash": block.hash
-        })
+    Query parameters:
+    - from: First block height (default 0)
+    - limit: Maximum number of blocks (default: up to the tip)
+    - view: "headers" for headers only (default "full")
     
-    print(f"Chain Len: {len(chain)}")
+    Answers 304 when the client's If-None-Match matches the ETag (tip hash and range).
+    """
+    return chain_response(blockchain, request.args, request.if_none_match)
+
+
+@app.route("/headers", methods=["GET"])
+def get_headers():
+    """
+    Get block headers (no transactions) for headers-first sync.
+    
+    Query parameters:
+    - from: First block height (default 0)
+    - limit: Maximum number of headers (default and cap: Blockchain.headers_per_request)
+    """
+    start = request.args.get("from", 0, type=int)
+    limit = min(request.args.get("limit", Blockchain.headers_per_request, type=int),
+                Blockchain.headers_per_request)
     
     return jsonify({
-        "length": len(chain),
-        "chain": chain
+        "length": len(blockchain.chain),
+        "headers": blockchain.get_headers(start, limit)
     })
 
 
+@app.route("/blocks", methods=["GET"])
+def get_blocks():
+    """
+    Get full blocks for a hash range (both ends included).
+    
+    Query parameters:
+    - from_hash: Hash of the first block
+    - to_hash: Hash of the last block
+    """
+    from_hash = request.args.get("from_hash")
+    to_hash = request.args.get("to_hash")
+    
+    if not from_hash or not to_hash:
+        return jsonify({"error": "Missing from_hash or to_hash"}), 400
+    
+    blocks = blockchain.get_blocks(from_hash, to_hash, Blockchain.blocks_per_request)
+    if blocks is None:
+        return jsonify({"error": "Hash range not found on this chain"}), 404
+    
+    return jsonify({"blocks": blocks})
+
+
+@app.route("/proof/<string:file_key>", methods=["GET"])
+def get_proof(file_key):
+    """
+    Merkle inclusion proof for the transaction that recorded a file.
+    Check it with verify_proof.py (or merkle.verify_merkle_proof).
+    """
+    try:
+        proof = blockchain.get_tx_proof(file_key)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    
+    if proof is None:
+        return jsonify({"error": "Transaction not found on chain"}), 404
+    
+    return jsonify(proof)
+
+
 @app.route("/mine", methods=["GET"])
 def mine_unconfirmed_transactions():
     """
-    Mine pending transactions into a new block.
-    After mining, announce the block to all peers.
+    Queue a mining job for the pending transactions.
+    The block is mined (and announced to all peers) in the background;
+    poll /mine/<job_id> for the result.
     """
-    result = blockchain.mine()
+    job_id = scheduler.request_mine()
     
-    if result:
-        # Get the newly mined block
-        new_block = blockchain.chain[result]
-        
-        # Announce to all peers
-        blockchain.announce_block(new_block)
-        
-        return jsonify({
-            "message": f"Block #{result} mined successfully",
-            "index": result,
-            "hash": new_block.hash
-        }), 200
-    else:
-        return jsonify({"message": "No pending transactions to mine"}), 200
+    return jsonify({
+        "message": "Mining job queued",
+        "job_id": job_id
+    }), 202
+
+
+@app.route("/mine/<string:job_id>", methods=["GET"])
+def get_mine_status(job_id):
+    """Get the status of a mining job."""
+    job = scheduler.job_status(job_id)
+    
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    
+    return jsonify(job), 200
 
 
 @app.route("/pending_tx")
@@ -98,7 +169,8 @@ def get_pending_tx():
     """Get all pending transactions."""
     return jsonify({
         "count": len(blockchain.pending),
-        "transactions": blockchain.pending
+        "bytes": blockchain.pending.bytes,
+        "transactions": blockchain.pending.transactions()
     })
 
 
@@ -106,29 +178,48 @@ def get_pending_tx():
 def validate_and_add_block():
     """
     Receive and validate a block from another peer.
-    Add it to the chain if valid.
+    The block may extend our tip, a competing branch (reorging onto it once
+    it has more work) or arrive before its parent (kept as an orphan).
     """
     block_data = request.get_json()
     
     # Create block from received data
-    block = Block(
-        block_data["index"],
-        block_data["transactions"],
-        block_data["prev_hash"]
-    )
-    block.timestamp = block_data.get("timestamp", block.timestamp)
-    block.nonce = block_data["nonce"]
-    hashl = block_data["hash"]
-    
-    # Try to add the block
-    added = blockchain.add_block(block, hashl)
+    block = Block.from_dict(block_data)
     
-    if not added:
-        return jsonify({"message": "Block discarded by node"}), 400
+    status = blockchain.receive_block(block)
     
-    return jsonify({"message": "Block added to chain"}), 201
+    if status == "invalid":
+        return jsonify({"message": "Block discarded by node", "status": status}), 400
+    if status == "known":
+        return jsonify({"message": "Block already known", "status": status}), 200
+    if status in ("added", "reorg"):
+        return jsonify({"message": "Block added to chain", "status": status}), 201
+    return jsonify({"message": "Block kept off the main chain", "status": status}), 202
+
+
+@app.route("/gossip/block", methods=["POST"])
+def gossip_block():
+    """
+    Receive a compact block announcement (header and short transaction ids).
+    Answers "missing" with the positions of the transactions not in our mempool.
+    """
+    reply = blockchain.gossip.on_compact_block(request.get_json())
+    return jsonify(reply), 400 if reply["status"] == "invalid" else 200
+
+
+@app.route("/gossip/tx", methods=["POST"])
+def gossip_transaction():
+    """Receive a transaction relayed by a peer; new ones are queued and relayed on."""
+    reply = blockchain.gossip.on_transaction(request.get_json(), scheduler.submit)
+    return jsonify(reply), 400 if reply["status"] == "invalid" else 200
 
 
+@app.route("/gossip/txs", methods=["POST"])
+def gossip_transactions():
+    """Receive the missing transactions of an announced block."""
+    reply = blockchain.gossip.on_transactions(request.get_json())
+    return jsonify(reply), 400 if reply["status"] == "invalid" else 200
+
 @app.route("/register_node", methods=["POST"])
 def register_node():
     """
@@ -145,23 +236,12 @@ def register_node():
     # Add peer to our list
     blockchain.register_peer(node_address)
     
-    # Return current chain for the new peer to sync
-    chain = []
-    for block in blockchain.chain:
-        chain.append({
-            "index": block.index,
-            "timestamp": block.timestamp,
-            "transactions": block.transactions,
-            "prev_hash": block.prev_hash,
-            "nonce": block.nonce,
-            "hash": block.hash
-        })
-    
-    
+    # Return our tip; the new peer syncs the rest through /headers and /blocks
     return jsonify({
         "message": "Node registered successfully",
         "total_peers": len(blockchain.peers),
-        "chain": chain
+        "length": len(blockchain.chain),
+        "tip": blockchain.last_block().header()
     }), 201
 
 
@@ -175,7 +255,7 @@ def sync_chain():
     
     if replaced:
         return jsonify({
-            "message": "Chain replaced with longer chain from network",
+            "message": "Chain replaced with heavier chain from network",
             "length": len(blockchain.chain)
         }), 200
     else:
@@ -190,7 +270,8 @@ def get_peers():
     """Get list of registered peer nodes."""
     return jsonify({
         "count": len(blockchain.peers),
-        "peers": list(blockchain.peers)
+        "peers": list(blockchain.peers),
+        "health": blockchain.peer_client.health()
     })
 
 
@@ -200,23 +281,70 @@ def get_info():
     return jsonify({
         "port": peer_port,
         "chain_length": len(blockchain.chain),
-        "pending_transactions": len(blockchain.pending),
-        "difficulty": blockchain.difficulty,
+        "pending_transactions": len(blockchain.pending) + scheduler.queued_count(),
+        "difficulty": round(target_to_difficulty(blockchain.next_target()), 3),
+        "min_difficulty": Blockchain.difficulty,
+        "target_block_time": Blockchain.target_block_time,
         "peers": len(blockchain.peers)
     })
 
 
+def sync_forever(interval):
+    """
+    Background consensus: pull heavier chains from the peers every interval seconds.
+    
+    Args:
+        interval (float): Seconds between rounds
+    """
+    while True:
+        time.sleep(interval)
+        if not blockchain.peers:
+            continue
+        try:
+            blockchain.consensus()
+        except Exception as e:
+            print(f"DEBUG: Background sync failed: {e}")
+
+
 if __name__ == "__main__":
     # Parse command line arguments for port
     parser = argparse.ArgumentParser(description='Run blockchain peer node')
     parser.add_argument('--port', type=int, default=8800, help='Port to run peer on')
+    parser.add_argument('--workers', type=int, default=Blockchain.mining_workers, help='Worker processes used for mining')
+    parser.add_argument('--block-txs', type=int, default=scheduler.max_block_txs,
+                        help='Seal a block once this many transactions are pending')
+    parser.add_argument('--block-age', type=float, default=scheduler.max_age,
+                        help='Seal a block once the oldest pending transaction is this many seconds old')
+    parser.add_argument('--difficulty', type=float, default=Blockchain.difficulty,
+                        help='Minimum proof of work difficulty (leading hex zeros, may be fractional)')
+    parser.add_argument('--block-time', type=float, default=Blockchain.target_block_time,
+                        help='Seconds between blocks that difficulty retargeting aims for')
+    parser.add_argument('--block-tx-limit', type=int, default=Blockchain.block_tx_limit,
+                        help='Maximum number of transactions in a mined block')
+    parser.add_argument('--sync-interval', type=float, default=10.0,
+                        help='Seconds between background syncs with the peers (0 disables)')
+    parser.add_argument('--mempool-priority', choices=["age", "size"], default=blockchain.pending.priority,
+                        help='Fill blocks oldest first (age) or smallest first (size)')
     args = parser.parse_args()
     
     peer_port = args.port
+    Blockchain.mining_workers = args.workers
+    scheduler.max_block_txs = args.block_txs
+    scheduler.max_age = args.block_age
+    Blockchain.block_tx_limit = args.block_tx_limit
+    Blockchain.difficulty = args.difficulty
+    Blockchain.target_block_time = args.block_time
+    blockchain.pending.priority = args.mempool_priority
     
     print(f"Starting blockchain peer on port {peer_port}")
-    print(f"Difficulty: {blockchain.difficulty}")
+    print(f"Difficulty: {target_to_difficulty(blockchain.next_target()):.2f} "
+          f"(minimum {Blockchain.difficulty}, target block time {Blockchain.target_block_time}s)")
+    print(f"Mining workers: {Blockchain.mining_workers}")
     print(f"Genesis block hash: {blockchain.chain[0].hash}")
     
-    # Run Flask app
-    app.run(host='0.0.0.0', port=peer_port, debug=True)
+    if args.sync_interval > 0:
+        threading.Thread(target=sync_forever, args=(args.sync_interval,), daemon=True).start()
+    
+    # Run Flask app. No reloader: it would run this module, and open the block
+    # store, in a second process that never serves
+    app.run(host='0.0.0.0', port=peer_port, debug=True, use_reloader=False)
@@ -0,0 +1,173 @@
+"""
+Concurrent HTTP client for talking to peer nodes.
+
+Requests go through one pooled requests.Session and fan out over a bounded
+thread pool. Every request has a per-peer timeout and every fan-out has an
+overall deadline, so one round costs at most as much as the slowest healthy
+peer. Peers that keep failing are backed off exponentially and evicted.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PeerClient:
+    """
+    Pooled, concurrent peer client with health tracking.
+    """
+
+    def __init__(self, max_workers=16, timeout=2.0, deadline=5.0, max_failures=5,
+                 base_backoff=1.0, max_backoff=60.0, on_evict=None):
+        """
+        Initialize the client.
+
+        Args:
+            max_workers (int): Maximum concurrent requests
+            timeout (float): Per-peer request timeout in seconds
+            deadline (float): Overall deadline for a fan-out in seconds
+            max_failures (int): Consecutive failures before a peer is evicted
+            base_backoff (float): Backoff after the first failure in seconds
+            max_backoff (float): Upper bound for the backoff in seconds
+            on_evict (callable): Called with the peer URL when it is evicted
+        """
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_failures = max_failures
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.on_evict = on_evict
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="peer-client")
+        self._health = {}  # peer -> {"failures": int, "retry_at": float, "last_ok": float}
+        self._lock = threading.Lock()
+
+    # ========== HEALTH ==========
+
+    def reset(self, peer):
+        """Forget the failure history of a peer (e.g. when it registers again)."""
+        with self._lock:
+            self._health.pop(peer, None)
+
+    def is_available(self, peer):
+        """
+        Check whether a peer is out of its backoff window.
+
+        Args:
+            peer (str): Peer URL
+
+        Returns:
+            bool: True if requests to the peer are allowed
+        """
+        with self._lock:
+            state = self._health.get(peer)
+            return state is None or state["retry_at"] <= time.time()
+
+    def record_success(self, peer):
+        """Mark a peer healthy again."""
+        with self._lock:
+            self._health[peer] = {"failures": 0, "retry_at": 0.0, "last_ok": time.time()}
+
+    def record_failure(self, peer):
+        """Count a failure, back the peer off and evict it after max_failures in a row."""
+        with self._lock:
+            state = self._health.setdefault(peer, {"failures": 0, "retry_at": 0.0, "last_ok": None})
+            state["failures"] += 1
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (state["failures"] - 1))
+            state["retry_at"] = time.time() + backoff
+            evict = state["failures"] >= self.max_failures
+            if evict:
+                del self._health[peer]
+
+        if evict:
+            print(f"Evicting peer {peer} after {self.max_failures} consecutive failures")
+            if self.on_evict is not None:
+                self.on_evict(peer)
+
+    def health(self):
+        """
+        Snapshot of the health of every peer with a history.
+
+        Returns:
+            dict: peer -> {"failures", "retry_at", "last_ok"}
+        """
+        with self._lock:
+            return {peer: dict(state) for peer, state in self._health.items()}
+
+    # ========== REQUESTS ==========
+
+    def request(self, method, peer, path, **kwargs):
+        """
+        Send one request to a peer and record the outcome.
+
+        Args:
+            method (str): HTTP method
+            peer (str): Peer URL
+            path (str): Path on the peer (e.g. "/headers")
+            **kwargs: Passed to requests (params, json, ...)
+
+        Returns:
+            requests.Response: Successful (2xx) response
+
+        Raises:
+            requests.RequestException: On connection errors, timeouts and non-2xx replies
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            response = self.session.request(method, f"{peer}{path}", **kwargs)
+            if response.status_code >= 500:
+                response.raise_for_status()
+        except requests.RequestException:
+            self.record_failure(peer)
+            raise
+
+        # A 4xx is an answer (e.g. a rejected block), not an unhealthy peer
+        self.record_success(peer)
+        response.raise_for_status()
+        return response
+
+    def get_json(self, peer, path, params=None):
+        """GET a path on a peer and decode the JSON body."""
+        return self.request("GET", peer, path, params=params).json()
+
+    def fan_out(self, peers, fn, deadline=None):
+        """
+        Run fn(peer) concurrently for every available peer.
+
+        Args:
+            peers (iterable): Peer URLs
+            fn (callable): Function taking a peer URL
+            deadline (float): Overall deadline in seconds (defaults to self.deadline)
+
+        Returns:
+            dict: peer -> result for every call that finished in time without raising
+        """
+        futures = {
+            self._executor.submit(fn, peer): peer
+            for peer in list(peers)
+            if self.is_available(peer)
+        }
+        if not futures:
+            return {}
+
+        done, not_done = wait(futures, timeout=deadline if deadline is not None else self.deadline)
+
+        results = {}
+        for future in done:
+            peer = futures[future]
+            try:
+                results[peer] = future.result()
+            except Exception as e:
+                print(f"Error talking to peer {peer}: {e}")
+        for future in not_done:
+            # Still running past the deadline; the per-peer timeout ends it soon
+            print(f"Peer {futures[future]} missed the deadline")
+        return results
@@ -0,0 +1,139 @@
+"""
+MongoDB persistence for blocks.
+
+Blocks are written in batches with one bulk_write of upserts keyed on the
+block height, so saving is idempotent and a long sync costs a few round-trips
+instead of two per block. Unique indexes on "index" and "hash" keep the
+collection free of duplicates. Chain replacements (reorgs) delete the blocks
+above the fork point and write the new ones inside a transaction when the
+deployment supports it (replica sets, Atlas).
+"""
+
+from pymongo import ASCENDING, ReplaceOne
+from pymongo.errors import ConfigurationError, DuplicateKeyError, OperationFailure
+
+from Block import Block
+
+# Blocks per bulk_write request
+BATCH_SIZE = 1000
+
+# Server error code for transactions on a standalone server
+ILLEGAL_OPERATION = 20
+
+
+class BlockRepository:
+    """
+    Block collection with bulk, idempotent writes.
+    """
+
+    def __init__(self, db, collection="blocks"):
+        """
+        Initialize the repository and make sure its indexes exist.
+
+        Args:
+            db: MongoDB database instance
+            collection (str): Name of the blocks collection
+        """
+        self.db = db
+        self.col = db[collection]
+        self._transactions = True  # Cleared once the server refuses a transaction
+        self.ensure_indexes()
+
+    def ensure_indexes(self):
+        """Create the unique indexes on block height and hash."""
+        try:
+            self.col.create_index([("index", ASCENDING)], unique=True, name="index_unique")
+            self.col.create_index([("hash", ASCENDING)], unique=True, name="hash_unique")
+        except OperationFailure as e:
+            # Typically duplicates written before the indexes existed
+            print(f"DEBUG: Could not create block indexes: {e}")
+
+    def load(self, start=0):
+        """
+        Load stored blocks in height order.
+
+        Args:
+            start (int): First height to load
+
+        Returns:
+            list: Blocks (records without a version are legacy blocks)
+        """
+        cursor = self.col.find({"index": {"$gte": start}}, {"_id": 0}).sort("index", 1)
+        return [Block.from_dict(b_data) for b_data in cursor]
+
+    def hash_at(self, height):
+        """
+        Hash of the stored block at a height.
+
+        Returns:
+            str|None: Block hash, None if no block is stored there
+        """
+        b_data = self.col.find_one({"index": height}, {"hash": 1})
+        return b_data["hash"] if b_data else None
+
+    def insert_new(self, block):
+        """
+        Store a block at a height nobody has written yet. Used when several
+        processes share the collection: the unique index lets exactly one of
+        them claim each height.
+
+        Args:
+            block (Block): Block to store
+
+        Returns:
+            bool: False if a block is already stored at that height
+        """
+        try:
+            self.col.insert_one(block.__dict__())
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def save_blocks(self, blocks, session=None):
+        """
+        Upsert blocks by height; saving the same blocks again is a no-op.
+
+        Args:
+            blocks (list): Blocks to write
+            session: Optional client session (used inside transactions)
+        """
+        blocks = list(blocks)
+        for i in range(0, len(blocks), BATCH_SIZE):
+            ops = [
+                ReplaceOne({"index": block.index}, block.__dict__(), upsert=True)
+                for block in blocks[i:i + BATCH_SIZE]
+            ]
+            self.col.bulk_write(ops, ordered=True, session=session)
+
+    def replace_from(self, fork, blocks):
+        """
+        Replace every stored block above the fork point with new blocks, atomically
+        when transactions are available.
+
+        Args:
+            fork (int): Height of the last block kept
+            blocks (list): Blocks for heights fork + 1 and up
+        """
+        tip = fork + len(blocks)
+
+        def write(session):
+            self.col.delete_many({"index": {"$gt": fork}}, session=session)
+            self.save_blocks(blocks, session=session)
+
+        if self._transactions:
+            try:
+                with self.db.client.start_session() as session:
+                    session.with_transaction(write)
+                return
+            except (ConfigurationError, NotImplementedError):
+                self._transactions = False
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                self._transactions = False
+            print("DEBUG: MongoDB transactions unavailable, replacing blocks without one")
+
+        # Without a transaction, write the new branch before removing what is
+        # left above it, so a crash never leaves fewer blocks than before
+        self.save_blocks(blocks)
+        self.col.delete_many({"index": {"$gt": tip}})
@@ -0,0 +1,188 @@
+"""
+File share grants.
+
+Every grant is its own document in a "shares" collection instead of an entry
+in an unbounded "shared_with" array inside the file record:
+    {"file_key", "owner", "recipient", "filename", "secure_name", "created_at"}
+The file name fields are copied in, so listing what was shared with a user
+never touches the files collection.
+
+Indexes:
+- (file_key, recipient), unique: one grant per pair, so sharing is idempotent
+  and access checks and revokes on a file are index lookups
+- (recipient, owner, created_at): "files shared with me (by this owner)"
+
+Listings are cached per (recipient, owner) for a few seconds; share and
+revoke drop the affected entries. With several worker processes another
+worker's cache may lag by up to cache_ttl.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+# Seconds a cached listing is served
+CACHE_TTL = 30.0
+
+# Cached listings kept per process
+CACHE_SIZE = 1024
+
+
+class ShareRepository:
+    """
+    Share grants with bulk writes and cached per-recipient listings.
+    """
+
+    def __init__(self, db, collection="shares", cache_ttl=CACHE_TTL, cache_size=CACHE_SIZE):
+        """
+        Initialize the repository and make sure its indexes exist.
+
+        Args:
+            db: MongoDB database instance
+            collection (str): Name of the grants collection
+            cache_ttl (float): Seconds a cached listing is served
+            cache_size (int): Maximum number of cached listings
+        """
+        self.col = db[collection]
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (recipient, owner) -> (expires_at, files)
+        self._lock = threading.Lock()
+        self.ensure_indexes()
+
+    def ensure_indexes(self):
+        """Create the grant indexes."""
+        try:
+            self.col.create_index([("file_key", ASCENDING), ("recipient", ASCENDING)],
+                                  unique=True, name="file_recipient_unique")
+            self.col.create_index([("recipient", ASCENDING), ("owner", ASCENDING), ("created_at", ASCENDING)],
+                                  name="recipient_owner")
+        except OperationFailure as e:
+            print(f"DEBUG: Could not create share indexes: {e}")
+
+    def share(self, f_data, recipients):
+        """
+        Grant recipients access to a file; existing grants are left as they are.
+
+        Args:
+            f_data (dict): File record (file_key, owner, filename, secure_name)
+            recipients (list): Recipient user keys
+
+        Returns:
+            int: Number of new grants
+        """
+        recipients = [r for r in dict.fromkeys(recipients) if r and r != f_data["owner"]]
+        if not recipients:
+            return 0
+
+        now = time.time()
+        ops = [
+            UpdateOne(
+                {"file_key": f_data["file_key"], "recipient": recipient},
+                {"$setOnInsert": {
+                    "owner": f_data["owner"],
+                    "filename": f_data["filename"],
+                    "secure_name": f_data["secure_name"],
+                    "created_at": now
+                }},
+                upsert=True
+            )
+            for recipient in recipients
+        ]
+        result = self.col.bulk_write(ops, ordered=False)
+        self._invalidate(recipients)
+        return result.upserted_count
+
+    def revoke(self, file_key, recipients=None):
+        """
+        Remove grants on a file.
+
+        Args:
+            file_key (str): File key
+            recipients (list): Recipient user keys (None revokes every grant)
+
+        Returns:
+            int: Number of grants removed
+        """
+        query = {"file_key": file_key}
+        if recipients is not None:
+            query["recipient"] = {"$in": list(recipients)}
+            affected = list(recipients)
+        else:
+            affected = self.col.distinct("recipient", query)
+        deleted = self.col.delete_many(query).deleted_count
+        self._invalidate(affected)
+        return deleted
+
+    def can_access(self, file_key, user_key):
+        """Check whether a file was shared with a user (owners are checked by the caller)."""
+        return self.col.count_documents({"file_key": file_key, "recipient": user_key}, limit=1) > 0
+
+    def grantees(self, file_key):
+        """
+        Users a file is shared with.
+
+        Returns:
+            list: Recipient user keys, oldest grant first
+        """
+        cursor = self.col.find({"file_key": file_key}, {"recipient": 1}).sort("created_at", ASCENDING)
+        return [g["recipient"] for g in cursor]
+
+    def shared_with(self, recipient, owner=None):
+        """
+        Files shared with a user, optionally only those of one owner.
+
+        Args:
+            recipient (str): Recipient user key
+            owner (str): Owner user key (None for every owner)
+
+        Returns:
+            list: {"filename", "file_key", "secure_name", "owner"} dicts, oldest grant first
+        """
+        key = (recipient, owner)
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                self._cache.move_to_end(key)
+                return cached[1]
+
+        query = {"recipient": recipient}
+        if owner is not None:
+            query["owner"] = owner
+        projection = {"_id": 0, "filename": 1, "file_key": 1, "secure_name": 1, "owner": 1}
+        files = list(self.col.find(query, projection).sort("created_at", ASCENDING))
+
+        with self._lock:
+            self._cache[key] = (now + self.cache_ttl, files)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return files
+
+    def _invalidate(self, recipients):
+        recipients = set(recipients)
+        with self._lock:
+            for key in [k for k in self._cache if k[0] in recipients]:
+                del self._cache[key]
+
+    def migrate_legacy(self, files_col):
+        """
+        Move "shared_with" arrays of file records into grants.
+        Safe to re-run: migrated records lose the field.
+
+        Args:
+            files_col: MongoDB "files" collection
+
+        Returns:
+            int: Number of file records migrated
+        """
+        migrated = 0
+        for f_data in files_col.find({"shared_with": {"$exists": True}}):
+            self.share(f_data, f_data.get("shared_with") or [])
+            files_col.update_one({"_id": f_data["_id"]}, {"$unset": {"shared_with": ""}})
+            migrated += 1
+        return migrated
@@ -0,0 +1,396 @@
+"""
+Local multi-node simulation and load harness.
+
+Launches N peer.py processes on localhost, connects them, drives upload and
+mining load against them and reports how the network behaved:
+- propagation latency: time from the first node having a block to the last
+- fork rate: share of the blocks seen anywhere that did not end up on the
+  final chain
+- convergence time: time for every node to agree on the tip once load stops
+- sync time: time for a fresh node to download the whole chain
+- throughput: confirmed transactions and blocks per second
+
+Peers keep their chain in an on-disk block store under a temporary directory
+and their pending pool in memory; peer.py never talks to MongoDB, so the
+simulation runs offline. Every node starts from the same genesis block.
+Block arrival times are sampled by polling /headers, so latencies are only
+as precise as --poll-interval.
+
+Usage: python simulate.py [--nodes 5] [--duration 30] [--tx-rate 20] [--output report.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from Blockchain import Blockchain
+from benchmark import summarize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class Node:
+    """
+    One peer.py subprocess.
+    """
+
+    def __init__(self, index, port, data_dir, args, log_dir):
+        """
+        Initialize a node (call start() to launch it).
+
+        Args:
+            index (int): Node number
+            port (int): HTTP port
+            data_dir (str): Block store directory
+            args (argparse.Namespace): Simulation settings
+            log_dir (str): Directory for the node's output
+        """
+        self.index = index
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.data_dir = data_dir
+        self.args = args
+        self.log_path = os.path.join(log_dir, f"node{index}.log")
+        self.process = None
+
+    def start(self):
+        """Launch the peer process."""
+        command = [
+            sys.executable, os.path.join(HERE, "peer.py"),
+            "--port", str(self.port),
+            "--difficulty", str(self.args.difficulty),
+            "--block-time", str(self.args.block_time),
+            "--block-txs", str(self.args.block_txs),
+            "--block-age", str(self.args.block_age)
+        ]
+        env = dict(os.environ, BLOCKCHAIN_DATA_DIR=self.data_dir, PYTHONUNBUFFERED="1")
+        log = open(self.log_path, "w")
+        # Own process group, so the node's mining worker processes go down with it
+        self.process = subprocess.Popen(command, cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                        start_new_session=True)
+
+    def wait_ready(self, session, timeout=30.0):
+        """Block until the node answers /info."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                session.get(f"{self.url}/info", timeout=1).raise_for_status()
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError(f"Node {self.index} did not start, see {self.log_path}")
+
+    def stop(self):
+        """Terminate the peer process and its children."""
+        if self.process is None or self.process.poll() is not None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            self.process.wait(timeout=5)
+        except (ProcessLookupError, subprocess.TimeoutExpired):
+            os.killpg(self.process.pid, signal.SIGKILL)
+
+
+class ChainWatcher(threading.Thread):
+    """
+    Polls every node's headers and records when each node first had each block.
+    """
+
+    def __init__(self, nodes, interval):
+        super().__init__(daemon=True)
+        self.nodes = nodes
+        self.interval = interval
+        self.session = requests.Session()
+        self.first_seen = {}  # block hash -> {node index: time}
+        self.heights = {}  # block hash -> height
+        self._known = {node.index: 0 for node in nodes}  # node -> chain length at the last poll
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            for node in self.nodes:
+                self.poll(node)
+            self._done.wait(self.interval)
+
+    def poll(self, node):
+        """Record the headers of a node near its tip (a few below, to catch reorgs)."""
+        start = max(0, self._known[node.index] - 5)
+        try:
+            data = self.session.get(f"{node.url}/headers", params={"from": start}, timeout=2).json()
+        except (requests.RequestException, ValueError):
+            return
+        now = time.time()
+        for header in data["headers"]:
+            self.first_seen.setdefault(header["hash"], {}).setdefault(node.index, now)
+            self.heights[header["hash"]] = header["index"]
+        self._known[node.index] = data["length"]
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class LoadGenerator:
+    """
+    Upload and mining load: uploads go to random nodes at a fixed rate and
+    mining jobs are requested from random miners at a fixed interval.
+    """
+
+    def __init__(self, nodes, miners, tx_rate, mine_interval, tx_bytes):
+        self.nodes = nodes
+        self.miners = miners
+        self.tx_rate = tx_rate
+        self.mine_interval = mine_interval
+        self.tx_bytes = tx_bytes
+        self.sent = 0
+        self.failed = 0
+        self.mine_requests = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._upload_loop, daemon=True)]
+        if self.mine_interval > 0:
+            self._threads.append(threading.Thread(target=self._mine_loop, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _upload_loop(self):
+        session = requests.Session()
+        interval = 1.0 / self.tx_rate
+        next_at = time.time()
+        while not self._stop.is_set():
+            node = random.choice(self.nodes)
+            transaction = {
+                "user": f"user{random.randrange(100)}",
+                "v_file": f"file{self.sent}.bin",
+                "file_data": "x" * self.tx_bytes,
+                "file_size": self.tx_bytes,
+                "file_key": "%032x" % random.getrandbits(128)
+            }
+            try:
+                session.post(f"{node.url}/new_transaction", json=transaction, timeout=2).raise_for_status()
+                self.sent += 1
+            except requests.RequestException:
+                self.failed += 1
+            next_at += interval
+            self._stop.wait(max(0.0, next_at - time.time()))
+
+    def _mine_loop(self):
+        session = requests.Session()
+        while not self._stop.wait(self.mine_interval):
+            node = random.choice(self.miners)
+            try:
+                session.get(f"{node.url}/mine", timeout=2)
+                self.mine_requests += 1
+            except requests.RequestException:
+                pass
+
+
+def seed_data_dirs(root, count):
+    """
+    Block stores that all start from the same genesis block.
+
+    Args:
+        root (str): Parent directory
+        count (int): Number of stores
+
+    Returns:
+        list: Store directories
+    """
+    template = os.path.join(root, "genesis")
+    Blockchain(data_dir=template).chain.store.close()
+    dirs = []
+    for i in range(count):
+        path = os.path.join(root, f"node{i}")
+        shutil.copytree(template, path)
+        dirs.append(path)
+    return dirs
+
+
+def tips(session, nodes):
+    """Chain length and tip hash of every node that answers."""
+    result = {}
+    for node in nodes:
+        try:
+            data = session.get(f"{node.url}/headers", params={"from": 0, "limit": 1}, timeout=2).json()
+            tip = session.get(f"{node.url}/headers", params={"from": data["length"] - 1, "limit": 1}, timeout=2).json()
+            result[node.index] = (data["length"], tip["headers"][0]["hash"])
+        except (requests.RequestException, ValueError, IndexError):
+            pass
+    return result
+
+
+def wait_converged(session, nodes, timeout):
+    """
+    Ask every node to sync until all report the same tip.
+
+    Returns:
+        float|None: Seconds until convergence, None on timeout
+    """
+    start = time.time()
+    while time.time() - start < timeout:
+        state = tips(session, nodes)
+        if len(state) == len(nodes) and len(set(state.values())) == 1:
+            return time.time() - start
+        for node in nodes:
+            try:
+                session.get(f"{node.url}/sync_chain", timeout=10)
+            except requests.RequestException:
+                pass
+        time.sleep(0.2)
+    return None
+
+
+def connect(session, nodes, degree):
+    """Register every node with `degree` random others (all others when degree is 0)."""
+    for node in nodes:
+        others = [n for n in nodes if n is not node]
+        if degree:
+            others = random.sample(others, min(degree, len(others)))
+        for other in others:
+            session.post(f"{node.url}/register_node", json={"node_address": other.url}, timeout=5)
+
+
+def run(args):
+    """
+    Run one simulation.
+
+    Args:
+        args (argparse.Namespace): Settings (see the command line options)
+
+    Returns:
+        dict: Report
+    """
+    random.seed(args.seed)
+    root = tempfile.mkdtemp(prefix="chain-sim-")
+    session = requests.Session()
+    dirs = seed_data_dirs(root, args.nodes + 1)
+    nodes = [Node(i, args.base_port + i, dirs[i], args, root) for i in range(args.nodes)]
+    newcomer = Node(args.nodes, args.base_port + args.nodes, dirs[args.nodes], args, root)
+
+    try:
+        for node in nodes:
+            node.start()
+        for node in nodes:
+            node.wait_ready(session)
+        connect(session, nodes, args.degree)
+
+        watcher = ChainWatcher(nodes, args.poll_interval)
+        watcher.start()
+        load = LoadGenerator(nodes, nodes[:args.miners or args.nodes], args.tx_rate, args.mine_interval, args.tx_bytes)
+        print(f"Driving load on {args.nodes} nodes for {args.duration}s (logs in {root})", file=sys.stderr)
+        started = time.time()
+        load.start()
+        time.sleep(args.duration)
+        load.stop()
+        elapsed = time.time() - started
+
+        # Let the last blocks propagate, then force agreement
+        time.sleep(max(args.block_age, 1.0))
+        convergence = wait_converged(session, nodes, args.converge_timeout)
+        for node in nodes:
+            watcher.poll(node)
+        watcher.stop()
+
+        # Final chain: node 0's chain after convergence
+        final_hashes = set()
+        length = 1
+        while len(final_hashes) < length:
+            data = session.get(f"{nodes[0].url}/headers", params={"from": len(final_hashes)}, timeout=5).json()
+            final_hashes.update(h["hash"] for h in data["headers"])
+            length = data["length"]
+        info = session.get(f"{nodes[0].url}/info", timeout=5).json()
+
+        mined = {h for h, height in watcher.heights.items() if height > 0}
+        forked = mined - final_hashes
+        latencies = [
+            max(seen.values()) - min(seen.values())
+            for block_hash, seen in watcher.first_seen.items()
+            if block_hash in final_hashes and len(seen) == len(nodes) and watcher.heights[block_hash] > 0
+        ]
+
+        # A fresh node catching up with the whole chain
+        newcomer.start()
+        newcomer.wait_ready(session)
+        session.post(f"{newcomer.url}/register_node", json={"node_address": nodes[0].url}, timeout=5)
+        sync_started = time.time()
+        synced = wait_converged(session, [nodes[0], newcomer], args.converge_timeout)
+        sync_seconds = time.time() - sync_started if synced is not None else None
+
+        transactions = sum(
+            len(b["transactions"])
+            for b in session.get(f"{nodes[0].url}/chain", timeout=30).json()["chain"]
+        )
+
+        return {
+            "config": vars(args),
+            "duration": elapsed,
+            "uploads": {"sent": load.sent, "failed": load.failed, "per_sec": load.sent / elapsed},
+            "mine_requests": load.mine_requests,
+            "blocks": {
+                "final_chain": length,
+                "seen": len(mined),
+                "forked": len(forked),
+                "fork_rate": len(forked) / len(mined) if mined else 0.0
+            },
+            "throughput": {
+                "confirmed_tx_per_sec": transactions / elapsed,
+                "blocks_per_sec": (length - 1) / elapsed,
+                "pending_at_end": info["pending_transactions"]
+            },
+            "propagation_seconds": summarize(latencies) if latencies else None,
+            "poll_interval": args.poll_interval,
+            "convergence_seconds": convergence,
+            "sync": {"blocks": length, "seconds": sync_seconds}
+        }
+    finally:
+        for node in nodes + [newcomer]:
+            node.stop()
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-node blockchain simulation")
+    parser.add_argument("--nodes", type=int, default=5, help="Number of peers")
+    parser.add_argument("--base-port", type=int, default=8900, help="Port of the first peer")
+    parser.add_argument("--degree", type=int, default=0, help="Peers each node registers (0 = all)")
+    parser.add_argument("--miners", type=int, default=0, help="Nodes that get mining requests (0 = all)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--tx-rate", type=float, default=20.0, help="Uploads per second across all nodes")
+    parser.add_argument("--tx-bytes", type=int, default=256, help="Size of each upload's file data")
+    parser.add_argument("--mine-interval", type=float, default=2.0,
+                        help="Seconds between mining requests to a random miner (0 = only automatic sealing)")
+    parser.add_argument("--block-txs", type=int, default=50, help="Pending transactions that make a node seal a block")
+    parser.add_argument("--block-age", type=float, default=5.0, help="Pending age that makes a node seal a block")
+    parser.add_argument("--difficulty", type=float, default=2, help="Minimum proof of work difficulty")
+    parser.add_argument("--block-time", type=float, default=2.0, help="Block time retargeting aims for")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="Seconds between header polls")
+    parser.add_argument("--converge-timeout", type=float, default=60.0, help="Seconds to wait for agreement")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for load and topology")
+    parser.add_argument("--keep", action="store_true", help="Keep the node directories and logs")
+    parser.add_argument("--output", help="Write the JSON report here (stdout by default)")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
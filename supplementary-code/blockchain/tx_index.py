@@ -0,0 +1,406 @@
+"""
+Transaction index over the chain.
+
+Kept up to date block by block as blocks are added, loaded or replaced, so
+listing transactions never walks the chain. Entries are kept in chain order
+and indexed by file_key, user and block index.
+
+Two implementations share the same interface:
+- TransactionIndex keeps the entries in memory (chains held in memory)
+- StoredTransactionIndex keeps them in an SQLite file next to the on-disk
+  block store, so neither startup time nor memory grows with the chain.
+  It records the hash of every indexed block; at startup only the blocks
+  the index is missing (or that a reorg or crash left it disagreeing on)
+  are read back from the store
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+
+
+class TransactionIndex:
+    """
+    In-memory transaction index maintained incrementally by Blockchain.
+    Safe to query from request threads while blocks are being added.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._entries = []  # Transactions in chain order, each tagged with its block
+        self._block_start = []  # Block height -> position of its first entry
+        self._by_file_key = {}  # file_key -> position
+        self._by_user = defaultdict(list)  # user -> positions (ascending)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def height(self):
+        """
+        Number of blocks indexed.
+
+        Returns:
+            int: Height of the next block to add
+        """
+        return len(self._block_start)
+
+    def add_block(self, block):
+        """
+        Index the transactions of the next block.
+
+        Args:
+            block (Block): Block at height self.height()
+        """
+        with self._lock:
+            if block.index != len(self._block_start):
+                raise ValueError(f"Expected block #{len(self._block_start)}, got #{block.index}")
+
+            self._block_start.append(len(self._entries))
+            for trans in block.transactions:
+                position = len(self._entries)
+                entry = dict(trans)
+                entry["index"] = block.index
+                entry["hash"] = block.prev_hash
+                self._entries.append(entry)
+
+                if "file_key" in trans:
+                    self._by_file_key[trans["file_key"]] = position
+                if "user" in trans:
+                    self._by_user[trans["user"]].append(position)
+
+    def truncate(self, height):
+        """
+        Drop the transactions of every block at or above a height.
+
+        Args:
+            height (int): First block height to drop
+        """
+        with self._lock:
+            if height >= len(self._block_start):
+                return
+            cut = self._block_start[height]
+
+            for entry in self._entries[cut:]:
+                file_key = entry.get("file_key")
+                if file_key is not None and self._by_file_key.get(file_key, -1) >= cut:
+                    del self._by_file_key[file_key]
+                if "user" in entry:
+                    positions = self._by_user[entry["user"]]
+                    while positions and positions[-1] >= cut:
+                        positions.pop()
+                    if not positions:
+                        del self._by_user[entry["user"]]
+
+            del self._entries[cut:]
+            del self._block_start[height:]
+
+    def rebuild(self, chain):
+        """
+        Re-index a whole chain.
+
+        Args:
+            chain (list): Blocks from genesis
+        """
+        with self._lock:
+            self._reset()
+            for block in chain:
+                self.add_block(block)
+
+    def sync(self, chain):
+        """
+        Bring the index in line with a chain (in memory: re-index it).
+
+        Args:
+            chain (list): Blocks from genesis
+        """
+        self.rebuild(chain)
+
+    # ========== QUERIES ==========
+
+    def latest(self, limit, offset=0):
+        """
+        Most recent transactions first.
+
+        Args:
+            limit (int): Page size
+            offset (int): Number of transactions to skip
+
+        Returns:
+            list: Transaction entries
+        """
+        with self._lock:
+            end = len(self._entries) - offset
+            start = max(0, end - limit)
+            return [dict(e) for e in reversed(self._entries[start:max(0, end)])]
+
+    def by_user(self, user, limit, offset=0):
+        """
+        Transactions of one user, most recent first.
+
+        Args:
+            user (str): Username recorded in the transaction
+            limit (int): Page size
+            offset (int): Number of transactions to skip
+
+        Returns:
+            list: Transaction entries
+        """
+        with self._lock:
+            positions = self._by_user.get(user, [])
+            end = len(positions) - offset
+            start = max(0, end - limit)
+            return [dict(self._entries[p]) for p in reversed(positions[start:max(0, end)])]
+
+    def count_by_user(self, user):
+        """Number of transactions recorded for a user."""
+        return len(self._by_user.get(user, []))
+
+    def by_file_key(self, file_key):
+        """
+        The transaction that recorded a file.
+
+        Args:
+            file_key (str): File key
+
+        Returns:
+            dict|None: Transaction entry
+        """
+        with self._lock:
+            position = self._by_file_key.get(file_key)
+            return dict(self._entries[position]) if position is not None else None
+
+    def locate(self, file_key):
+        """
+        Where the transaction that recorded a file sits on the chain.
+
+        Args:
+            file_key (str): File key
+
+        Returns:
+            tuple|None: (block height, position in the block)
+        """
+        with self._lock:
+            position = self._by_file_key.get(file_key)
+            if position is None:
+                return None
+            height = self._entries[position]["index"]
+            return height, position - self._block_start[height]
+
+    def by_block(self, index):
+        """
+        Transactions of one block.
+
+        Args:
+            index (int): Block height
+
+        Returns:
+            list: Transaction entries in block order
+        """
+        with self._lock:
+            if index < 0 or index >= len(self._block_start):
+                return []
+            end = self._block_start[index + 1] if index + 1 < len(self._block_start) else len(self._entries)
+            return [dict(e) for e in self._entries[self._block_start[index]:end]]
+
+
+class StoredTransactionIndex:
+    """
+    Transaction index persisted in SQLite, with the TransactionIndex interface.
+    Safe to query from request threads while blocks are being added.
+    """
+
+    def __init__(self, path):
+        """
+        Open (or create) the index; call sync() with the chain before use.
+
+        Args:
+            path (str): SQLite file (e.g. data_dir/txindex.sqlite)
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        try:
+            self._open()
+        except sqlite3.DatabaseError as e:
+            print(f"DEBUG: Transaction index {path} unreadable ({e}), rebuilding")
+            self._delete()
+            self._open()
+
+    def _open(self):
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS blocks (
+                height INTEGER PRIMARY KEY,
+                hash TEXT NOT NULL,
+                first INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS txs (
+                position INTEGER PRIMARY KEY,
+                height INTEGER NOT NULL,
+                file_key TEXT,
+                user TEXT,
+                entry TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS txs_file_key ON txs (file_key, position);
+            CREATE INDEX IF NOT EXISTS txs_user ON txs (user, position);
+            CREATE INDEX IF NOT EXISTS txs_height ON txs (height);
+        """)
+        if self._db.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+            raise sqlite3.DatabaseError("quick_check failed")
+        self._height = self._db.execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
+        self._count = self._db.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM txs").fetchone()[0]
+
+    def _delete(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.unlink(self.path + suffix)
+
+    def __len__(self):
+        return self._count
+
+    def height(self):
+        """
+        Number of blocks indexed.
+
+        Returns:
+            int: Height of the next block to add
+        """
+        return self._height
+
+    def _insert(self, block):
+        rows = []
+        for offset, trans in enumerate(block.transactions):
+            entry = dict(trans)
+            entry["index"] = block.index
+            entry["hash"] = block.prev_hash
+            rows.append((self._count + offset, block.index, trans.get("file_key"), trans.get("user"),
+                         json.dumps(entry)))
+        self._db.execute("INSERT INTO blocks (height, hash, first) VALUES (?, ?, ?)",
+                         (block.index, block.hash, self._count))
+        self._db.executemany("INSERT INTO txs (position, height, file_key, user, entry) VALUES (?, ?, ?, ?, ?)",
+                             rows)
+        self._height += 1
+        self._count += len(rows)
+
+    def add_block(self, block):
+        """
+        Index the transactions of the next block.
+
+        Args:
+            block (Block): Block at height self.height()
+        """
+        with self._lock:
+            if block.index != self._height:
+                raise ValueError(f"Expected block #{self._height}, got #{block.index}")
+            with self._db:
+                self._insert(block)
+
+    def truncate(self, height):
+        """
+        Drop the transactions of every block at or above a height.
+
+        Args:
+            height (int): First block height to drop
+        """
+        with self._lock:
+            if height >= self._height:
+                return
+            first = self._db.execute("SELECT first FROM blocks WHERE height = ?", (height,)).fetchone()[0]
+            with self._db:
+                self._db.execute("DELETE FROM txs WHERE position >= ?", (first,))
+                self._db.execute("DELETE FROM blocks WHERE height >= ?", (height,))
+            self._height = height
+            self._count = first
+
+    def rebuild(self, chain):
+        """
+        Re-index a whole chain.
+
+        Args:
+            chain (list): Blocks from genesis
+        """
+        with self._lock:
+            self.truncate(0)
+            self._extend(chain, 0)
+
+    def _extend(self, chain, start):
+        # One SQLite transaction per batch of blocks
+        for batch_start in range(start, len(chain), 1000):
+            with self._db:
+                for block in chain[batch_start:batch_start + 1000]:
+                    self._insert(block)
+
+    def sync(self, chain):
+        """
+        Bring the index in line with a chain. Blocks are compared by hash,
+        walking down from the top (hash_at() reads the store index, no block
+        is decoded), and only those after the last block both agree on are
+        indexed again.
+
+        Args:
+            chain (LazyChain): Chain backed by the block store
+        """
+        with self._lock:
+            agree = min(self._height, len(chain))
+            while agree > 0:
+                row = self._db.execute("SELECT hash FROM blocks WHERE height = ?", (agree - 1,)).fetchone()
+                if row[0] == chain.hash_at(agree - 1):
+                    break
+                agree -= 1
+            if agree < self._height:
+                print(f"DEBUG: Transaction index disagrees with the chain from #{agree}, re-indexing from there")
+                self.truncate(agree)
+            if self._height < len(chain):
+                print(f"DEBUG: Indexing transactions of blocks #{self._height}-#{len(chain) - 1}")
+                self._extend(chain, self._height)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # ========== QUERIES ==========
+
+    def _entries(self, sql, params):
+        with self._lock:
+            return [json.loads(row[0]) for row in self._db.execute(sql, params)]
+
+    def latest(self, limit, offset=0):
+        """Most recent transactions first (see TransactionIndex.latest)."""
+        return self._entries("SELECT entry FROM txs ORDER BY position DESC LIMIT ? OFFSET ?",
+                             (max(0, limit), max(0, offset)))
+
+    def by_user(self, user, limit, offset=0):
+        """Transactions of one user, most recent first (see TransactionIndex.by_user)."""
+        return self._entries("SELECT entry FROM txs WHERE user = ? ORDER BY position DESC LIMIT ? OFFSET ?",
+                             (user, max(0, limit), max(0, offset)))
+
+    def count_by_user(self, user):
+        """Number of transactions recorded for a user."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM txs WHERE user = ?", (user,)).fetchone()[0]
+
+    def by_file_key(self, file_key):
+        """The transaction that recorded a file (see TransactionIndex.by_file_key)."""
+        entries = self._entries("SELECT entry FROM txs WHERE file_key = ? ORDER BY position DESC LIMIT 1",
+                                (file_key,))
+        return entries[0] if entries else None
+
+    def locate(self, file_key):
+        """Where the transaction that recorded a file sits (see TransactionIndex.locate)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT txs.height, txs.position - blocks.first FROM txs JOIN blocks ON blocks.height = txs.height "
+                "WHERE txs.file_key = ? ORDER BY txs.position DESC LIMIT 1",
+                (file_key,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def by_block(self, index):
+        """Transactions of one block in block order (see TransactionIndex.by_block)."""
+        return self._entries("SELECT entry FROM txs WHERE height = ? ORDER BY position", (index,))
@@ -0,0 +1,80 @@
+# Check that a file upload is on-chain using only its Merkle inclusion proof.
+# Downloads the transaction, a proof of log2(n) hashes and the block header
+# from /proof/<file_key>, never the whole block.
+#
+# Usage: python verify_proof.py <file_key> [--node http://127.0.0.1:8800]
+
+import argparse
+import sys
+
+import requests
+
+from Block import Block, BLOCK_VERSION
+from Blockchain import Blockchain
+from chain_config import apply_chain_config
+from difficulty import difficulty_to_target, meets_target
+from merkle import verify_merkle_proof
+
+
+def verify_tx_proof(data, file_key=None):
+    """
+    Verify a /proof response.
+
+    Args:
+        data (dict): Response with "transaction", "proof" and "header"
+        file_key (str): File key the transaction must record (optional)
+
+    Returns:
+        tuple: (ok, reason)
+    """
+    transaction = data["transaction"]
+    header = data["header"]
+
+    if file_key is not None and transaction.get("file_key") != file_key:
+        return False, "proof is for another file"
+
+    # The header must carry a valid proof of work for its own fields
+    block = Block.from_dict(header)
+    if not _valid_header(block):
+        return False, "block header fails proof of work"
+
+    if not verify_merkle_proof(transaction, data["proof"], header["merkle_root"]):
+        return False, "transaction is not committed to by the block's Merkle root"
+
+    return True, f"included in block #{header['index']} ({header['hash']})"
+
+
+def _valid_header(block):
+    """
+    Hash of a header-only block matches and meets its target. Without the
+    blocks below it a version 3 target can only be checked against the
+    minimum difficulty, not against retargeting.
+    """
+    floor = difficulty_to_target(Blockchain.difficulty)
+    if block.version >= BLOCK_VERSION:
+        if block.target is None or block.target > floor:
+            return False
+        target = block.target
+    else:
+        target = floor
+    return (block.hash is not None
+            and meets_target(block.hash, target)
+            and block.generate_hash() == block.hash)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify that a file is recorded on the chain")
+    parser.add_argument("file_key", help="File key returned on upload")
+    parser.add_argument("--node", default="http://127.0.0.1:8800", help="Node to ask for the proof")
+    args = parser.parse_args()
+
+    # The header is checked against the node's minimum difficulty (POW_DIFFICULTY)
+    apply_chain_config()
+    response = requests.get(f"{args.node}/proof/{args.file_key}", timeout=10)
+    if response.status_code != 200:
+        print(f"No proof: {response.json().get('error', response.status_code)}")
+        sys.exit(1)
+
+    ok, reason = verify_tx_proof(response.json(), args.file_key)
+    print(("VALID: " if ok else "INVALID: ") + reason)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,275 @@
+"""
+Content-addressed chunked blob store for uploaded files.
+
+Files are split into fixed-size chunks keyed by their SHA-256, so identical
+chunks are stored once no matter how many users upload them. A file is
+described by a manifest (ordered chunk digests, size and whole-file SHA-256)
+and is read back by streaming its chunks in order.
+
+Two backends share the same layout:
+- GridFSChunkStore keeps chunks in the "blobs" GridFS bucket (survives
+  ephemeral disks such as Render's)
+- LocalChunkStore keeps chunks in a local directory
+
+The draft-generation service writes into the same bucket and, deployed on
+its own, carries an identical copy of this module; change both together.
+"""
+
+import base64
+import io
+import os
+import tempfile
+from hashlib import sha256
+
+import gridfs
+from pymongo.errors import DuplicateKeyError
+
+# Size of a stored chunk; changing it only affects files stored afterwards
+CHUNK_SIZE = 1024 * 1024
+
+# GridFS bucket holding the chunks (also written by the draft-generation service)
+GRIDFS_BUCKET = "blobs"
+
+
+class BlobStore:
+    """
+    Base class: subclasses store and fetch single chunks by digest.
+    """
+
+    chunk_size = CHUNK_SIZE
+
+    def has_chunk(self, digest):
+        raise NotImplementedError
+
+    def put_chunk(self, digest, data):
+        raise NotImplementedError
+
+    def get_chunk(self, digest):
+        raise NotImplementedError
+
+    def put_stream(self, stream):
+        """
+        Store a file from a binary stream, one chunk at a time.
+
+        Args:
+            stream: Object with a read(size) method
+
+        Returns:
+            dict: Manifest with "sha256", "size", "chunk_size" and "chunks"
+        """
+        file_hash = sha256()
+        chunks = []
+        size = 0
+
+        while True:
+            data = stream.read(self.chunk_size)
+            if not data:
+                break
+            # Streams may return short reads; top the chunk up to a full size
+            while len(data) < self.chunk_size:
+                more = stream.read(self.chunk_size - len(data))
+                if not more:
+                    break
+                data += more
+
+            digest = sha256(data).hexdigest()
+            if not self.has_chunk(digest):
+                self.put_chunk(digest, data)
+
+            file_hash.update(data)
+            chunks.append(digest)
+            size += len(data)
+
+        return {
+            "sha256": file_hash.hexdigest(),
+            "size": size,
+            "chunk_size": self.chunk_size,
+            "chunks": chunks
+        }
+
+    def put_bytes(self, data):
+        """
+        Store a file held in memory.
+
+        Args:
+            data (bytes): File content
+
+        Returns:
+            dict: Manifest (see put_stream)
+        """
+        return self.put_stream(io.BytesIO(data))
+
+    def iter_chunks(self, manifest):
+        """
+        Stream a stored file back chunk by chunk.
+
+        Args:
+            manifest (dict): Manifest returned by put_stream
+
+        Yields:
+            bytes: File content in order
+        """
+        for digest in manifest["chunks"]:
+            yield self.get_chunk(digest)
+
+    def iter_range(self, manifest, start, stop):
+        """
+        Stream a byte range of a stored file, fetching only the chunks it covers.
+
+        Args:
+            manifest (dict): Manifest returned by put_stream
+            start (int): First byte (inclusive)
+            stop (int): Last byte (exclusive)
+
+        Yields:
+            bytes: File content in [start, stop)
+        """
+        if stop <= start:
+            return
+        chunk_size = manifest["chunk_size"]
+        first = start // chunk_size
+        last = (stop - 1) // chunk_size
+
+        for i in range(first, last + 1):
+            data = self.get_chunk(manifest["chunks"][i])
+            lo = start - i * chunk_size if i == first else 0
+            hi = stop - i * chunk_size if i == last else len(data)
+            yield data[lo:hi]
+
+    def content_digest(self, manifest):
+        """
+        Re-hash a stored file from its chunks.
+
+        Args:
+            manifest (dict): Manifest returned by put_stream
+
+        Returns:
+            tuple: (SHA-256 hex digest, size in bytes) of the stored content
+        """
+        file_hash = sha256()
+        size = 0
+        for data in self.iter_chunks(manifest):
+            file_hash.update(data)
+            size += len(data)
+        return file_hash.hexdigest(), size
+
+    def copy_to(self, manifest, f):
+        """
+        Write a stored file to an open binary file object.
+
+        Args:
+            manifest (dict): Manifest returned by put_stream
+            f: Binary file object
+        """
+        for data in self.iter_chunks(manifest):
+            f.write(data)
+
+    def write_to(self, manifest, path):
+        """
+        Reassemble a stored file on disk (atomically, via a temporary file).
+
+        Args:
+            manifest (dict): Manifest returned by put_stream
+            path (str): Destination path
+        """
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".part-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self.copy_to(manifest, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+
+class LocalChunkStore(BlobStore):
+    """
+    Chunks as files under a local directory (root/ab/abcdef...).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def has_chunk(self, digest):
+        return os.path.exists(self._path(digest))
+
+    def put_chunk(self, digest, data):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".part-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # Identical content under the same name, so a concurrent writer is harmless
+        os.replace(tmp_path, path)
+
+    def get_chunk(self, digest):
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+
+class GridFSChunkStore(BlobStore):
+    """
+    Chunks as GridFS files whose _id is the chunk digest.
+    """
+
+    def __init__(self, db, bucket_name=GRIDFS_BUCKET):
+        self.bucket = gridfs.GridFSBucket(db, bucket_name=bucket_name)
+        self.files_col = db[f"{bucket_name}.files"]
+
+    def has_chunk(self, digest):
+        return self.files_col.count_documents({"_id": digest}, limit=1) > 0
+
+    def put_chunk(self, digest, data):
+        try:
+            self.bucket.upload_from_stream_with_id(digest, digest, data)
+        except (gridfs.errors.FileExists, DuplicateKeyError):
+            # Another upload stored the same chunk first
+            pass
+
+    def get_chunk(self, digest):
+        with self.bucket.open_download_stream(digest) as grid_out:
+            return grid_out.read()
+
+
+def open_blob_store(db):
+    """
+    Create the blob store configured by the environment.
+
+    BLOB_STORE=gridfs (default) stores chunks in MongoDB, BLOB_STORE=local
+    stores them under BLOB_DIR (default app/static/Blobs).
+
+    Args:
+        db: MongoDB database instance
+
+    Returns:
+        BlobStore: Configured store
+    """
+    if os.environ.get("BLOB_STORE", "gridfs") == "local":
+        return LocalChunkStore(os.environ.get("BLOB_DIR", "app/static/Blobs"))
+    return GridFSChunkStore(db)
+
+
+def migrate_file_record(files_col, store, f_data):
+    """
+    Move a legacy record's Base64 "file_content" into the blob store.
+
+    Args:
+        files_col: MongoDB "files" collection
+        store (BlobStore): Destination store
+        f_data (dict): File record with a "file_content" field
+
+    Returns:
+        dict: Manifest now stored in the record's "blob" field
+    """
+    manifest = store.put_bytes(base64.b64decode(f_data["file_content"]))
+    files_col.update_one(
+        {"_id": f_data["_id"]},
+        {"$set": {"blob": manifest}, "$unset": {"file_content": ""}}
+    )
+    return manifest
@@ -4,8 +4,25 @@ import base64
 import uuid
 import time
 import requests
-from pymongo import MongoClient
+from pymongo import ASCENDING
 from pymongo.errors import ConnectionFailure
+# Copies of the Blockchain service's modules (kept identical to blockchain/)
+from db_schema import connect, bootstrap, SLOW_QUERY_MS, SLOW_QUERY_COLLECTION, SLOW_QUERY_RETENTION
+from blob_store import GridFSChunkStore
+
+# Indexes of this service's collections: collection -> [(keys, options)].
+# The file_storage collections it writes into are indexed by the Blockchain service.
+INDEXES = {
+    "documents": [
+        ([("hash", ASCENDING)], {"name": "hash"}),
+    ],
+    "lifecycles": [
+        ([("hash", ASCENDING)], {"unique": True, "name": "hash_unique"}),
+    ],
+    SLOW_QUERY_COLLECTION: [
+        ([("at", ASCENDING)], {"expireAfterSeconds": SLOW_QUERY_RETENTION, "name": "at_ttl"}),
+    ],
+}
 
 class NyaySetuDB:
     def __init__(self, uri=None):
@@ -20,10 +37,13 @@ class NyaySetuDB:
             return
 
         try:
-            self.client = MongoClient(self.uri)
+            # Queries slower than SLOW_QUERY_MS are logged with their explain plan (0 disables)
+            self.client = connect(self.uri, 'nyaysetu_blockchain',
+                                  float(os.environ.get('SLOW_QUERY_MS', SLOW_QUERY_MS)))
             # The ismaster command is cheap and does not require auth.
             self.client.admin.command('ismaster')
             self.db = self.client.get_database('nyaysetu_blockchain')
+            bootstrap(self.db, INDEXES)
             print("✅ Successfully connected to MongoDB Atlas")
         except ConnectionFailure:
             print("❌ Server not available")
@@ -82,10 +102,10 @@ class NyaySetuDB:
             bc_db = self.client.get_database('file_storage')
             files_col = bc_db["files"]
 
+            # Same chunked layout as the Blockchain service's uploads, in its "blobs" bucket
             with open(pdf_path, "rb") as pdf_file:
-                file_content = pdf_file.read()
-                file_size = len(file_content)
-                file_base64 = base64.b64encode(file_content).decode('utf-8')
+                blob = GridFSChunkStore(bc_db).put_stream(pdf_file)
+            file_size = blob["size"]
 
             file_key = str(uuid.uuid4())
             unique_id = str(uuid.uuid4())[:8]
@@ -96,8 +116,7 @@ class NyaySetuDB:
                 "filename": original_filename, 
                 "secure_name": secure_name,   
                 "owner": user_key,
-                "shared_with": [],
-                "file_content": file_base64,
+                "blob": blob,
                 "file_size": file_size,
                 "created_at": time.time()
             }
@@ -114,7 +133,8 @@ class NyaySetuDB:
                         "v_file": original_filename,
                         "file_key": file_key,
                         "file_data": "Binary Content Stored in DB",
-                        "file_size": file_size
+                        "file_size": file_size,
+                        "sha256": blob["sha256"]
                     }
                     requests.post(f"{bc_service_url}/new_transaction", json=tx, timeout=2)
                     print(f"✅ Transaction announced to Blockchain service")